@@ -99,3 +99,8 @@ class PagesAdminAPIEndpoint(PagesAPIEndpoint):
         response = super().detail_view(request, pk)
         response.data['__types'] = self.get_type_info()
         return response
+
+    def batch_view(self, request):
+        response = super().batch_view(request)
+        response.data['__types'] = self.get_type_info()
+        return response
@@ -1,4 +1,7 @@
-from wagtail.core.models import Page
+from wagtail.core.models import Page, PagePermissionIndex
+from wagtail.core.query import get_common_ancestor_path
+
+EXPLORE_PERMISSION_TYPES = ['add', 'edit', 'publish', 'lock']
 
 
 def get_pages_with_direct_explore_permission(user):
@@ -9,17 +12,38 @@ def get_pages_with_direct_explore_permission(user):
     else:
         return Page.objects.filter(
             group_permissions__group__in=user.groups.all(),
-            group_permissions__permission_type__in=['add', 'edit', 'publish', 'lock']
+            group_permissions__permission_type__in=EXPLORE_PERMISSION_TYPES
         )
 
 
 def get_explorable_root_page(user):
     # Get the highest common explorable ancestor for the given user. If the user
     # has no permissions over any pages, this method will return None.
-    pages = get_pages_with_direct_explore_permission(user)
-    if pages:
-        return pages.first_common_ancestor(
+    # The result is remembered on the user object, as this is called several
+    # times while rendering each admin page.
+    if not hasattr(user, '_wagtail_explorable_root_page'):
+        user._wagtail_explorable_root_page = _get_explorable_root_page(user)
+
+    return user._wagtail_explorable_root_page
+
+
+def _get_explorable_root_page(user):
+    if user.is_superuser:
+        return get_pages_with_direct_explore_permission(user).first_common_ancestor(
             include_self=True,
             strict=True)
-    else:
+
+    # Work out the common ancestor from the paths in the user's permission
+    # index, which is cached, so that only the root page itself is queried
+    permission_index = PagePermissionIndex.for_user(user)
+    paths = set()
+    for permission_type in EXPLORE_PERMISSION_TYPES:
+        paths.update(permission_index.get_paths(permission_type))
+
+    common_path = get_common_ancestor_path(paths, Page.steplen)
+    if common_path is None:
         return None
+    if common_path == '':
+        raise Page.DoesNotExist('No common ancestor found!')
+
+    return Page.objects.get(path=common_path)
@@ -1,7 +1,7 @@
 from django.utils.functional import cached_property
 
 from wagtail.core.rich_text import features as feature_registry
-from wagtail.core.rich_text.rewriters import EmbedRewriter, LinkRewriter, MultiRuleRewriter
+from wagtail.core.rich_text.rewriters import LinkAndEmbedRewriter
 from wagtail.core.whitelist import Whitelister, allow_without_attributes
 
 
@@ -88,13 +88,14 @@ class DbWhitelister(Whitelister):
             # first, whitelist the contents of this tag
             for child in tag.contents:
                 self.clean_node(doc, child)
+            self.unwrap_removed_children(tag)
 
             link_type = tag['data-linktype']
             try:
                 link_handler = self.link_handlers[link_type]
             except KeyError:
                 # discard links with unrecognised linktypes
-                tag.unwrap()
+                self.remove_tag(tag)
                 return
 
             link_attrs = link_handler.get_db_attributes(tag)
@@ -138,9 +139,7 @@ class EditorHTMLConverter:
             elif isinstance(rule, LinkTypeRule):
                 link_rules[rule.link_type] = rule.handler.expand_db_attributes
 
-        return MultiRuleRewriter([
-            LinkRewriter(link_rules), EmbedRewriter(embed_rules)
-        ])
+        return LinkAndEmbedRewriter(link_rules, embed_rules)
 
     def from_database_format(self, html):
         return self.html_rewriter(html)
@@ -34,6 +34,15 @@ class TestDbWhitelisterMethods(TestCase):
         self.whitelister.clean_tag_node(soup, tag)
         self.assertEqual(str(tag), '<a id="1" linktype="document">foo</a>')
 
+    def test_clean_tag_node_with_unknown_linktype(self):
+        soup = BeautifulSoup(
+            '<p><a data-linktype="unknown" data-id="1"><span>foo</span></a> bar</p>',
+            'html5lib'
+        )
+        tag = soup.p
+        self.whitelister.clean_tag_node(soup, tag)
+        self.assertEqual(str(tag), '<p>foo bar</p>')
+
     def test_clean_tag_node(self):
         soup = BeautifulSoup('<a irrelevant="baz">foo</a>', 'html5lib')
         tag = soup.a
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from wagtail.admin.navigation import (
     get_explorable_root_page, get_pages_with_direct_explore_permission)
@@ -83,3 +83,18 @@ class TestExplorablePages(TestCase, WagtailTestUtils):
         User = get_user_model()
         user = User.objects.get(username='mary')
         self.assertEqual(get_explorable_root_page(user), None)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_explorable_root_page_uses_cached_permissions(self):
+        User = get_user_model()
+
+        # Warm up the permission cache
+        get_explorable_root_page(User.objects.get(username='josh'))
+
+        user = User.objects.get(username='josh')
+        with self.assertNumQueries(1):
+            self.assertEqual(get_explorable_root_page(user).id, 4)
+
+        # The result is remembered for the rest of the request
+        with self.assertNumQueries(0):
+            self.assertEqual(get_explorable_root_page(user).id, 4)
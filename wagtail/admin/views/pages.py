@@ -110,12 +110,18 @@ def index(request, parent_page_id=None):
     if do_paginate:
         paginator, pages = paginate(request, pages, per_page=50)
 
+    # Check whether the listed pages can be deleted or moved with a single query,
+    # rather than having the action buttons look at the subtree of each page
+    user_perms = UserPagePermissionsProxy(request.user)
+    user_perms.prefetch_subtree_stats(pages)
+
     return render(request, 'wagtailadmin/pages/index.html', {
         'parent_page': parent_page.specific,
         'ordering': ordering,
         'pagination_query_params': "ordering=%s" % ordering,
         'pages': pages,
         'do_paginate': do_paginate,
+        'user_page_permissions': user_perms,
     })
 
 
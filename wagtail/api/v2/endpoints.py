@@ -1,7 +1,10 @@
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 
+from django.conf import settings
 from django.conf.urls import url
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import FieldDoesNotExist
+from django.db.models import prefetch_related_objects
 from django.http import Http404
 from django.shortcuts import redirect
 from django.urls import reverse
@@ -12,13 +15,13 @@ from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
 from wagtail.api import APIField
-from wagtail.core.models import Page
+from wagtail.core.models import Page, Site, get_page_models
 
 from .filters import (
     FieldsFilter, OrderingFilter, RestrictedChildOfFilter, RestrictedDescendantOfFilter,
     SearchFilter)
 from .pagination import WagtailPagination
-from .serializers import BaseSerializer, PageSerializer, get_serializer_class
+from .serializers import BaseSerializer, PageSerializer, RelatedField, get_serializer_class
 from .utils import (
     BadRequestError, filter_page_type, get_object_detail_url, page_models_from_string,
     parse_fields_parameter)
@@ -40,6 +43,9 @@ class BaseAPIEndpoint(GenericViewSet):
         'search',
         'search_operator',
 
+        # Used by the batch view
+        'ids',
+
         # Used by jQuery for cache-busting. See #1671
         '_',
 
@@ -69,8 +75,9 @@ class BaseAPIEndpoint(GenericViewSet):
         queryset = self.get_queryset()
         self.check_query_parameters(queryset)
         queryset = self.filter_queryset(queryset)
-        queryset = self.paginate_queryset(queryset)
-        serializer = self.get_serializer(queryset, many=True)
+        objects = list(self.paginate_queryset(queryset))
+        serializer = self.get_serializer(objects, many=True)
+        self.prefetch_nested_objects(objects, serializer.child)
         return self.get_paginated_response(serializer.data)
 
     def detail_view(self, request, pk):
@@ -78,6 +85,119 @@ class BaseAPIEndpoint(GenericViewSet):
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    def batch_view(self, request):
+        """
+        Returns the detail representations of several objects in a single
+        response. The objects are specified with the ``ids`` parameter
+        (eg: ``?ids=1,2,3``) and are returned in the order they were given.
+
+        IDs that do not exist (or are not visible through this endpoint) are
+        left out of the response.
+        """
+        queryset = self.get_queryset()
+        self.check_query_parameters(queryset)
+        ids = self.get_batch_ids()
+        queryset = self.get_batch_queryset(queryset, ids)
+        objects_by_id = {obj.pk: obj for obj in queryset}
+
+        objects = [objects_by_id[pk] for pk in ids if pk in objects_by_id]
+
+        context = self.get_serializer_context()
+        serializer_classes = {}
+
+        # The models in a batch may differ (eg, page types), so build one
+        # serializer class per model rather than one for the whole request
+        for model in set(type(obj) for obj in objects):
+            serializer_classes[model] = self._get_serializer_class(
+                self.request.wagtailapi_router, model, self.get_fields_config(), show_details=True)
+
+            self.prefetch_nested_objects(
+                [obj for obj in objects if type(obj) is model], serializer_classes[model](context=context)
+            )
+
+        items = [serializer_classes[type(obj)](obj, context=context).data for obj in objects]
+
+        return Response(OrderedDict([
+            ('meta', OrderedDict([
+                ('total_count', len(items)),
+            ])),
+            ('items', items),
+        ]))
+
+    def prefetch_nested_objects(self, objects, serializer):
+        """
+        Fetches the related objects that the serializer nests in the
+        representations of the given objects, with one query per field. The
+        endpoints of the related models can then prefetch anything else their
+        nested representations need (see prefetch_for_nested_objects).
+        """
+        router = self.request.wagtailapi_router
+
+        for field in serializer.fields.values():
+            if not isinstance(field, RelatedField):
+                continue
+
+            try:
+                django_field = serializer.Meta.model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+
+            if not (django_field.many_to_one or django_field.one_to_one) or not django_field.concrete:
+                continue
+
+            prefetch_related_objects(objects, field.source)
+
+            related_objects_by_model = defaultdict(list)
+            for obj in objects:
+                related_object = getattr(obj, field.source)
+                if related_object is not None:
+                    related_objects_by_model[type(related_object)].append(related_object)
+
+            for model, related_objects in related_objects_by_model.items():
+                endpoint = router.get_model_endpoint(model)
+                if endpoint:
+                    endpoint[1].prefetch_for_nested_objects(self.request, related_objects)
+
+    @classmethod
+    def prefetch_for_nested_objects(cls, request, objects):
+        """
+        Called with objects of this endpoint's model that are about to be
+        nested in the response of another endpoint. Override this to fetch
+        anything their representations need for all of them at once.
+        """
+        pass
+
+    def get_batch_ids(self):
+        """
+        Parses the ``ids`` parameter of the batch view into a list of unique
+        integer IDs, preserving the order they were given in.
+        """
+        ids = []
+
+        for pk in self.request.GET.get('ids', '').split(','):
+            try:
+                pk = int(pk)
+                if pk < 1:
+                    raise ValueError()
+            except ValueError:
+                raise BadRequestError("ids must be a comma-separated list of positive integers")
+
+            if pk not in ids:
+                ids.append(pk)
+
+        limit_max = getattr(settings, 'WAGTAILAPI_LIMIT_MAX', 20)
+        if limit_max and len(ids) > limit_max:
+            raise BadRequestError("cannot fetch more than %d objects in a batch" % limit_max)
+
+        return ids
+
+    def get_batch_queryset(self, queryset, ids):
+        """
+        Override this to customise how the objects of a batch are fetched
+        (eg, to return specific instances).
+        """
+        return queryset.filter(id__in=ids)
+
     def find_view(self, request):
         queryset = self.get_queryset()
 
@@ -291,23 +411,13 @@ class BaseAPIEndpoint(GenericViewSet):
         )
 
     def get_serializer_class(self):
-        request = self.request
-
         # Get model
         if self.action == 'listing_view':
             model = self.get_queryset().model
         else:
             model = type(self.get_object())
 
-        # Fields
-        if 'fields' in request.GET:
-            try:
-                fields_config = parse_fields_parameter(request.GET['fields'])
-            except ValueError as e:
-                raise BadRequestError("fields error: %s" % str(e))
-        else:
-            # Use default fields
-            fields_config = []
+        fields_config = self.get_fields_config()
 
         # Allow "detail_only" (eg parent) fields on detail view
         if self.action == 'listing_view':
@@ -317,6 +427,19 @@ class BaseAPIEndpoint(GenericViewSet):
 
         return self._get_serializer_class(self.request.wagtailapi_router, model, fields_config, show_details=show_details)
 
+    def get_fields_config(self):
+        """
+        Parses the ``fields`` parameter of the request
+        """
+        if 'fields' in self.request.GET:
+            try:
+                return parse_fields_parameter(self.request.GET['fields'])
+            except ValueError as e:
+                raise BadRequestError("fields error: %s" % str(e))
+
+        # Use default fields
+        return []
+
     def get_serializer_context(self):
         """
         The serialization context differs between listing and detail views.
@@ -341,6 +464,7 @@ class BaseAPIEndpoint(GenericViewSet):
             url(r'^$', cls.as_view({'get': 'listing_view'}), name='listing'),
             url(r'^(?P<pk>\d+)/$', cls.as_view({'get': 'detail_view'}), name='detail'),
             url(r'^find/$', cls.as_view({'get': 'find_view'}), name='find'),
+            url(r'^batch/$', cls.as_view({'get': 'batch_view'}), name='batch'),
         ]
 
     @classmethod
@@ -375,6 +499,9 @@ class PagesAPIEndpoint(BaseAPIEndpoint):
         'type',
         'child_of',
         'descendant_of',
+
+        # Used by nested image fields, see ImageSerializer
+        'renditions',
     ])
     body_fields = BaseAPIEndpoint.body_fields + [
         'title',
@@ -437,11 +564,26 @@ class PagesAPIEndpoint(BaseAPIEndpoint):
         base = super().get_object()
         return base.specific
 
+    def get_batch_queryset(self, queryset, ids):
+        # Fetch the specific pages with one query per page type, rather than
+        # one query per page
+        return super().get_batch_queryset(queryset, ids).specific()
+
     def find_object(self, queryset, request):
         if 'html_path' in request.GET and request.site is not None:
             path = request.GET['html_path']
             path_components = [component for component in path.split('/') if component]
 
+            # Most pages are routed by their url_path so, unless a page type with
+            # custom routing is involved, we can look the page up directly
+            if self.can_find_by_url_path(request.site, path_components):
+                page = queryset.filter(url_path=self.get_url_path(request.site, path_components)).first()
+
+                if page is not None:
+                    return page
+
+                return super().find_object(queryset, request)
+
             try:
                 page, _, _ = request.site.root_page.specific.route(request, path_components)
             except Http404:
@@ -451,3 +593,33 @@ class PagesAPIEndpoint(BaseAPIEndpoint):
                 return page
 
         return super().find_object(queryset, request)
+
+    def get_url_path(self, site, path_components):
+        """
+        Returns the url_path that a page served at path_components would have
+        if it was routed with the default Page.route method
+        """
+        for site_id, root_path, root_url in Site.get_site_root_paths():
+            if site_id == site.pk:
+                break
+        else:
+            root_path = site.root_page.url_path
+
+        return root_path + ''.join(component + '/' for component in path_components)
+
+    def can_find_by_url_path(self, site, path_components):
+        """
+        Checks that none of the pages along path_components (including the site
+        root page) override the route method. If this is the case, the page at
+        the end of the path can be found by url_path instead of by walking the
+        tree with route.
+        """
+        routing_models = [model for model in get_page_models() if model.route is not Page.route]
+
+        if not routing_models:
+            return True
+
+        url_paths = [self.get_url_path(site, path_components[:i]) for i in range(len(path_components) + 1)]
+        content_types = ContentType.objects.get_for_models(*routing_models).values()
+
+        return not Page.objects.filter(url_path__in=url_paths, content_type__in=content_types).exists()
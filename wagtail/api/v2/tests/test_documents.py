@@ -532,7 +532,7 @@ class TestDocumentFind(TestCase):
     },
     WAGTAILAPI_BASE_URL='http://api.example.com',
 )
-@mock.patch('wagtail.contrib.frontend_cache.backends.HTTPBackend.purge')
+@mock.patch('wagtail.contrib.frontend_cache.backends.HTTPBackend.purge_batch')
 class TestDocumentCacheInvalidation(TestCase):
     fixtures = ['demosite.json']
 
@@ -549,9 +549,9 @@ class TestDocumentCacheInvalidation(TestCase):
     def test_resave_document_purges(self, purge):
         get_document_model().objects.get(id=5).save()
 
-        purge.assert_any_call('http://api.example.com/api/v2beta/documents/5/')
+        purge.assert_any_call(['http://api.example.com/api/v2beta/documents/5/'])
 
     def test_delete_document_purges(self, purge):
         get_document_model().objects.get(id=5).delete()
 
-        purge.assert_any_call('http://api.example.com/api/v2beta/documents/5/')
+        purge.assert_any_call(['http://api.example.com/api/v2beta/documents/5/'])
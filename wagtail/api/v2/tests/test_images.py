@@ -1,12 +1,14 @@
 import json
 
 import mock
+from django.db import connection
 from django.test import TestCase
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 
 from wagtail.api.v2 import signal_handlers
 from wagtail.images import get_image_model
+from wagtail.images.views.serve import generate_signature
 
 
 class TestImageListing(TestCase):
@@ -517,6 +519,119 @@ class TestImageFind(TestCase):
         })
 
 
+@override_settings(WAGTAILAPI_IMAGE_RENDITIONS=['width-400', 'fill-300x200', 'foo-100'])
+class TestImageRenditions(TestCase):
+    fixtures = ['demosite.json']
+
+    def setUp(self):
+        self.image = get_image_model().objects.get(id=5)
+        self.image.renditions.create(
+            filter_spec='width-400',
+            file='images/test.width-400.png',
+            width=400,
+            height=300,
+        )
+
+    def get_listing_response(self, **params):
+        return self.client.get(reverse('wagtailapi_v2:images:listing'), params)
+
+    def get_detail_response(self, image_id, **params):
+        return self.client.get(reverse('wagtailapi_v2:images:detail', args=(image_id, )), params)
+
+    def test_renditions_not_shown_by_default(self):
+        response = self.get_detail_response(5)
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertNotIn('renditions', content)
+
+    def test_existing_rendition(self):
+        response = self.get_detail_response(5, renditions='width-400')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(content['renditions'], {
+            'width-400': {
+                'url': '/media/images/test.width-400.png',
+                'width': 400,
+                'height': 300,
+            },
+        })
+
+    def test_missing_rendition_isnt_generated(self):
+        with mock.patch.object(get_image_model(), 'get_rendition') as get_rendition:
+            response = self.get_detail_response(5, renditions='width-400,fill-300x200')
+
+        get_rendition.assert_not_called()
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(list(content['renditions'].keys()), ['width-400', 'fill-300x200'])
+
+        # The missing rendition links to the image serve view
+        signature = generate_signature(5, 'fill-300x200')
+        self.assertEqual(content['renditions']['fill-300x200'], {
+            'url': reverse('wagtailimages_serve', args=(signature, 5, 'fill-300x200')),
+        })
+
+    def test_listing_fetches_renditions_in_one_query(self):
+        response = self.get_listing_response(renditions='width-400,fill-300x200')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        for image in content['items']:
+            self.assertEqual(list(image['renditions'].keys()), ['width-400', 'fill-300x200'])
+
+        # Site, count, images, renditions
+        with self.assertNumQueries(4):
+            self.get_listing_response(renditions='width-400,fill-300x200', fields='_,id', limit=10)
+
+    def test_invalid_filter_spec_gives_error(self):
+        response = self.get_listing_response(renditions='width-400,foo-100')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content, {'message': "renditions error: 'foo-100' is not a valid filter spec"})
+
+    def test_filter_spec_not_in_setting_gives_error(self):
+        response = self.get_listing_response(renditions='width-400,width-401')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content, {'message': "renditions error: 'width-401' is not an allowed filter spec"})
+
+    @override_settings(WAGTAILAPI_IMAGE_RENDITIONS=[])
+    def test_renditions_not_allowed_by_default(self):
+        response = self.get_detail_response(5, renditions='width-400')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_nested_image_renditions_are_fetched_in_bulk(self):
+        def count_listing_queries(limit):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('wagtailapi_v2:pages:listing'), {
+                    'type': 'demosite.BlogEntryPage',
+                    'fields': '_,feed_image',
+                    'renditions': 'width-400',
+                    'limit': limit,
+                })
+
+            content = json.loads(response.content.decode('UTF-8'))
+            self.assertEqual(len(content['items']), limit)
+            for page in content['items']:
+                self.assertIn('width-400', page['feed_image']['renditions'])
+
+            return len(queries)
+
+        self.assertEqual(count_listing_queries(3), count_listing_queries(1))
+
+    def test_nested_image_renditions(self):
+        response = self.client.get(reverse('wagtailapi_v2:pages:detail', args=(16, )), {
+            'fields': 'feed_image',
+            'renditions': 'width-400',
+        })
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(content['feed_image']['id'], 7)
+        self.assertIn('width-400', content['feed_image']['renditions'])
+
+
 @override_settings(
     WAGTAILFRONTENDCACHE={
         'varnish': {
@@ -526,7 +641,7 @@ class TestImageFind(TestCase):
     },
     WAGTAILAPI_BASE_URL='http://api.example.com',
 )
-@mock.patch('wagtail.contrib.frontend_cache.backends.HTTPBackend.purge')
+@mock.patch('wagtail.contrib.frontend_cache.backends.HTTPBackend.purge_batch')
 class TestImageCacheInvalidation(TestCase):
     fixtures = ['demosite.json']
 
@@ -543,9 +658,9 @@ class TestImageCacheInvalidation(TestCase):
     def test_resave_image_purges(self, purge):
         get_image_model().objects.get(id=5).save()
 
-        purge.assert_any_call('http://api.example.com/api/v2beta/images/5/')
+        purge.assert_any_call(['http://api.example.com/api/v2beta/images/5/'])
 
     def test_delete_image_purges(self, purge):
         get_image_model().objects.get(id=5).delete()
 
-        purge.assert_any_call('http://api.example.com/api/v2beta/images/5/')
+        purge.assert_any_call(['http://api.example.com/api/v2beta/images/5/'])
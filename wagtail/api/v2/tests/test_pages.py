@@ -10,6 +10,7 @@ from django.urls import reverse
 from wagtail.api.v2 import signal_handlers
 from wagtail.core.models import Page, Site
 from wagtail.tests.demosite import models
+from wagtail.tests.routablepage.models import RoutablePageTest
 from wagtail.tests.testapp.models import StreamPage
 
 
@@ -1121,6 +1122,132 @@ class TestPageFind(TestCase):
             'message': 'not found'
         })
 
+    def test_find_by_html_path_doesnt_walk_tree(self):
+        # Pages with default routing are looked up by url_path
+        with mock.patch.object(Page, 'route') as route:
+            response = self.get_response(html_path='/events-index/event-1/')
+
+        route.assert_not_called()
+        self.assertRedirects(response, 'http://localhost' + reverse('wagtailapi_v2:pages:detail', args=[8]), fetch_redirect_response=False)
+
+    def test_find_by_html_path_unpublished(self):
+        models.EventPage.objects.get(id=8).unpublish()
+
+        response = self.get_response(html_path='/events-index/event-1/')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_find_by_html_path_with_custom_routing(self):
+        # Pages below a page that overrides route are found by walking the tree
+        routable_page = Page.objects.get(id=2).add_child(instance=RoutablePageTest(
+            title="Routable Page",
+            slug="routable-page",
+            live=True,
+        ))
+
+        response = self.get_response(html_path='/routable-page/archive/year/2014/')
+
+        self.assertRedirects(response, 'http://localhost' + reverse('wagtailapi_v2:pages:detail', args=[routable_page.id]), fetch_redirect_response=False)
+
+
+class TestPageBatch(TestCase):
+    fixtures = ['demosite.json']
+
+    def get_response(self, **params):
+        return self.client.get(reverse('wagtailapi_v2:pages:batch'), params)
+
+    def get_page_id_list(self, content):
+        return [page['id'] for page in content['items']]
+
+    def test_basic(self):
+        response = self.get_response(ids='16,5,8')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-type'], 'application/json')
+
+        # Will crash if the JSON is invalid
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(content['meta']['total_count'], 3)
+
+        # Pages are returned in the order their ids were given
+        self.assertEqual(self.get_page_id_list(content), [16, 5, 8])
+
+        # Each page gets its detail representation, including specific fields
+        self.assertEqual(content['items'][0]['meta']['type'], 'demosite.BlogEntryPage')
+        self.assertIn('body', content['items'][0])
+        self.assertIn('parent', content['items'][0]['meta'])
+        self.assertEqual(content['items'][1]['meta']['type'], 'demosite.BlogIndexPage')
+        self.assertEqual(content['items'][2]['meta']['type'], 'demosite.EventPage')
+
+    def test_query_count(self):
+        # Specific pages must be fetched with one query per page type, not one per page
+        with self.assertNumQueries(4):
+            self.get_response(ids='16,18,19', fields='_,title')
+
+    def test_duplicate_ids(self):
+        response = self.get_response(ids='16,16,5')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(self.get_page_id_list(content), [16, 5])
+
+    def test_unpublished_pages_are_excluded(self):
+        models.BlogEntryPage.objects.get(id=16).unpublish()
+
+        response = self.get_response(ids='16,5')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(self.get_page_id_list(content), [5])
+
+    def test_nonexistent_ids_are_excluded(self):
+        response = self.get_response(ids='1234,5')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(self.get_page_id_list(content), [5])
+
+    def test_fields(self):
+        response = self.get_response(ids='16,5', fields='_,title')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        for page in content['items']:
+            self.assertEqual(set(page.keys()), {'title'})
+
+    def test_without_ids_gives_error(self):
+        response = self.get_response()
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content, {'message': "ids must be a comma-separated list of positive integers"})
+
+    def test_ids_not_integer_gives_error(self):
+        response = self.get_response(ids='16,abc')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content, {'message': "ids must be a comma-separated list of positive integers"})
+
+    def test_zero_id_gives_error(self):
+        response = self.get_response(ids='16,0')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content, {'message': "ids must be a comma-separated list of positive integers"})
+
+    def test_unknown_query_parameter_gives_error(self):
+        response = self.get_response(ids='16,5', foo='bar')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content, {'message': "query parameter is not an operation or a recognised field: foo"})
+
+    @override_settings(WAGTAILAPI_LIMIT_MAX=2)
+    def test_too_many_ids_gives_error(self):
+        response = self.get_response(ids='16,5,8')
+        content = json.loads(response.content.decode('UTF-8'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(content, {'message': "cannot fetch more than 2 objects in a batch"})
+
 
 class TestPageDetailWithStreamField(TestCase):
     fixtures = ['test.json']
@@ -1189,7 +1316,7 @@ class TestPageDetailWithStreamField(TestCase):
     },
     WAGTAILAPI_BASE_URL='http://api.example.com',
 )
-@mock.patch('wagtail.contrib.frontend_cache.backends.HTTPBackend.purge')
+@mock.patch('wagtail.contrib.frontend_cache.backends.HTTPBackend.purge_batch')
 class TestPageCacheInvalidation(TestCase):
     fixtures = ['demosite.json']
 
@@ -1206,17 +1333,17 @@ class TestPageCacheInvalidation(TestCase):
     def test_republish_page_purges(self, purge):
         Page.objects.get(id=2).save_revision().publish()
 
-        purge.assert_any_call('http://api.example.com/api/v2beta/pages/2/')
+        purge.assert_any_call(['http://api.example.com/api/v2beta/pages/2/'])
 
     def test_unpublish_page_purges(self, purge):
         Page.objects.get(id=2).unpublish()
 
-        purge.assert_any_call('http://api.example.com/api/v2beta/pages/2/')
+        purge.assert_any_call(['http://api.example.com/api/v2beta/pages/2/'])
 
     def test_delete_page_purges(self, purge):
         Page.objects.get(id=16).delete()
 
-        purge.assert_any_call('http://api.example.com/api/v2beta/pages/16/')
+        purge.assert_any_call(['http://api.example.com/api/v2beta/pages/16/'])
 
     def test_save_draft_doesnt_purge(self, purge):
         Page.objects.get(id=2).save_revision()
@@ -1,23 +1,18 @@
 import logging
 import uuid
-from collections import defaultdict
-from urllib.error import HTTPError, URLError
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, urlunparse
-from urllib.request import Request, urlopen
 
 import requests
 from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
 
 from wagtail import __version__
 
 logger = logging.getLogger('wagtail.frontendcache')
 
 
-class PurgeRequest(Request):
-    def get_method(self):
-        return 'PURGE'
-
-
 class BaseBackend:
     def purge(self, url):
         raise NotImplementedError
@@ -33,8 +28,22 @@ class HTTPBackend(BaseBackend):
         location_url_parsed = urlparse(params.pop('LOCATION'))
         self.cache_scheme = location_url_parsed.scheme
         self.cache_netloc = location_url_parsed.netloc
-
-    def purge(self, url):
+        self.max_workers = params.pop('MAX_WORKERS', 8)
+        self.timeout = params.pop('TIMEOUT', 10)
+
+    def _get_session(self, pool_size=1):
+        # All requests go to the same cache server, so a single pool of
+        # keep-alive connections is shared between the requests of a batch
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        session.mount(self.cache_scheme + '://', adapter)
+        return session
+
+    def _purge_url(self, session, url):
+        """
+        Sends a PURGE request for the specified URL to the cache server.
+        Returns an error message if the purge failed, None otherwise.
+        """
         url_parsed = urlparse(url)
         host = url_parsed.hostname
 
@@ -42,27 +51,54 @@ class HTTPBackend(BaseBackend):
         if url_parsed.port:
             host += (':' + str(url_parsed.port))
 
-        request = PurgeRequest(
-            url=urlunparse([
-                self.cache_scheme,
-                self.cache_netloc,
-                url_parsed.path,
-                url_parsed.params,
-                url_parsed.query,
-                url_parsed.fragment
-            ]),
-            headers={
-                'Host': host,
-                'User-Agent': 'Wagtail-frontendcache/' + __version__
-            }
-        )
-
         try:
-            urlopen(request)
-        except HTTPError as e:
-            logger.error("Couldn't purge '%s' from HTTP cache. HTTPError: %d %s", url, e.code, e.reason)
-        except URLError as e:
-            logger.error("Couldn't purge '%s' from HTTP cache. URLError: %s", url, e.reason)
+            response = session.request(
+                'PURGE',
+                urlunparse([
+                    self.cache_scheme,
+                    self.cache_netloc,
+                    url_parsed.path,
+                    url_parsed.params,
+                    url_parsed.query,
+                    url_parsed.fragment
+                ]),
+                headers={
+                    'Host': host,
+                    'User-Agent': 'Wagtail-frontendcache/' + __version__
+                },
+                timeout=self.timeout
+            )
+        except requests.exceptions.RequestException as e:
+            return "RequestException: %s" % e
+
+        if response.status_code >= 400:
+            return "HTTPError: %d %s" % (response.status_code, response.reason)
+
+    def purge(self, url):
+        with self._get_session() as session:
+            error = self._purge_url(session, url)
+
+        if error:
+            logger.error("Couldn't purge '%s' from HTTP cache. %s", url, error)
+
+    def purge_batch(self, urls):
+        if not urls:
+            return
+
+        # Send the requests concurrently so that purging many URLs doesn't take
+        # the sum of all their round trips
+        pool_size = min(self.max_workers, len(urls))
+        with self._get_session(pool_size) as session:
+            with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                errors = list(executor.map(lambda url: self._purge_url(session, url), urls))
+
+        failures = [(url, error) for url, error in zip(urls, errors) if error]
+        if failures:
+            logger.error(
+                "Couldn't purge %d of %d URLs from HTTP cache:\n%s",
+                len(failures), len(urls),
+                "\n".join("'%s'. %s" % failure for failure in failures)
+            )
 
 
 class CloudflareBackend(BaseBackend):
@@ -125,6 +161,32 @@ class CloudfrontBackend(BaseBackend):
                 "The setting 'WAGTAILFRONTENDCACHE' requires the object 'DISTRIBUTION_ID'."
             )
 
+        # If set, groups of at least this many sibling paths are invalidated
+        # with a single wildcard path (CloudFront limits and charges for
+        # invalidations by the number of paths)
+        self.wildcard_threshold = params.pop('WILDCARD_THRESHOLD', None)
+
+    def _collapse_paths(self, paths):
+        """
+        Replaces groups of paths that share the same parent with a wildcard
+        path for that parent. For example, with a threshold of 3:
+
+        ['/blog/a/', '/blog/b/', '/blog/c/', '/about/'] => ['/blog/*', '/about/']
+        """
+        paths_by_parent = OrderedDict()
+        for path in paths:
+            parent = path.rstrip('/').rpartition('/')[0] + '/'
+            paths_by_parent.setdefault(parent, []).append(path)
+
+        collapsed_paths = []
+        for parent, sibling_paths in paths_by_parent.items():
+            if len(sibling_paths) >= self.wildcard_threshold:
+                collapsed_paths.append(parent + '*')
+            else:
+                collapsed_paths.extend(sibling_paths)
+
+        return collapsed_paths
+
     def purge_batch(self, urls):
         paths_by_distribution_id = defaultdict(list)
 
@@ -147,6 +209,11 @@ class CloudfrontBackend(BaseBackend):
                 paths_by_distribution_id[distribution_id].append(url_parsed.path)
 
         for distribution_id, paths in paths_by_distribution_id.items():
+            paths = list(OrderedDict.fromkeys(paths))
+
+            if self.wildcard_threshold:
+                paths = self._collapse_paths(paths)
+
             self._create_invalidation(distribution_id, paths)
 
     def purge(self, url):
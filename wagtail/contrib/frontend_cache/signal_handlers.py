@@ -1,15 +1,28 @@
 from django.apps import apps
 
-from wagtail.contrib.frontend_cache.utils import purge_page_from_cache
+from wagtail.contrib.frontend_cache.utils import PurgeBatch, purge_queue
 from wagtail.core.signals import page_published, page_unpublished
 
 
+def purge_page_on_commit(page):
+    # Find the URLs now, while the page is still in the database (it may be
+    # about to be deleted), but only purge them once the changes are
+    # committed so the cache can't be refilled with the old content. The
+    # queue also merges them with the URLs of any other pages changed in the
+    # same transaction
+    batch = PurgeBatch()
+    batch.add_page(page)
+
+    if batch.urls:
+        purge_queue.add_batch(batch)
+
+
 def page_published_signal_handler(instance, **kwargs):
-    purge_page_from_cache(instance)
+    purge_page_on_commit(instance)
 
 
 def page_unpublished_signal_handler(instance, **kwargs):
-    purge_page_from_cache(instance)
+    purge_page_on_commit(instance)
 
 
 def register_signal_handlers():
@@ -1,5 +1,7 @@
 import mock
+import requests
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.test import TestCase
 from django.test.utils import override_settings
 
@@ -10,7 +12,7 @@ from wagtail.core.models import Page
 from wagtail.tests.testapp.models import EventIndex
 
 from .utils import (
-    PurgeBatch, purge_page_from_cache, purge_pages_from_cache, purge_url_from_cache,
+    PurgeBatch, purge_page_from_cache, purge_pages_from_cache, purge_queue, purge_url_from_cache,
     purge_urls_from_cache)
 
 
@@ -86,6 +88,27 @@ class TestBackendConfiguration(TestCase):
 
         _create_invalidation.assert_called_once_with('frontend', ['/home/events/christmas/'])
 
+    @mock.patch('wagtail.contrib.frontend_cache.backends.CloudfrontBackend._create_invalidation')
+    def test_cloudfront_wildcard_threshold(self, _create_invalidation):
+        backends = get_backends(backend_settings={
+            'cloudfront': {
+                'BACKEND': 'wagtail.contrib.frontend_cache.backends.CloudfrontBackend',
+                'DISTRIBUTION_ID': 'frontend',
+                'WILDCARD_THRESHOLD': 3,
+            },
+        })
+        backends.get('cloudfront').purge_batch([
+            'http://www.wagtail.io/blog/a/',
+            'http://www.wagtail.io/about/',
+            'http://www.wagtail.io/blog/b/',
+            'http://www.wagtail.io/blog/c/',
+            'http://www.wagtail.io/blog/c/',
+            'http://www.wagtail.io/events/a/',
+            'http://www.wagtail.io/events/b/',
+        ])
+
+        _create_invalidation.assert_called_once_with('frontend', ['/blog/*', '/about/', '/events/a/', '/events/b/'])
+
     def test_multiple(self):
         backends = get_backends(backend_settings={
             'varnish': {
@@ -128,7 +151,76 @@ class TestBackendConfiguration(TestCase):
         self.assertEqual(backends['default'].cache_netloc, 'localhost:8000')
 
 
+def mock_response(status_code=200, reason='OK'):
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reason
+    return response
+
+
+class TestHTTPBackend(TestCase):
+    def setUp(self):
+        self.backend = HTTPBackend({'LOCATION': 'http://localhost:8000'})
+
+    @mock.patch('requests.Session.request', return_value=mock_response())
+    def test_purge(self, request):
+        self.backend.purge('http://www.example.com:8080/foo/?bar=baz')
+
+        request.assert_called_once_with(
+            'PURGE',
+            'http://localhost:8000/foo/?bar=baz',
+            headers={
+                'Host': 'www.example.com:8080',
+                'User-Agent': mock.ANY,
+            },
+            timeout=10
+        )
+
+    @mock.patch('requests.Session.request', return_value=mock_response())
+    def test_purge_with_timeout(self, request):
+        backend = HTTPBackend({'LOCATION': 'http://localhost:8000', 'TIMEOUT': 2})
+        backend.purge_batch(['http://www.example.com/foo/', 'http://www.example.com/bar/'])
+
+        self.assertEqual([call[1]['timeout'] for call in request.call_args_list], [2, 2])
+
+    @mock.patch('requests.Session.request', return_value=mock_response())
+    def test_purge_batch(self, request):
+        urls = ['http://www.example.com/%d/' % i for i in range(20)]
+
+        self.backend.purge_batch(urls)
+
+        self.assertEqual(request.call_count, 20)
+        self.assertEqual(
+            sorted(call[0][1] for call in request.call_args_list),
+            sorted('http://localhost:8000/%d/' % i for i in range(20))
+        )
+
+    @mock.patch('requests.Session.request')
+    def test_purge_batch_reports_failures_together(self, request):
+        def purge(method, url, headers, timeout):
+            if url.endswith('/missing/'):
+                return mock_response(404, 'Not Found')
+            if url.endswith('/down/'):
+                raise requests.exceptions.ConnectionError("Connection refused")
+            return mock_response()
+
+        request.side_effect = purge
+
+        with self.assertLogs('wagtail.frontendcache', level='ERROR') as logs:
+            self.backend.purge_batch([
+                'http://www.example.com/',
+                'http://www.example.com/missing/',
+                'http://www.example.com/down/',
+            ])
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("Couldn't purge 2 of 3 URLs from HTTP cache", logs.output[0])
+        self.assertIn("'http://www.example.com/missing/'. HTTPError: 404 Not Found", logs.output[0])
+        self.assertIn("'http://www.example.com/down/'. RequestException: Connection refused", logs.output[0])
+
+
 PURGED_URLS = []
+PURGE_BATCHES = []
 
 
 class MockBackend(BaseBackend):
@@ -138,6 +230,10 @@ class MockBackend(BaseBackend):
     def purge(self, url):
         PURGED_URLS.append(url)
 
+    def purge_batch(self, urls):
+        PURGE_BATCHES.append(urls)
+        super().purge_batch(urls)
+
 
 @override_settings(WAGTAILFRONTENDCACHE={
     'varnish': {
@@ -160,6 +256,10 @@ class TestCachePurgingFunctions(TestCase):
         purge_urls_from_cache(['http://localhost/foo', 'http://localhost/bar'])
         self.assertEqual(PURGED_URLS, ['http://localhost/foo', 'http://localhost/bar'])
 
+    def test_purge_urls_from_cache_removes_duplicates(self):
+        purge_urls_from_cache(['http://localhost/foo', 'http://localhost/bar', 'http://localhost/foo'])
+        self.assertEqual(PURGED_URLS, ['http://localhost/foo', 'http://localhost/bar'])
+
     def test_purge_page_from_cache(self):
         page = EventIndex.objects.get(url_path='/home/events/')
         purge_page_from_cache(page)
@@ -192,6 +292,12 @@ class TestCachePurgingSignals(TestCase):
         # Reset PURGED_URLS to an empty list
         PURGED_URLS[:] = []
 
+        # Purges are deferred until the transaction commits, which never
+        # happens inside a TestCase. Run them straight away instead
+        on_commit_patcher = mock.patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+        self.on_commit = on_commit_patcher.start()
+        self.addCleanup(on_commit_patcher.stop)
+
     def test_purge_on_publish(self):
         page = EventIndex.objects.get(url_path='/home/events/')
         page.save_revision().publish()
@@ -209,6 +315,20 @@ class TestCachePurgingSignals(TestCase):
         page.save_revision().publish()
         self.assertEqual(PURGED_URLS, [])
 
+    def test_purge_after_commit(self):
+        callbacks = []
+        self.on_commit.side_effect = callbacks.append
+
+        page = EventIndex.objects.get(url_path='/home/events/')
+        page.save_revision().publish()
+        self.assertEqual(PURGED_URLS, [])
+
+        # Commit
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(PURGED_URLS, ['http://localhost/events/', 'http://localhost/events/past/'])
+
     @override_settings(ROOT_URLCONF='wagtail.tests.urls_multilang',
                        LANGUAGE_CODE='en',
                        WAGTAILFRONTENDCACHE_LANGUAGES=['en'])
@@ -222,6 +342,78 @@ class TestCachePurgingSignals(TestCase):
             self.assertIn('http://localhost/%s/events/' % isocode, PURGED_URLS)
 
 
+@override_settings(WAGTAILFRONTENDCACHE={
+    'varnish': {
+        'BACKEND': 'wagtail.contrib.frontend_cache.tests.MockBackend',
+    },
+})
+class TestPurgeQueue(TestCase):
+
+    fixtures = ['test.json']
+
+    def setUp(self):
+        PURGED_URLS[:] = []
+        PURGE_BATCHES[:] = []
+
+    def commit(self):
+        # The test's transaction is never committed, so run the callbacks that
+        # would have run on commit
+        connection = transaction.get_connection()
+        callbacks = connection.run_on_commit
+        connection.run_on_commit = []
+
+        for sids, func in callbacks:
+            func()
+
+    def test_pages_published_in_one_transaction_are_purged_together(self):
+        for page in EventIndex.objects.all():
+            page.save_revision().publish()
+            page.save_revision().publish()
+
+        self.assertEqual(PURGED_URLS, [])
+
+        self.commit()
+
+        self.assertEqual(PURGE_BATCHES, [['http://localhost/events/', 'http://localhost/events/past/']])
+
+    def test_defer(self):
+        with purge_queue.defer():
+            purge_queue.add_urls(['http://localhost/foo', 'http://localhost/bar'])
+            purge_queue.add_urls(['http://localhost/foo'])
+            self.commit()
+
+            self.assertEqual(PURGED_URLS, [])
+
+        self.commit()
+
+        self.assertEqual(PURGE_BATCHES, [['http://localhost/foo', 'http://localhost/bar']])
+
+    def test_nested_defer(self):
+        with purge_queue.defer():
+            with purge_queue.defer():
+                purge_queue.add_urls(['http://localhost/foo'])
+
+            purge_queue.add_urls(['http://localhost/bar'])
+            self.commit()
+
+            self.assertEqual(PURGED_URLS, [])
+
+        self.assertEqual(PURGE_BATCHES, [['http://localhost/foo', 'http://localhost/bar']])
+
+    def test_urls_from_rolled_back_transaction_are_discarded(self):
+        try:
+            with transaction.atomic():
+                purge_queue.add_urls(['http://localhost/foo'])
+                raise ValueError
+        except ValueError:
+            pass
+
+        purge_queue.add_urls(['http://localhost/bar'])
+        self.commit()
+
+        self.assertEqual(PURGE_BATCHES, [['http://localhost/bar']])
+
+
 class TestPurgeBatchClass(TestCase):
     # Tests the .add_*() methods on PurgeBatch. The .purge() method is tested
     # by TestCachePurgingFunctions.test_purge_batch above
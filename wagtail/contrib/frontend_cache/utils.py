@@ -1,8 +1,12 @@
 import logging
 import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.utils.module_loading import import_string
 from django.utils.six.moves.urllib.parse import urlparse, urlunparse
 
@@ -90,6 +94,9 @@ def purge_urls_from_cache(urls, backend_settings=None, backends=None):
 
         urls = new_urls
 
+    # Remove duplicates
+    urls = list(OrderedDict.fromkeys(urls))
+
     for backend_name, backend in get_backends(backend_settings, backends).items():
         for url in urls:
             logger.info("[%s] Purging URL: %s", backend_name, url)
@@ -174,3 +181,89 @@ class PurgeBatch:
           will only be sent to these backends
         """
         purge_urls_from_cache(self.urls, backend_settings, backends)
+
+
+class PendingPurge:
+    """
+    The URLs added to a PurgeQueue during a transaction. It is registered with
+    ``transaction.on_commit``, so it is discarded along with the transaction if
+    that is rolled back.
+    """
+    def __init__(self, queue, urls):
+        self.queue = queue
+        self.urls = OrderedDict.fromkeys(urls)
+
+    def __call__(self):
+        self.queue.commit(self)
+
+
+class PurgeQueue(threading.local):
+    """
+    Collects URLs to be purged until the current database transaction is
+    committed, so that bulk operations (eg, publishing many pages at once)
+    purge each URL once and make a single ``purge_batch`` call per backend.
+
+    Outside of a transaction, URLs are purged straight away unless they are
+    added within a ``purge_queue.defer()`` block.
+
+    URLs added during a transaction that gets rolled back are discarded. URLs
+    added within a savepoint that gets rolled back are still purged if other
+    URLs were added earlier in the same transaction.
+    """
+    def __init__(self):
+        # URLs from committed transactions, or added outside of a transaction,
+        # that are waiting for the end of a defer() block
+        self.urls = OrderedDict()
+        self.defer_depth = 0
+
+        # The URLs added during the current transaction
+        self.pending = None
+
+    def add_urls(self, urls):
+        connection = transaction.get_connection()
+
+        if not connection.in_atomic_block:
+            self.urls.update(OrderedDict.fromkeys(urls))
+            self.flush()
+        elif self.pending is not None and any(func is self.pending for sids, func in connection.run_on_commit):
+            self.pending.urls.update(OrderedDict.fromkeys(urls))
+        else:
+            # There is no PendingPurge registered with this transaction yet (or
+            # the last one was discarded when its transaction was rolled back)
+            self.pending = PendingPurge(self, urls)
+            transaction.on_commit(self.pending)
+
+    def add_batch(self, batch):
+        self.add_urls(batch.urls)
+
+    def commit(self, pending):
+        if pending is self.pending:
+            self.pending = None
+
+        self.urls.update(pending.urls)
+        self.flush()
+
+    def flush(self):
+        if self.defer_depth or not self.urls:
+            return
+
+        urls = list(self.urls)
+        self.urls.clear()
+        purge_urls_from_cache(urls)
+
+    @contextmanager
+    def defer(self):
+        """
+        Holds back all the URLs added within the block and purges them together
+        at the end of it (or when the transaction is committed, if the block
+        is inside a transaction)
+        """
+        self.defer_depth += 1
+        try:
+            yield
+        finally:
+            self.defer_depth -= 1
+            self.flush()
+
+
+purge_queue = PurgeQueue()
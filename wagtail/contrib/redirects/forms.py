@@ -41,4 +41,20 @@ class RedirectForm(forms.ModelForm):
 
     class Meta:
         model = Redirect
-        fields = ('old_path', 'site', 'is_permanent', 'redirect_page', 'redirect_link')
+        fields = ('old_path', 'site', 'is_permanent', 'match_subpaths', 'redirect_page', 'redirect_link')
+
+
+class ImportForm(forms.Form):
+    file = forms.FileField(
+        label=_("File"),
+        help_text=_(
+            "A CSV or Excel (.xlsx) file with two columns: the path to redirect from, and the path "
+            "or URL to redirect to. Existing redirects from the same paths will be replaced."
+        )
+    )
+    site = forms.ModelChoiceField(
+        label=_("From site"), queryset=Site.objects.all(), required=False, empty_label=_("All sites")
+    )
+    is_permanent = forms.BooleanField(label=_("Permanent"), required=False, initial=True)
+
+    required_css_class = "required"
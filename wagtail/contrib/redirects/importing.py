@@ -0,0 +1,369 @@
+"""
+Imports redirects in bulk from CSV or Excel files, for the import_redirects management
+command and the import view in the admin.
+
+Rows are read and checked one at a time, and only the normalised path and target of each
+redirect are kept in memory. Once the whole file has been checked, chains of redirects
+within it are collapsed and the redirects are inserted in batches, in a single transaction.
+Chains that continue through redirects already in the database are collapsed too, and
+targets that are the paths of pages are saved as redirects to those pages.
+"""
+
+import codecs
+import csv
+import zipfile
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.db.models import Q
+from django.utils.translation import ugettext as _
+
+from wagtail.contrib.redirects.lookup import invalidate_redirect_table_on_commit
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.core.models import Page, Site
+
+# The number of redirects that are inserted at once
+BATCH_SIZE = 1000
+
+# Stop checking a file after this many errors
+MAX_ERRORS = 100
+
+
+class RedirectImportError(ValueError):
+    """
+    Raised when a file of redirects can't be imported. The errors attribute is a list
+    of the problems found, with their line numbers.
+    """
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def read_csv(file):
+    """
+    Yields the rows of a CSV file that has been opened in binary mode
+    """
+    line_number = 0
+    try:
+        for line_number, row in enumerate(csv.reader(codecs.iterdecode(file, 'utf-8-sig')), 1):
+            yield row
+    except UnicodeDecodeError:
+        raise RedirectImportError([_("Line %(line_number)d: the file is not encoded as UTF-8.") % {
+            'line_number': line_number + 1
+        }])
+    except csv.Error as e:
+        raise RedirectImportError([_("Line %(line_number)d: the file is not valid CSV (%(error)s).") % {
+            'line_number': line_number + 1, 'error': e
+        }])
+
+
+def read_xlsx(file):
+    """
+    Yields the rows of the first worksheet of an Excel file
+    """
+    try:
+        import openpyxl
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise RedirectImportError([_("Importing Excel files requires the openpyxl package.")])
+
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True)
+    except (zipfile.BadZipFile, InvalidFileException):
+        raise RedirectImportError([_("The file is not a valid Excel file.")])
+
+    for row in workbook.active.iter_rows():
+        yield ['' if cell.value is None else str(cell.value) for cell in row]
+
+
+def read_rows(file, filename):
+    """
+    Yields the rows of a CSV or Excel file, depending on its filename
+    """
+    if filename.lower().endswith('.xlsx'):
+        return read_xlsx(file)
+    else:
+        return read_csv(file)
+
+
+def is_valid_target(target):
+    """
+    Returns True if target is something a redirect can point to: a path on this site,
+    or an absolute URL
+    """
+    if target.startswith('/'):
+        return True
+
+    try:
+        URLValidator()(target)
+    except ValidationError:
+        return False
+    return True
+
+
+def read_redirects(rows):
+    """
+    Takes an iterable of rows, each made up of the path to redirect from and the path
+    or URL to redirect to, and returns a dict of normalised old paths to targets. The
+    first row is skipped if it is a header row. Raises RedirectImportError if any row is
+    invalid.
+    """
+    old_path_max_length = Redirect._meta.get_field('old_path').max_length
+    target_max_length = Redirect._meta.get_field('redirect_link').max_length
+
+    targets = {}
+    line_numbers = {}
+    errors = []
+
+    for line_number, row in enumerate(rows, 1):
+        row = [cell.strip() for cell in row]
+        if not any(row):
+            continue
+
+        if len(row) < 2 or not row[0] or not row[1]:
+            errors.append(_("Line %(line_number)d: expected a path to redirect from and a path or URL to redirect to.") % {
+                'line_number': line_number
+            })
+        elif not is_valid_target(row[1]):
+            if line_number == 1 and not row[0].startswith('/'):
+                # This is a header row, such as "From,To"
+                continue
+
+            errors.append(_("Line %(line_number)d: '%(target)s' is not a valid path or URL.") % {
+                'line_number': line_number, 'target': row[1]
+            })
+        else:
+            old_path = Redirect.normalise_path(row[0])
+
+            if len(old_path) > old_path_max_length or len(row[1]) > target_max_length:
+                errors.append(_("Line %(line_number)d: paths and URLs can be at most %(max_length)d characters long.") % {
+                    'line_number': line_number, 'max_length': min(old_path_max_length, target_max_length)
+                })
+            elif old_path in targets:
+                errors.append(_("Line %(line_number)d: '%(old_path)s' is already redirected on line %(other_line_number)d.") % {
+                    'line_number': line_number, 'old_path': old_path, 'other_line_number': line_numbers[old_path]
+                })
+            else:
+                targets[old_path] = row[1]
+                line_numbers[old_path] = line_number
+
+        if len(errors) >= MAX_ERRORS:
+            break
+
+    if errors:
+        raise RedirectImportError(errors)
+
+    collapse_chains(targets, line_numbers)
+    return targets
+
+
+def collapse_chains(targets, line_numbers):
+    """
+    Points each redirect in the targets dict that leads to another redirect in the dict
+    straight at the final target, so that clients don't have to follow each step (eg A -> B
+    and B -> C becomes A -> C and B -> C). Raises RedirectImportError if there are loops.
+    """
+    errors = []
+    final_targets = {}
+
+    for old_path in targets:
+        if old_path in final_targets:
+            continue
+
+        chain = []
+        path = old_path
+        while path in targets and path not in final_targets and path not in chain:
+            chain.append(path)
+            target = targets[path]
+            path = Redirect.normalise_path(target) if target.startswith('/') else None
+
+        if path in chain:
+            # The chain leads back to one of its own paths
+            final_target = None
+        elif path in final_targets:
+            # The chain leads to a path whose final target we've already found
+            final_target = final_targets[path]
+        else:
+            # The chain ends at a path that isn't redirected, or an absolute URL
+            final_target = targets[chain[-1]]
+
+        final_targets.update((path_in_chain, final_target) for path_in_chain in chain)
+
+        if final_target is None:
+            errors.append(_("Line %(line_number)d: '%(old_path)s' leads to a redirect loop.") % {
+                'line_number': line_numbers[old_path], 'old_path': old_path
+            })
+
+    if errors:
+        raise RedirectImportError(errors[:MAX_ERRORS])
+
+    targets.update(final_targets)
+
+
+def get_existing_redirects(site, paths):
+    """
+    Returns a dict of the given paths to the redirects in the database that apply to
+    them on the given site (or on all sites if site is None)
+    """
+    if site is None:
+        redirects = Redirect.objects.filter(site=None)
+    else:
+        redirects = Redirect.objects.filter(Q(site=site) | Q(site=None))
+
+    existing_redirects = {}
+    paths = list(paths)
+    for i in range(0, len(paths), BATCH_SIZE):
+        for redirect in redirects.filter(old_path__in=paths[i:i + BATCH_SIZE]):
+            # Redirects for the site take precedence over redirects for all sites
+            if redirect.site_id is not None or redirect.old_path not in existing_redirects:
+                existing_redirects[redirect.old_path] = redirect
+
+    return existing_redirects
+
+
+def get_target_pages(site, paths):
+    """
+    Returns a dict of the given paths to the ids of the pages served at them on the given
+    site (or on the default site if site is None)
+    """
+    if site is None:
+        site = Site.objects.filter(is_default_site=True).select_related('root_page').first()
+        if site is None:
+            return {}
+
+    root_url_path = site.root_page.url_path
+    url_paths = {}
+    for path in paths:
+        # Pages are served at their url_path, below the site's root page
+        if path != '/' and '?' not in path and ';' not in path:
+            url_paths[root_url_path + path[1:] + '/'] = path
+    url_paths[root_url_path] = '/'
+
+    page_ids = {}
+    url_path_list = list(url_paths.keys())
+    for i in range(0, len(url_path_list), BATCH_SIZE):
+        pages = Page.objects.filter(url_path__in=url_path_list[i:i + BATCH_SIZE]).values_list('url_path', 'pk')
+        for url_path, pk in pages:
+            if url_paths[url_path] in paths:
+                page_ids[url_paths[url_path]] = pk
+
+    return page_ids
+
+
+def resolve_targets(targets, site=None):
+    """
+    Takes a dict of old paths to collapsed targets (see read_redirects) and returns a dict
+    of the same paths to (page id, link) tuples. Chains that lead through redirects already
+    in the database are followed to their final target, and targets that are the paths of
+    pages are replaced with those pages. Raises RedirectImportError if any of the chains
+    loop.
+    """
+    resolved = {}
+    visited = {}
+    cursors = {}
+
+    for old_path, target in targets.items():
+        resolved[old_path] = (None, target)
+        if target.startswith('/'):
+            visited[old_path] = {old_path}
+            cursors[old_path] = Redirect.normalise_path(target)
+
+    # Follow the chains one step at a time, looking up the next step of all of them at once
+    errors = []
+    while cursors:
+        existing_redirects = get_existing_redirects(site, set(cursors.values()) - set(targets.keys()))
+        next_cursors = {}
+
+        for old_path, path in cursors.items():
+            if path in visited[old_path]:
+                errors.append(old_path)
+                continue
+            visited[old_path].add(path)
+
+            redirect = existing_redirects.get(path)
+
+            if path in targets:
+                # The redirect from this path is being replaced by the imported one
+                target_page_id, target = None, targets[path]
+            elif redirect is not None and (redirect.redirect_page_id or redirect.redirect_link):
+                target_page_id, target = redirect.redirect_page_id, redirect.redirect_link
+            else:
+                continue
+
+            resolved[old_path] = (target_page_id, '' if target_page_id else target)
+            if target_page_id is None and target.startswith('/'):
+                next_cursors[old_path] = Redirect.normalise_path(target)
+
+        cursors = next_cursors
+
+    if errors:
+        raise RedirectImportError([
+            _("'%(old_path)s' leads to a redirect loop through existing redirects.") % {'old_path': old_path}
+            for old_path in sorted(errors)[:MAX_ERRORS]
+        ])
+
+    # Redirect to pages rather than to their paths, so that the redirects still work if the
+    # pages are moved, and can be edited in the admin (which only accepts absolute URLs)
+    link_paths = {
+        old_path: Redirect.normalise_path(link)
+        for old_path, (page_id, link) in resolved.items() if page_id is None and link.startswith('/')
+    }
+    page_ids = get_target_pages(site, set(link_paths.values()))
+    for old_path, path in link_paths.items():
+        if path in page_ids:
+            resolved[old_path] = (page_ids[path], '')
+
+    return resolved
+
+
+def update_existing_redirects(site, resolved):
+    """
+    Points the redirects already in the database that lead to one of the imported paths
+    straight at its final target
+    """
+    old_paths = [old_path for old_path in resolved.keys() if '?' not in old_path]
+    redirects = Redirect.objects.filter(site=site).exclude(old_path__in=resolved.keys())
+
+    for i in range(0, len(old_paths), BATCH_SIZE):
+        batch = old_paths[i:i + BATCH_SIZE]
+        links = batch + [old_path + '/' for old_path in batch if old_path != '/']
+
+        redirect_ids_by_target = {}
+        for pk, link in redirects.filter(redirect_page=None, redirect_link__in=links).values_list('pk', 'redirect_link'):
+            redirect_ids_by_target.setdefault(resolved[Redirect.normalise_path(link)], []).append(pk)
+
+        for (page_id, link), redirect_ids in redirect_ids_by_target.items():
+            Redirect.objects.filter(pk__in=redirect_ids).update(redirect_page_id=page_id, redirect_link=link)
+
+
+def import_redirects(rows, site=None, is_permanent=True):
+    """
+    Imports the redirects in the given rows (see read_redirects) for the given site, or
+    for all sites if site is None. Existing redirects from the same paths are replaced.
+    Nothing is imported if any row is invalid. Returns the number of redirects imported.
+    """
+    targets = read_redirects(rows)
+    old_paths = list(targets.keys())
+
+    with transaction.atomic():
+        resolved = resolve_targets(targets, site)
+
+        for i in range(0, len(old_paths), BATCH_SIZE):
+            batch = old_paths[i:i + BATCH_SIZE]
+
+            Redirect.objects.filter(site=site, old_path__in=batch).delete()
+            Redirect.objects.bulk_create([
+                Redirect(
+                    old_path=old_path, site=site, is_permanent=is_permanent,
+                    redirect_page_id=resolved[old_path][0], redirect_link=resolved[old_path][1]
+                )
+                for old_path in batch
+            ])
+
+        update_existing_redirects(site, resolved)
+
+    # bulk_create doesn't send post_save signals
+    invalidate_redirect_table_on_commit()
+
+    return len(old_paths)
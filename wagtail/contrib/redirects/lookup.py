@@ -0,0 +1,195 @@
+"""
+Finds the redirect for a request path.
+
+Every path that a redirect could have been saved under is looked up at once: the path
+itself, its unquoted form and the same again without the query string, then any
+redirects with match_subpaths set on the path or one of its ancestors.
+
+When the WAGTAILREDIRECTS_TABLE_TIMEOUT setting is set, the redirects are compiled into
+a RedirectTable held in the memory of each process, so that paths with no redirect (most
+often 404s from bots) don't hit the database at all. The table is rebuilt when a version
+key in the default cache changes, which happens whenever a redirect is saved or deleted,
+and at least once every WAGTAILREDIRECTS_TABLE_TIMEOUT seconds.
+"""
+
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils.encoding import uri_to_iri
+
+from wagtail.contrib.redirects.models import Redirect
+
+VERSION_CACHE_KEY = 'wagtail_redirects_version'
+
+# The (table, version, time loaded) tuple for this process. This is replaced as a whole
+# so that threads always see a consistent table
+REDIRECT_TABLE = None
+
+
+def get_table_timeout():
+    """
+    Returns the maximum number of seconds that a process keeps its redirect table for,
+    or None if redirects are looked up in the database instead
+    """
+    return getattr(settings, 'WAGTAILREDIRECTS_TABLE_TIMEOUT', None)
+
+
+def get_ancestor_paths(path):
+    """
+    Returns the given path and the paths of its ancestors, deepest first.
+    eg '/foo/bar' gives ['/foo/bar', '/foo', '/']
+    """
+    paths = [path]
+    while True:
+        parent_path = path.rsplit('/', 1)[0] or '/'
+        if parent_path == path:
+            return paths
+
+        paths.append(parent_path)
+        path = parent_path
+
+
+def get_candidate_paths(path):
+    """
+    Takes a normalised path and returns the old_path values of the redirects that could
+    match it, in order of preference, as a tuple of (exact paths, subpath paths).
+    Exact paths are compared against all redirects, and subpath paths against redirects
+    with match_subpaths set.
+    """
+    path_without_query = urlparse(path).path
+
+    exact_paths = []
+    for candidate in [path, uri_to_iri(path), path_without_query, uri_to_iri(path_without_query)]:
+        # reject URLs with null characters, which crash on Postgres (#4496)
+        if '\0' not in candidate and candidate not in exact_paths:
+            exact_paths.append(candidate)
+
+    subpath_paths = []
+    for base_path in [path_without_query, uri_to_iri(path_without_query)]:
+        for candidate in get_ancestor_paths(base_path):
+            if '\0' not in candidate and candidate not in subpath_paths:
+                subpath_paths.append(candidate)
+
+    # Prefer the deepest match, whether it was quoted or not
+    subpath_paths.sort(key=lambda candidate: -candidate.rstrip('/').count('/'))
+
+    return exact_paths, subpath_paths
+
+
+class RedirectTable:
+    """
+    An in-memory index of redirects, which finds the redirect for a path with a
+    dictionary lookup for each of its candidate paths
+    """
+    def __init__(self, redirects):
+        """
+        Takes an iterable of (id, old_path, site_id, match_subpaths) tuples
+        """
+        # Maps site ids (or None, for redirects from any site) to dicts of old_path -> id
+        self.exact_paths = defaultdict(dict)
+        self.subpath_paths = defaultdict(dict)
+
+        for redirect_id, old_path, site_id, match_subpaths in redirects:
+            paths = self.subpath_paths if match_subpaths else self.exact_paths
+            paths[site_id][old_path] = redirect_id
+
+    def find(self, site_id, candidate_paths):
+        """
+        Returns the id of the redirect for the given candidate paths (as returned by
+        get_candidate_paths), or None if there isn't one. For each path, a redirect
+        for the given site is preferred over one for any site.
+        """
+        exact_paths, subpath_paths = candidate_paths
+
+        for paths, paths_by_site in [(exact_paths, self.exact_paths), (subpath_paths, self.subpath_paths)]:
+            if site_id is None:
+                # No site matched the request, so try the redirects for any site, and
+                # failing that, those for specific sites
+                site_ids = [None] + [key for key in paths_by_site.keys() if key is not None]
+            else:
+                site_ids = [site_id, None]
+
+            site_paths = [paths_by_site[key] for key in site_ids if key in paths_by_site]
+            for path in paths:
+                for redirects in site_paths:
+                    if path in redirects:
+                        return redirects[path]
+
+        return None
+
+
+def invalidate_redirect_table():
+    """
+    Changes the version of the redirect table, so that every process rebuilds its
+    table before looking up another redirect
+    """
+    # Use a random version rather than a counter so that a table built under an old
+    # version can't be mistaken for the current one if the version key is evicted
+    version = uuid.uuid4().hex
+    cache.set(VERSION_CACHE_KEY, version, None)
+    return version
+
+
+def invalidate_redirect_table_on_commit():
+    """
+    Invalidates the redirect table now, and again once the current transaction is
+    committed. Other processes could otherwise rebuild their table from the redirects
+    as they were before the commit, and keep it under the new version.
+    """
+    invalidate_redirect_table()
+    transaction.on_commit(invalidate_redirect_table)
+
+
+def get_redirect_table():
+    """
+    Returns this process's RedirectTable, rebuilding it if it is out of date
+    """
+    global REDIRECT_TABLE
+
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = invalidate_redirect_table()
+
+    if REDIRECT_TABLE is not None:
+        table, table_version, loaded_at = REDIRECT_TABLE
+        if table_version == version and time.monotonic() - loaded_at < get_table_timeout():
+            return table
+
+    table = RedirectTable(
+        Redirect.objects.values_list('id', 'old_path', 'site_id', 'match_subpaths').iterator()
+    )
+    REDIRECT_TABLE = (table, version, time.monotonic())
+    return table
+
+
+def get_redirect(site, path):
+    """
+    Returns the Redirect to use for the given site (which may be None) and normalised
+    path, or None if there isn't one
+    """
+    candidate_paths = get_candidate_paths(path)
+    exact_paths, subpath_paths = candidate_paths
+    if not exact_paths and not subpath_paths:
+        return None
+
+    if get_table_timeout():
+        table = get_redirect_table()
+    else:
+        table = RedirectTable(
+            Redirect.get_for_site(site).filter(
+                Q(old_path__in=exact_paths) | Q(match_subpaths=True, old_path__in=subpath_paths)
+            ).values_list('id', 'old_path', 'site_id', 'match_subpaths')
+        )
+
+    redirect_id = table.find(site.pk if site else None, candidate_paths)
+    if redirect_id is None:
+        return None
+
+    # The redirect may have been deleted since the table was built
+    return Redirect.objects.filter(pk=redirect_id).first()
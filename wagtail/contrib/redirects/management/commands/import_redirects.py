@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wagtail.contrib.redirects.importing import RedirectImportError, import_redirects, read_rows
+from wagtail.core.models import Site
+
+
+class Command(BaseCommand):
+    help = "Imports redirects from a CSV or Excel (.xlsx) file with two columns: the path to redirect from, and the path or URL to redirect to."
+
+    def add_arguments(self, parser):
+        # Positional arguments
+        parser.add_argument('file')
+
+        parser.add_argument(
+            '--site', type=int, dest='site_id', default=None,
+            help="The ID of the site to import the redirects for. By default, they apply to all sites.")
+        parser.add_argument(
+            '--temporary', action='store_false', dest='is_permanent', default=True,
+            help="Import the redirects as temporary rather than permanent.")
+
+    def handle(self, *args, **options):
+        site = None
+        if options['site_id'] is not None:
+            try:
+                site = Site.objects.get(id=options['site_id'])
+            except Site.DoesNotExist:
+                raise CommandError("Site %d does not exist." % options['site_id'])
+
+        with open(options['file'], 'rb') as f:
+            try:
+                count = import_redirects(read_rows(f, options['file']), site=site, is_permanent=options['is_permanent'])
+            except RedirectImportError as e:
+                raise CommandError("No redirects were imported:\n%s" % '\n'.join(e.errors))
+
+        self.stdout.write("imported %d redirects" % count)
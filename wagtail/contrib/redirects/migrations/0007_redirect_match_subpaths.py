@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailredirects', '0006_redirect_increase_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='redirect',
+            name='match_subpaths',
+            field=models.BooleanField(default=False, help_text="Also redirect any path that begins with the 'Redirect from' path, such as /blog/2018/my-post for /blog/2018.", verbose_name='redirect subpaths'),
+        ),
+    ]
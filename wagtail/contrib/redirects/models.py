@@ -25,6 +25,10 @@ class Redirect(models.Model):
         on_delete=models.CASCADE
     )
     redirect_link = models.URLField(verbose_name=_("redirect to any URL"), blank=True, max_length=255)
+    match_subpaths = models.BooleanField(verbose_name=_("redirect subpaths"), default=False, help_text=_(
+        "Also redirect any path that begins with the 'Redirect from' path, "
+        "such as /blog/2018/my-post for /blog/2018."
+    ))
 
     @property
     def title(self):
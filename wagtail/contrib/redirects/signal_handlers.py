@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+
+from wagtail.contrib.redirects.lookup import invalidate_redirect_table_on_commit
+from wagtail.contrib.redirects.models import Redirect
+
+
+def redirect_changed_signal_handler(**kwargs):
+    # Make every process rebuild its redirect table
+    invalidate_redirect_table_on_commit()
+
+
+def register_signal_handlers():
+    post_save.connect(redirect_changed_signal_handler, sender=Redirect)
+    post_delete.connect(redirect_changed_signal_handler, sender=Redirect)
@@ -1,8 +1,21 @@
 # -*- coding: utf-8 -*-
+import os
+import tempfile
+from io import BytesIO, StringIO
+
+import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core import management
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from wagtail.contrib.redirects import models
+from wagtail.contrib.redirects.importing import (
+    RedirectImportError, import_redirects, read_redirects, read_rows)
+from wagtail.contrib.redirects.lookup import VERSION_CACHE_KEY, get_candidate_paths, get_redirect
 from wagtail.core.models import Page, Site
 from wagtail.tests.utils import WagtailTestUtils
 
@@ -286,6 +299,126 @@ class TestRedirects(TestCase):
         response = self.client.get('/test/?foo=\0bar')
         self.assertEqual(response.status_code, 404)
 
+    def test_redirect_subpaths(self):
+        models.Redirect.objects.create(old_path='/blog', redirect_link='/news', match_subpaths=True)
+
+        for path in ['/blog/', '/blog/2018/my-post/', '/blog/2018/?page=2']:
+            response = self.client.get(path)
+            self.assertRedirects(response, '/news', status_code=301, fetch_redirect_response=False)
+
+        response = self.client.get('/blogs/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_redirect_subpaths_prefers_deepest_match(self):
+        models.Redirect.objects.create(old_path='/blog', redirect_link='/news', match_subpaths=True)
+        models.Redirect.objects.create(old_path='/blog/2018', redirect_link='/news/2018', match_subpaths=True)
+        models.Redirect.objects.create(old_path='/blog/2018/my-post', redirect_link='/my-post')
+
+        response = self.client.get('/blog/2018/my-post/')
+        self.assertRedirects(response, '/my-post', status_code=301, fetch_redirect_response=False)
+
+        response = self.client.get('/blog/2018/other-post/')
+        self.assertRedirects(response, '/news/2018', status_code=301, fetch_redirect_response=False)
+
+        response = self.client.get('/blog/2017/other-post/')
+        self.assertRedirects(response, '/news', status_code=301, fetch_redirect_response=False)
+
+    def test_redirect_subpaths_from_specific_site(self):
+        contact_page = Page.objects.get(url_path='/home/contact-us/')
+        site = Site.objects.create(hostname='other.example.com', port=80, root_page=contact_page)
+
+        models.Redirect.objects.create(old_path='/blog', redirect_link='/generic', match_subpaths=True)
+        models.Redirect.objects.create(site=site, old_path='/blog', redirect_link='/site-specific', match_subpaths=True)
+
+        response = self.client.get('/blog/my-post/', HTTP_HOST='other.example.com')
+        self.assertRedirects(response, '/site-specific', status_code=301, fetch_redirect_response=False)
+
+        response = self.client.get('/blog/my-post/')
+        self.assertRedirects(response, '/generic', status_code=301, fetch_redirect_response=False)
+
+
+class TestGetRedirect(TestCase):
+    fixtures = ['test.json']
+
+    def test_candidate_paths(self):
+        exact_paths, subpath_paths = get_candidate_paths('/t%C3%A9st/page?foo=bar')
+        self.assertEqual(exact_paths, [
+            '/t%C3%A9st/page?foo=bar', '/tést/page?foo=bar', '/t%C3%A9st/page', '/tést/page'
+        ])
+        self.assertEqual(subpath_paths, ['/t%C3%A9st/page', '/tést/page', '/t%C3%A9st', '/tést', '/'])
+
+    def test_lookup_is_a_single_query(self):
+        site = Site.objects.get(is_default_site=True)
+        redirect = models.Redirect.objects.create(old_path='/redirectme', redirect_link='/redirectto')
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_redirect(site, '/doesnotexist?foo=bar'))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(get_redirect(site, '/redirectme?foo=bar'), redirect)
+
+
+@override_settings(
+    WAGTAILREDIRECTS_TABLE_TIMEOUT=300,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class TestRedirectTable(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        self.site = Site.objects.get(is_default_site=True)
+
+    def test_lookup_without_redirect_does_not_query_database(self):
+        models.Redirect.objects.create(old_path='/redirectme', redirect_link='/redirectto')
+        get_redirect(self.site, '/doesnotexist')
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_redirect(self.site, '/doesnotexist/either'))
+
+    def test_table_is_rebuilt_when_redirects_change(self):
+        self.assertIsNone(get_redirect(self.site, '/redirectme'))
+
+        redirect = models.Redirect.objects.create(old_path='/redirectme', redirect_link='/redirectto')
+        self.assertEqual(get_redirect(self.site, '/redirectme'), redirect)
+
+        redirect.old_path = '/redirectme-instead'
+        redirect.save()
+        self.assertIsNone(get_redirect(self.site, '/redirectme'))
+        self.assertEqual(get_redirect(self.site, '/redirectme-instead'), redirect)
+
+        redirect.delete()
+        self.assertIsNone(get_redirect(self.site, '/redirectme-instead'))
+
+    def test_table_is_invalidated_again_on_commit(self):
+        get_redirect(self.site, '/redirectme')
+
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            models.Redirect.objects.create(old_path='/redirectme', redirect_link='/redirectto')
+
+        # Other processes may rebuild their tables before the redirect is committed
+        version = cache.get(VERSION_CACHE_KEY)
+        on_commit.call_args[0][0]()
+        self.assertNotEqual(cache.get(VERSION_CACHE_KEY), version)
+
+    def test_table_is_rebuilt_after_timeout(self):
+        get_redirect(self.site, '/redirectme')
+
+        # Bypass the signal handlers, as another process's cache would
+        models.Redirect.objects.bulk_create([models.Redirect(old_path='/redirectme', redirect_link='/redirectto')])
+        self.assertIsNone(get_redirect(self.site, '/redirectme'))
+
+        with override_settings(WAGTAILREDIRECTS_TABLE_TIMEOUT=-1):
+            self.assertIsNotNone(get_redirect(self.site, '/redirectme'))
+
+
+@override_settings(WAGTAILREDIRECTS_TABLE_TIMEOUT=300)
+class TestRedirectsWithTable(TestRedirects):
+    """
+    Runs the redirect tests against the in-memory redirect table
+    """
+    pass
+
 
 class TestRedirectsIndexView(TestCase, WagtailTestUtils):
     def setUp(self):
@@ -570,3 +703,203 @@ class TestRedirectsDeleteView(TestCase, WagtailTestUtils):
         # Check that the redirect was deleted
         redirects = models.Redirect.objects.filter(old_path='/test')
         self.assertEqual(redirects.count(), 0)
+
+
+class TestImportRedirects(TestCase):
+    fixtures = ['test.json']
+
+    def test_read_redirects(self):
+        targets = read_redirects([
+            ['From', 'To'],
+            ['/old/', 'http://www.example.com/'],
+            [],
+            [' /other?b=2&a=1 ', '/new/'],
+        ])
+        self.assertEqual(targets, {'/old': 'http://www.example.com/', '/other?a=1&b=2': '/new/'})
+
+    def test_invalid_rows(self):
+        with self.assertRaises(RedirectImportError) as cm:
+            read_redirects([
+                ['/old', 'http://www.example.com/'],
+                ['/missing-target'],
+                ['/invalid-target', 'not a url'],
+                ['/old/', '/new'],
+            ])
+
+        self.assertEqual(cm.exception.errors, [
+            "Line 2: expected a path to redirect from and a path or URL to redirect to.",
+            "Line 3: 'not a url' is not a valid path or URL.",
+            "Line 4: '/old' is already redirected on line 1.",
+        ])
+
+    def test_chains_are_collapsed(self):
+        targets = read_redirects([
+            ['/a', '/b/'],
+            ['/b', '/c'],
+            ['/c', 'http://www.example.com/'],
+            ['/d', '/a'],
+            ['/e', '/f'],
+        ])
+        self.assertEqual(targets, {
+            '/a': 'http://www.example.com/',
+            '/b': 'http://www.example.com/',
+            '/c': 'http://www.example.com/',
+            '/d': 'http://www.example.com/',
+            '/e': '/f',
+        })
+
+    def test_loops(self):
+        with self.assertRaises(RedirectImportError) as cm:
+            read_redirects([
+                ['/a', '/b'],
+                ['/b', '/a'],
+                ['/c', '/a'],
+                ['/d', '/d/'],
+            ])
+
+        self.assertEqual(cm.exception.errors, [
+            "Line 1: '/a' leads to a redirect loop.",
+            "Line 3: '/c' leads to a redirect loop.",
+            "Line 4: '/d' leads to a redirect loop.",
+        ])
+
+    def test_import_redirects(self):
+        site = Site.objects.get(is_default_site=True)
+        models.Redirect.objects.create(old_path='/a', site=site, redirect_link='/replaced')
+        models.Redirect.objects.create(old_path='/a', redirect_link='/other-site')
+
+        count = import_redirects([['/a', '/b'], ['/b', '/c']], site=site, is_permanent=False)
+        self.assertEqual(count, 2)
+
+        self.assertEqual(
+            set(models.Redirect.objects.filter(site=site).values_list('old_path', 'redirect_link', 'is_permanent')),
+            {('/a', '/c', False), ('/b', '/c', False)}
+        )
+        self.assertTrue(models.Redirect.objects.filter(site=None, old_path='/a', redirect_link='/other-site').exists())
+
+    def test_paths_of_pages_are_imported_as_redirects_to_pages(self):
+        site = Site.objects.get(is_default_site=True)
+        events_index = Page.objects.get(url_path='/home/events/')
+
+        import_redirects([['/a', '/events/'], ['/b', '/not-a-page']], site=site)
+
+        redirect = models.Redirect.objects.get(old_path='/a')
+        self.assertEqual(redirect.redirect_page, events_index)
+        self.assertEqual(redirect.redirect_link, '')
+        self.assertEqual(models.Redirect.objects.get(old_path='/b').redirect_link, '/not-a-page')
+
+    def test_chains_through_existing_redirects_are_collapsed(self):
+        site = Site.objects.get(is_default_site=True)
+        events_index = Page.objects.get(url_path='/home/events/')
+        models.Redirect.objects.create(old_path='/b', site=site, redirect_link='/c')
+        models.Redirect.objects.create(old_path='/c', redirect_page=events_index)
+        models.Redirect.objects.create(old_path='/x', site=site, redirect_link='/a/')
+
+        import_redirects([['/a', '/b'], ['/d', 'http://www.example.com/']], site=site)
+
+        # New redirects to existing redirects go straight to their final target
+        self.assertEqual(models.Redirect.objects.get(old_path='/a').redirect_page, events_index)
+
+        # Existing redirects to the imported paths too
+        self.assertEqual(models.Redirect.objects.get(old_path='/x').redirect_page, events_index)
+
+    def test_loops_through_existing_redirects(self):
+        site = Site.objects.get(is_default_site=True)
+        models.Redirect.objects.create(old_path='/b', site=site, redirect_link='/a')
+
+        with self.assertRaises(RedirectImportError) as cm:
+            import_redirects([['/a', '/b']], site=site)
+
+        self.assertEqual(cm.exception.errors, ["'/a' leads to a redirect loop through existing redirects."])
+        self.assertFalse(models.Redirect.objects.filter(old_path='/a').exists())
+
+    def test_nothing_is_imported_if_a_row_is_invalid(self):
+        with self.assertRaises(RedirectImportError):
+            import_redirects([['/a', '/b'], ['/b', 'not a url']])
+
+        self.assertFalse(models.Redirect.objects.exists())
+
+    def test_csv_file_that_is_not_utf8(self):
+        with self.assertRaises(RedirectImportError) as e:
+            import_redirects(read_rows(BytesIO(b'/a,/b\n/caf\xe9,/c\n'), 'redirects.csv'))
+
+        self.assertEqual(e.exception.errors, ["Line 2: the file is not encoded as UTF-8."])
+        self.assertFalse(models.Redirect.objects.exists())
+
+    def test_invalid_excel_file(self):
+        # This also fails if openpyxl isn't installed, with a different error
+        with self.assertRaises(RedirectImportError):
+            import_redirects(read_rows(BytesIO(b'/a,/b\n'), 'redirects.xlsx'))
+
+    def test_management_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+            f.write('\ufeffFrom,To\r\n/tésting,/b\r\n/b,http://www.example.com/\r\n'.encode('utf-8'))
+
+        try:
+            output = StringIO()
+            management.call_command('import_redirects', f.name, '--temporary', stdout=output)
+        finally:
+            os.unlink(f.name)
+
+        self.assertEqual(output.getvalue(), "imported 2 redirects\n")
+        self.assertEqual(
+            set(models.Redirect.objects.values_list('old_path', 'redirect_link', 'is_permanent', 'site')),
+            {('/tésting', 'http://www.example.com/', False, None), ('/b', 'http://www.example.com/', False, None)}
+        )
+
+
+class TestRedirectsImportView(TestCase, WagtailTestUtils):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        self.login()
+
+    def post(self, content, site=''):
+        return self.client.post(reverse('wagtailredirects:import'), {
+            'file': SimpleUploadedFile('redirects.csv', content.encode('utf-8')),
+            'site': site,
+            'is_permanent': 'on',
+        })
+
+    def test_simple(self):
+        response = self.client.get(reverse('wagtailredirects:import'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'wagtailredirects/import.html')
+
+    def test_import(self):
+        site = Site.objects.get(is_default_site=True)
+        response = self.post('/old,/new\n/older,/old\n', site=site.id)
+
+        # Should redirect back to index
+        self.assertRedirects(response, reverse('wagtailredirects:index'))
+
+        self.assertEqual(
+            set(models.Redirect.objects.values_list('old_path', 'redirect_link', 'is_permanent', 'site')),
+            {('/old', '/new', True, site.id), ('/older', '/new', True, site.id)}
+        )
+
+    def test_import_requires_change_and_delete_permissions(self):
+        editors = Group.objects.create(name="Redirect adders")
+        editors.permissions.add(
+            Permission.objects.get(content_type__app_label='wagtailadmin', codename='access_admin'),
+            Permission.objects.get(content_type__app_label='wagtailredirects', codename='add_redirect'),
+        )
+        user = get_user_model().objects.create_user(username='adder', email='adder@example.com', password='password')
+        user.groups.add(editors)
+        self.client.login(username='adder', password='password')
+
+        response = self.client.get(reverse('wagtailredirects:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, reverse('wagtailredirects:import'))
+
+        response = self.post('/old,/new\n')
+        self.assertRedirects(response, reverse('wagtailadmin_home'))
+        self.assertFalse(models.Redirect.objects.exists())
+
+    def test_import_validation_error(self):
+        response = self.post('/old,/new\n/older\n')
+
+        # Should show the form again, with the errors
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Line 2: expected a path to redirect from and a path or URL to redirect to.")
+        self.assertFalse(models.Redirect.objects.exists())
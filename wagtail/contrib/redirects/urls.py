@@ -6,6 +6,7 @@ app_name = 'wagtailredirects'
 urlpatterns = [
     url(r'^$', views.index, name='index'),
     url(r'^add/$', views.add, name='add'),
+    url(r'^import/$', views.import_redirects, name='import'),
     url(r'^(\d+)/$', views.edit, name='edit'),
     url(r'^(\d+)/delete/$', views.delete, name='delete'),
 ]
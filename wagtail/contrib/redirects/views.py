@@ -2,13 +2,14 @@ from django.db.models import Q
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.translation import ugettext as _
+from django.utils.translation import ungettext
 from django.views.decorators.vary import vary_on_headers
 
 from wagtail.admin import messages
 from wagtail.admin.forms import SearchForm
 from wagtail.admin.utils import PermissionPolicyChecker, permission_denied
-from wagtail.contrib.redirects import models
-from wagtail.contrib.redirects.forms import RedirectForm
+from wagtail.contrib.redirects import importing, models
+from wagtail.contrib.redirects.forms import ImportForm, RedirectForm
 from wagtail.contrib.redirects.permissions import permission_policy
 from wagtail.utils.pagination import paginate
 
@@ -54,6 +55,9 @@ def index(request):
                 data=dict(q=query_string) if query_string else None, placeholder=_("Search redirects")
             ),
             'user_can_add': permission_policy.user_has_permission(request.user, 'add'),
+            'user_can_import': all(
+                permission_policy.user_has_permission(request.user, action) for action in ['add', 'change', 'delete']
+            ),
         })
 
 
@@ -124,3 +128,35 @@ def add(request):
     return render(request, "wagtailredirects/add.html", {
         'form': form,
     })
+
+
+# Importing replaces and deletes existing redirects, as well as adding new ones
+@permission_checker.require('add')
+@permission_checker.require('change')
+@permission_checker.require('delete')
+def import_redirects(request):
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            uploaded_file = form.cleaned_data['file']
+            try:
+                count = importing.import_redirects(
+                    importing.read_rows(uploaded_file, uploaded_file.name),
+                    site=form.cleaned_data['site'], is_permanent=form.cleaned_data['is_permanent']
+                )
+            except importing.RedirectImportError as e:
+                for error in e.errors:
+                    form.add_error('file', error)
+            else:
+                messages.success(request, ungettext(
+                    "%(count)d redirect imported.", "%(count)d redirects imported.", count
+                ) % {'count': count})
+                return redirect('wagtailredirects:index')
+
+        messages.error(request, _("The redirects could not be imported due to errors."))
+    else:
+        form = ImportForm()
+
+    return render(request, "wagtailredirects/import.html", {
+        'form': form,
+    })
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from wagtail.contrib.sitemaps.stored import build_sitemap_parts, get_sitemap_parts
+from wagtail.core.models import Site
+
+
+class Command(BaseCommand):
+    help = "Generates the stored sitemaps of all sites, regenerating only the parts that are out of date."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true', dest='rebuild', default=False,
+            help="Generate every part of the sitemaps from scratch.")
+
+    def handle(self, *args, **options):
+        for site in Site.objects.select_related('root_page'):
+            if options['rebuild']:
+                build_sitemap_parts(site)
+
+            parts = get_sitemap_parts(site)
+            self.stdout.write("%s: %d URLs in %d parts" % (site, sum(part.url_count for part in parts), len(parts)))
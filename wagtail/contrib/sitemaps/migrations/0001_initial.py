@@ -0,0 +1,36 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('wagtailcore', '0041_pagerevision_expire_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapPart',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_path', models.CharField(max_length=255, verbose_name='first path')),
+                ('end_path', models.CharField(max_length=255, null=True, verbose_name='end path')),
+                ('xml', models.TextField(blank=True, verbose_name='XML')),
+                ('url_count', models.PositiveIntegerField(default=0, verbose_name='number of URLs')),
+                ('etag', models.CharField(blank=True, max_length=40, verbose_name='ETag')),
+                ('last_modified', models.DateTimeField(null=True, verbose_name='last modified')),
+                ('is_stale', models.BooleanField(default=False, verbose_name='stale')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sitemap_parts', to='wagtailcore.Site', verbose_name='site')),
+            ],
+            options={
+                'verbose_name': 'sitemap part',
+                'ordering': ['first_path'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='sitemappart',
+            unique_together={('site', 'first_path')},
+        ),
+    ]
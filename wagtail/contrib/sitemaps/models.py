@@ -0,0 +1,47 @@
+import hashlib
+
+from django.db import models
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+
+class SitemapPart(models.Model):
+    """
+    The stored XML for one part of a site's sitemap, covering the pages whose paths are
+    at least first_path and less than end_path (or with no upper limit, for the last part)
+    """
+    site = models.ForeignKey(
+        'wagtailcore.Site',
+        verbose_name=_('site'),
+        related_name='sitemap_parts',
+        on_delete=models.CASCADE
+    )
+    first_path = models.CharField(verbose_name=_('first path'), max_length=255)
+    end_path = models.CharField(verbose_name=_('end path'), max_length=255, null=True)
+    xml = models.TextField(verbose_name=_('XML'), blank=True)
+    url_count = models.PositiveIntegerField(verbose_name=_('number of URLs'), default=0)
+    etag = models.CharField(verbose_name=_('ETag'), max_length=40, blank=True)
+    last_modified = models.DateTimeField(verbose_name=_('last modified'), null=True)
+    is_stale = models.BooleanField(verbose_name=_('stale'), default=False)
+
+    def set_urls(self, urls, template_name='sitemap.xml'):
+        """
+        Renders the given list of URL entries into the XML of this part. The ETag and
+        last modified time are only changed if the XML is different.
+        """
+        xml = render_to_string(template_name, {'urlset': urls})
+        if xml != self.xml:
+            self.xml = xml
+            self.etag = hashlib.sha1(xml.encode('utf-8')).hexdigest()
+            self.last_modified = timezone.now()
+
+        self.url_count = len(urls)
+
+    def __str__(self):
+        return self.first_path
+
+    class Meta:
+        verbose_name = _('sitemap part')
+        unique_together = [('site', 'first_path')]
+        ordering = ['first_path']
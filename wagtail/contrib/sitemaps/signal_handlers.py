@@ -0,0 +1,63 @@
+from django.db.models.signals import post_delete, post_save
+
+from wagtail.contrib.sitemaps.models import SitemapPart
+from wagtail.contrib.sitemaps.stored import mark_sitemap_parts_stale
+from wagtail.core.models import Page, PageViewRestriction, Site, get_page_models
+from wagtail.core.signals import (
+    page_moved, page_published, page_unpublished, pages_published, pages_unpublished)
+
+
+def page_changed_signal_handler(instance, bulk=False, **kwargs):
+    # Pages published or unpublished in bulk are handled by pages_changed_signal_handler
+    if not bulk:
+        # The URLs of the page's descendants may have changed too, eg if its slug was changed
+        mark_sitemap_parts_stale(instance.path)
+
+
+def pages_changed_signal_handler(instances, **kwargs):
+    mark_sitemap_parts_stale(*[instance.path for instance in instances])
+
+
+def page_saved_signal_handler(instance, created, raw=False, bulk=False, **kwargs):
+    # Live pages can be created without being published, eg by Page.copy or add_child.
+    # Pages created in bulk are below a page that has been created in the usual way
+    if created and instance.live and not raw and not bulk:
+        mark_sitemap_parts_stale(instance.path)
+
+
+# Pages that are updated in bulk have already been created
+page_saved_signal_handler.handles_bulk_updates = True
+
+
+def page_moved_signal_handler(instance, old_path, **kwargs):
+    mark_sitemap_parts_stale(old_path)
+    mark_sitemap_parts_stale(instance.path)
+
+
+def view_restriction_changed_signal_handler(instance, **kwargs):
+    # The page may already have been deleted, if the restriction was deleted along with it
+    path = Page.objects.filter(pk=instance.page_id).values_list('path', flat=True).first()
+    if path is not None:
+        mark_sitemap_parts_stale(path)
+
+
+def site_saved_signal_handler(instance, **kwargs):
+    # The site's root page or hostname may have changed, so its sitemap is generated
+    # again from scratch when it's next requested
+    SitemapPart.objects.filter(site=instance).delete()
+
+
+def register_signal_handlers():
+    page_published.connect(page_changed_signal_handler)
+    page_unpublished.connect(page_changed_signal_handler)
+    pages_published.connect(pages_changed_signal_handler)
+    pages_unpublished.connect(pages_changed_signal_handler)
+    for model in get_page_models():
+        post_save.connect(page_saved_signal_handler, sender=model)
+    post_delete.connect(page_changed_signal_handler, sender=Page)
+    page_moved.connect(page_moved_signal_handler)
+
+    post_save.connect(view_restriction_changed_signal_handler, sender=PageViewRestriction)
+    post_delete.connect(view_restriction_changed_signal_handler, sender=PageViewRestriction)
+
+    post_save.connect(site_saved_signal_handler, sender=Site)
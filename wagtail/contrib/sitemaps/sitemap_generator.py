@@ -6,10 +6,22 @@ from wagtail.core.utils import accepts_kwarg
 from wagtail.utils.deprecation import RemovedInWagtail24Warning
 
 
+# The Page methods that a page class has to override to change its sitemap URLs
+SITEMAP_URL_METHODS = ['get_sitemap_urls', 'get_url_parts', 'get_full_url']
+
+# The Page fields that the default get_sitemap_urls method uses
+SITEMAP_PAGE_FIELDS = [
+    'id', 'path', 'url_path', 'content_type', 'last_published_at', 'latest_revision_created_at'
+]
+
+
 class Sitemap(DjangoSitemap):
+    # The number of pages that iter_page_urls loads at a time
+    chunk_size = 1000
 
-    def __init__(self, request=None):
+    def __init__(self, request=None, site=None):
         self.request = request
+        self.site = site
 
     def location(self, obj):
         return obj.get_full_url(self.request)
@@ -20,6 +32,9 @@ class Sitemap(DjangoSitemap):
         return (obj.last_published_at or obj.latest_revision_created_at)
 
     def get_wagtail_site(self):
+        if self.site is not None:
+            return self.site
+
         site = getattr(self.request, 'site', None)
         if site is None:
             from wagtail.core.models import Site
@@ -28,33 +43,100 @@ class Sitemap(DjangoSitemap):
             ).get(is_default_site=True)
         return site
 
-    def items(self):
+    def get_pages(self):
+        """
+        Returns the pages in the sitemap, in path order, as a queryset of basic Page
+        objects
+        """
         return (
             self.get_wagtail_site()
             .root_page
             .get_descendants(inclusive=True)
             .live()
             .public()
-            .order_by('path')
-            .specific())
+            .order_by('path'))
+
+    def items(self):
+        return self.get_pages().specific()
+
+    def needs_specific(self, page_class):
+        """
+        Returns True if pages of the given class have to be loaded as that class to work
+        out their sitemap URLs, because it overrides one of the methods that they come from
+        """
+        from wagtail.core.models import Page
+
+        if page_class is None:
+            # The page's model no longer exists
+            return False
+
+        return any(getattr(page_class, name) is not getattr(Page, name) for name in SITEMAP_URL_METHODS)
+
+    def get_page_urls(self, page):
+        """
+        Returns the list of URL entries for the given page
+        """
+        if not accepts_kwarg(page.get_sitemap_urls, 'request'):
+            warnings.warn(
+                "%s.get_sitemap_urls() must be updated to accept an optional "
+                "'request' keyword argument" % type(page).__name__,
+                category=RemovedInWagtail24Warning)
+
+            return page.get_sitemap_urls()
+        else:
+            return page.get_sitemap_urls(self.request)
+
+    def iter_page_urls(self, first_path='', end_path=None):
+        """
+        Yields a (page, list of URL entries) tuple for each page in the sitemap whose path
+        is at least first_path and less than end_path, in path order.
+
+        Unlike items(), this loads chunk_size pages at a time, using only the basic Page
+        fields that the URLs are made from. Only the pages whose class overrides one of
+        SITEMAP_URL_METHODS are loaded as their specific class.
+        """
+        from wagtail.core.models import Page, Site
+
+        pages = self.get_pages().only(*SITEMAP_PAGE_FIELDS)
+        if end_path is not None:
+            pages = pages.filter(path__lt=end_path)
+
+        # Look up the site root paths once, rather than once for each page
+        site_root_paths = Site.get_site_root_paths()
+
+        needs_specific = {}
+
+        # Start each chunk after the last path seen, rather than at an offset
+        chunk = pages.filter(path__gte=first_path)
+        while True:
+            chunk = list(chunk[:self.chunk_size])
+            if not chunk:
+                return
+
+            for page in chunk:
+                if page.content_type_id not in needs_specific:
+                    needs_specific[page.content_type_id] = self.needs_specific(page.specific_class)
+
+            specific_pages = {
+                page.pk: page
+                for page in Page.objects.filter(
+                    pk__in=[page.pk for page in chunk if needs_specific[page.content_type_id]]
+                ).specific()
+            }
+
+            for page in chunk:
+                page = specific_pages.get(page.pk, page)
+                page._wagtail_cached_site_root_paths = site_root_paths
+                yield page, self.get_page_urls(page)
+
+            chunk = pages.filter(path__gt=chunk[-1].path)
 
     def _urls(self, page, protocol, domain):
         urls = []
         last_mods = set()
 
         for item in self.paginator.page(page).object_list:
-
-            if not accepts_kwarg(item.get_sitemap_urls, 'request'):
-                warnings.warn(
-                    "%s.get_sitemap_urls() must be updated to accept an optional "
-                    "'request' keyword argument" % type(item).__name__,
-                    category=RemovedInWagtail24Warning)
-
-                url_info_items = item.get_sitemap_urls()
-            else:
-                url_info_items = item.get_sitemap_urls(self.request)
-
-            for url_info in url_info_items:
+            for url_info in self.get_page_urls(item):
                 urls.append(url_info)
                 last_mods.add(url_info.get('lastmod'))
 
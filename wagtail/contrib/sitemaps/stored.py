@@ -0,0 +1,190 @@
+"""
+Stores the sitemap of each site as a set of precomputed parts, so that large sitemaps
+don't have to be generated on every request.
+
+Each SitemapPart holds the XML for the pages of a site whose paths are in a range, with
+at most URLS_PER_PART URLs. When pages are published, unpublished, moved or deleted, only
+the parts covering them and their descendants are marked as stale. Stale parts are
+regenerated when they are next requested, or by the update_sitemaps management command,
+and split up if they have grown beyond URLS_PER_PART URLs.
+
+Each part is locked while it is regenerated, and requests for it meanwhile are served
+its previous XML, where the database supports SKIP LOCKED.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from wagtail.contrib.sitemaps.models import SitemapPart
+from wagtail.contrib.sitemaps.sitemap_generator import Sitemap
+from wagtail.core.models import Page, Site
+
+# The maximum number of URLs in a sitemap file, set by the sitemap protocol
+URLS_PER_PART = 50000
+
+
+def get_page_urls(site, first_path='', end_path=None):
+    """
+    Yields a (path, list of URL entries) tuple for each page in the sitemap of the given
+    site whose path is at least first_path and less than end_path, in path order
+    """
+    for page, urls in Sitemap(site=site).iter_page_urls(first_path, end_path):
+        yield page.path, urls
+
+
+def group_page_urls(page_urls):
+    """
+    Groups the (path, URL entries) tuples from get_page_urls into lists holding at most
+    URLS_PER_PART URLs, without splitting the URLs of a page across lists
+    """
+    group = []
+    url_count = 0
+
+    for path, urls in page_urls:
+        if group and url_count + len(urls) > URLS_PER_PART:
+            yield group
+            group = []
+            url_count = 0
+
+        group.append((path, urls))
+        url_count += len(urls)
+
+    if group:
+        yield group
+
+
+def save_parts(site, first_path, end_path, page_urls, part=None):
+    """
+    Stores the given (path, URL entries) tuples as the parts covering the pages from
+    first_path up to end_path, splitting them into as many parts as needed. If part is
+    given, it is reused for the first of them.
+    """
+    groups = group_page_urls(page_urls)
+    group = next(groups, [])
+
+    while True:
+        next_group = next(groups, None)
+
+        if part is None:
+            part = SitemapPart(site=site, first_path=first_path)
+            update_fields = None
+        else:
+            # Leave is_stale alone, in case the part was changed while it was regenerated
+            update_fields = ['end_path', 'xml', 'url_count', 'etag', 'last_modified']
+
+        part.end_path = next_group[0][0] if next_group else end_path
+        part.set_urls([url for path, urls in group for url in urls])
+        part.save(update_fields=update_fields)
+
+        if next_group is None:
+            return
+
+        group = next_group
+        first_path = group[0][0]
+        part = None
+
+
+def build_sitemap_parts(site, replace=True):
+    """
+    Replaces the stored sitemap parts of the given site with newly generated ones. If
+    replace is False, the parts are only generated if the site doesn't have any, such as
+    when another request has generated them while this one was waiting for the lock.
+    """
+    with transaction.atomic():
+        # Lock the site, so that only one process generates its parts at a time
+        Site.objects.select_for_update().get(pk=site.pk)
+
+        parts = SitemapPart.objects.filter(site=site)
+        if not replace and parts.exists():
+            return
+
+        parts.delete()
+        save_parts(site, '', None, get_page_urls(site))
+
+
+def lock_sitemap_part(part):
+    """
+    Locks the given sitemap part until the end of the transaction, and returns a copy of
+    it with its current is_stale and end_path. Returns None if the part has been deleted,
+    or if it is locked by another process and the database can skip locked rows.
+    """
+    parts = SitemapPart.objects.filter(pk=part.pk).only('is_stale', 'end_path')
+    if connection.features.has_select_for_update_skip_locked:
+        parts = parts.select_for_update(skip_locked=True)
+    else:
+        parts = parts.select_for_update()
+
+    return parts.first()
+
+
+def update_sitemap_part(part):
+    """
+    Regenerates the given sitemap part if it is still stale. Returns False if it isn't,
+    or if it is being regenerated by another process.
+    """
+    with transaction.atomic():
+        locked_part = lock_sitemap_part(part)
+        if locked_part is None or not locked_part.is_stale:
+            return False
+
+        # Another process may have split the part since it was fetched
+        part.end_path = locked_part.end_path
+
+        # Pages that are changed while the part is being regenerated wait for the lock
+        # before marking it as stale again
+        SitemapPart.objects.filter(pk=part.pk).update(is_stale=False)
+
+        page_urls = get_page_urls(part.site, part.first_path, part.end_path)
+        save_parts(part.site, part.first_path, part.end_path, page_urls, part)
+
+    return True
+
+
+def get_sitemap_parts(site):
+    """
+    Returns the stored sitemap parts of the given site in order, without their XML,
+    after generating any that are missing or stale. Parts that are being regenerated
+    by another process are returned as they are.
+    """
+    parts = SitemapPart.objects.filter(site=site).defer('xml').order_by('first_path')
+
+    stored_parts = list(parts)
+    if not stored_parts:
+        build_sitemap_parts(site, replace=False)
+    elif not any(part.is_stale for part in stored_parts):
+        return stored_parts
+    else:
+        for part in stored_parts:
+            if part.is_stale:
+                part.site = site
+                update_sitemap_part(part)
+
+    # The parts have been generated or regenerated since they were fetched
+    return list(parts.all())
+
+
+def mark_sitemap_parts_stale(*paths):
+    """
+    Marks the sitemap parts that cover the pages with the given paths, or any of their
+    descendants, as stale
+    """
+    # Pages whose ancestors are also given are covered by the ancestors' parts
+    top_paths = []
+    for path in sorted(set(paths)):
+        if not top_paths or not path.startswith(top_paths[-1]):
+            top_paths.append(path)
+
+    for i in range(0, len(top_paths), 100):
+        condition = Q()
+        for path in top_paths[i:i + 100]:
+            # The page is in the sitemaps of sites whose root page is the page itself, one
+            # of its ancestors or one of its descendants
+            ancestor_paths = [path[:length] for length in range(Page.steplen, len(path) + 1, Page.steplen)]
+
+            site_condition = Q(site__root_page__path__in=ancestor_paths) | Q(site__root_page__path__startswith=path)
+            part_condition = Q(first_path__startswith=path) | (
+                Q(first_path__lte=path) & (Q(end_path__gt=path) | Q(end_path__isnull=True))
+            )
+            condition |= site_condition & part_condition
+
+        SitemapPart.objects.filter(condition).update(is_stale=True)
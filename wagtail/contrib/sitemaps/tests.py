@@ -1,14 +1,20 @@
 import datetime
+import re
+from io import StringIO
 
+import mock
 import pytz
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.shortcuts import get_current_site
+from django.core import management
 from django.test import RequestFactory, TestCase
 
 from wagtail.core.models import Page, PageViewRestriction, Site
 from wagtail.tests.testapp.models import EventIndex, SimplePage
 
+from .models import SitemapPart
 from .sitemap_generator import Sitemap
+from .stored import build_sitemap_parts, get_sitemap_parts, update_sitemap_part
 
 
 class TestSitemapGenerator(TestCase):
@@ -153,6 +159,58 @@ class TestSitemapGenerator(TestCase):
 
         self.assertFalse(hasattr(sitemap, 'latest_lastmod'))
 
+    def test_iter_page_urls(self):
+        request, django_site = self.get_request_and_django_site('/sitemap.xml')
+
+        self.home_page.add_child(instance=EventIndex(
+            title="Events",
+            slug='events',
+            live=True,
+        ))
+
+        sitemap = Sitemap(request)
+        urls = [url for page, page_urls in sitemap.iter_page_urls() for url in page_urls]
+
+        self.assertEqual(
+            [(url['location'], url['lastmod']) for url in urls],
+            [(url['location'], url['lastmod']) for url in sitemap.get_urls(1, django_site, request.scheme)]
+        )
+        self.assertIn('http://localhost/events/past/', [url['location'] for url in urls])
+
+    def test_iter_page_urls_only_loads_specific_pages_when_needed(self):
+        self.home_page.add_child(instance=EventIndex(
+            title="Events",
+            slug='events',
+            live=True,
+        ))
+
+        pages = {page.slug: page for page, page_urls in Sitemap().iter_page_urls()}
+
+        self.assertIs(type(pages['hello-world']), Page)
+        self.assertIs(type(pages['events']), EventIndex)
+
+    def test_iter_page_urls_in_chunks(self):
+        sitemap = Sitemap()
+        sitemap.chunk_size = 1
+
+        paths = [page.path for page, page_urls in sitemap.iter_page_urls()]
+
+        self.assertEqual(paths, [page.path for page in sitemap.items()])
+
+    def test_iter_page_urls_between_paths(self):
+        sitemap = Sitemap()
+
+        pages = [page for page, page_urls in sitemap.iter_page_urls(self.child_page.path, self.page_with_no_last_publish_date.path)]
+
+        self.assertEqual([page.pk for page in pages], [self.child_page.pk])
+
+    def test_needs_specific(self):
+        sitemap = Sitemap()
+
+        self.assertFalse(sitemap.needs_specific(SimplePage))
+        self.assertTrue(sitemap.needs_specific(EventIndex))
+        self.assertFalse(sitemap.needs_specific(None))
+
 
 class TestIndexView(TestCase):
     def test_index_view(self):
@@ -168,3 +226,279 @@ class TestSitemapView(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/xml')
+
+
+class TestStreamingSitemapView(TestCase):
+    def test_streaming_sitemap_view(self):
+        Page.objects.get(id=2).add_child(instance=EventIndex(
+            title="Events",
+            slug='events',
+            live=True,
+        ))
+
+        response = self.client.get('/streaming-sitemap.xml')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/xml')
+
+        # The XML is the same as that of the sitemap view
+        self.assertEqual(b''.join(response.streaming_content), self.client.get('/sitemap.xml').content)
+
+
+class TestStoredSitemaps(TestCase):
+    def setUp(self):
+        self.home_page = Page.objects.get(id=2)
+        self.site = Site.objects.get(is_default_site=True)
+
+        self.section = self.home_page.add_child(instance=SimplePage(
+            title="Section", slug='section', content="hello", live=True
+        ))
+        for i in range(3):
+            self.section.add_child(instance=SimplePage(
+                title="Page %d" % i, slug='page-%d' % i, content="hello", live=True
+            ))
+
+        self.other_section = self.home_page.add_child(instance=SimplePage(
+            title="Other section", slug='other-section', content="hello", live=True
+        ))
+
+    def get_locations(self):
+        locations = []
+        for part in get_sitemap_parts(self.site):
+            part.refresh_from_db()
+            locations.extend(re.findall(r'<loc>(.*?)</loc>', part.xml))
+        return locations
+
+    def test_build(self):
+        parts = get_sitemap_parts(self.site)
+
+        self.assertEqual(len(parts), 1)
+        self.assertEqual(parts[0].first_path, '')
+        self.assertIsNone(parts[0].end_path)
+        self.assertEqual(parts[0].url_count, 6)
+        self.assertEqual(self.get_locations(), [
+            'http://localhost/',
+            'http://localhost/section/',
+            'http://localhost/section/page-0/',
+            'http://localhost/section/page-1/',
+            'http://localhost/section/page-2/',
+            'http://localhost/other-section/',
+        ])
+
+    @mock.patch('wagtail.contrib.sitemaps.stored.URLS_PER_PART', 2)
+    def test_build_splits_parts(self):
+        parts = get_sitemap_parts(self.site)
+
+        self.assertEqual([part.url_count for part in parts], [2, 2, 2])
+        self.assertEqual(parts[0].first_path, '')
+        self.assertEqual([part.end_path for part in parts[:-1]], [part.first_path for part in parts[1:]])
+        self.assertIsNone(parts[-1].end_path)
+        self.assertEqual(len(self.get_locations()), 6)
+
+    @mock.patch('wagtail.contrib.sitemaps.stored.URLS_PER_PART', 4)
+    def test_publish_only_regenerates_affected_parts(self):
+        first_part, second_part = get_sitemap_parts(self.site)
+
+        self.other_section.add_child(instance=SimplePage(
+            title="New page", slug='new-page', content="hello", live=False
+        )).save_revision().publish()
+
+        first_part.refresh_from_db()
+        second_part.refresh_from_db()
+        self.assertFalse(first_part.is_stale)
+        self.assertTrue(second_part.is_stale)
+
+        old_etag = second_part.etag
+        first_part, second_part = get_sitemap_parts(self.site)
+        self.assertFalse(second_part.is_stale)
+        self.assertNotEqual(second_part.etag, old_etag)
+        self.assertIn('http://localhost/other-section/new-page/', self.get_locations())
+
+    @mock.patch('wagtail.contrib.sitemaps.stored.URLS_PER_PART', 3)
+    def test_unpublish(self):
+        get_sitemap_parts(self.site)
+
+        self.section.get_children().get(slug='page-2').unpublish()
+
+        self.assertTrue(SitemapPart.objects.filter(is_stale=True).exists())
+        self.assertNotIn('http://localhost/section/page-2/', self.get_locations())
+
+    @mock.patch('wagtail.contrib.sitemaps.stored.URLS_PER_PART', 3)
+    def test_bulk_unpublish_marks_parts_stale_once(self):
+        get_sitemap_parts(self.site)
+
+        with mock.patch('wagtail.contrib.sitemaps.signal_handlers.mark_sitemap_parts_stale') as mark_stale:
+            Page.objects.filter(id__in=[self.section.id, self.other_section.id]).unpublish()
+
+        mark_stale.assert_called_once_with(self.section.path, self.other_section.path)
+
+        Page.objects.filter(id__in=[self.section.id, self.other_section.id]).publish()
+        Page.objects.filter(id=self.other_section.id).unpublish()
+
+        self.assertTrue(SitemapPart.objects.filter(is_stale=True).exists())
+        self.assertNotIn('http://localhost/other-section/', self.get_locations())
+
+    def test_create_live_page(self):
+        get_sitemap_parts(self.site)
+
+        self.other_section.add_child(instance=SimplePage(
+            title="New page", slug='new-page', content="hello", live=True
+        ))
+
+        self.assertTrue(SitemapPart.objects.get().is_stale)
+        self.assertIn('http://localhost/other-section/new-page/', self.get_locations())
+
+    def test_copy_live_pages(self):
+        get_sitemap_parts(self.site)
+
+        self.section.copy(recursive=True, keep_live=True, update_attrs={'slug': 'section-copy'})
+
+        self.assertTrue(SitemapPart.objects.get().is_stale)
+        self.assertIn('http://localhost/section-copy/page-0/', self.get_locations())
+
+    def test_move(self):
+        get_sitemap_parts(self.site)
+
+        self.section.move(self.other_section, pos='last-child')
+
+        self.assertTrue(SitemapPart.objects.get().is_stale)
+        self.assertIn('http://localhost/other-section/section/page-0/', self.get_locations())
+
+    def test_view_restriction(self):
+        get_sitemap_parts(self.site)
+
+        PageViewRestriction.objects.create(page=self.section, password='hello')
+
+        self.assertEqual(self.get_locations(), ['http://localhost/', 'http://localhost/other-section/'])
+
+    def test_part_split_when_regenerated(self):
+        get_sitemap_parts(self.site)
+
+        self.other_section.add_child(instance=SimplePage(
+            title="New page", slug='new-page', content="hello", live=False
+        )).save_revision().publish()
+
+        with mock.patch('wagtail.contrib.sitemaps.stored.URLS_PER_PART', 4):
+            parts = get_sitemap_parts(self.site)
+
+        self.assertEqual([part.url_count for part in parts], [4, 3])
+        self.assertEqual(parts[0].end_path, parts[1].first_path)
+        self.assertEqual(len(self.get_locations()), 7)
+
+    def test_other_sites_not_marked_stale(self):
+        other_site = Site.objects.create(hostname='other.example.com', root_page=self.other_section)
+        get_sitemap_parts(self.site)
+        get_sitemap_parts(other_site)
+
+        self.section.get_children().get(slug='page-2').unpublish()
+
+        self.assertTrue(SitemapPart.objects.get(site=self.site).is_stale)
+        self.assertFalse(SitemapPart.objects.get(site=other_site).is_stale)
+
+    def test_site_change_removes_parts(self):
+        get_sitemap_parts(self.site)
+
+        self.site.hostname = 'example.com'
+        self.site.save()
+
+        self.assertFalse(SitemapPart.objects.exists())
+        self.assertIn('http://example.com/section/', self.get_locations())
+
+    def test_unchanged_part_keeps_etag(self):
+        part = get_sitemap_parts(self.site)[0]
+        SitemapPart.objects.update(is_stale=True)
+
+        regenerated_part = get_sitemap_parts(self.site)[0]
+
+        self.assertEqual(regenerated_part.etag, part.etag)
+        self.assertEqual(regenerated_part.last_modified, part.last_modified)
+
+    def test_build_keeps_parts_built_by_another_process(self):
+        build_sitemap_parts(self.site)
+        part_ids = list(SitemapPart.objects.values_list('pk', flat=True))
+
+        build_sitemap_parts(self.site, replace=False)
+
+        self.assertEqual(list(SitemapPart.objects.values_list('pk', flat=True)), part_ids)
+
+    def test_part_that_is_no_longer_stale_is_not_regenerated(self):
+        part = get_sitemap_parts(self.site)[0]
+        part.is_stale = True
+
+        with mock.patch('wagtail.contrib.sitemaps.stored.save_parts') as save_parts:
+            self.assertFalse(update_sitemap_part(part))
+
+        self.assertFalse(save_parts.called)
+
+    def test_update_sitemaps_command(self):
+        build_sitemap_parts(self.site)
+        SitemapPart.objects.update(is_stale=True)
+
+        stdout = StringIO()
+        management.call_command('update_sitemaps', stdout=stdout)
+
+        self.assertFalse(SitemapPart.objects.filter(is_stale=True).exists())
+        self.assertIn("6 URLs in 1 parts", stdout.getvalue())
+
+
+class TestStoredSitemapViews(TestCase):
+    def test_index_view(self):
+        response = self.client.get('/stored-sitemap.xml')
+        part = SitemapPart.objects.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertContains(response, '<loc>http://testserver/stored-sitemap-%d.xml</loc>' % part.pk)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_index_view_not_modified(self):
+        response = self.client.get('/stored-sitemap.xml')
+
+        response = self.client.get('/stored-sitemap.xml', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_sitemap_view(self):
+        build_sitemap_parts(Site.objects.get(is_default_site=True))
+        part = SitemapPart.objects.get()
+
+        response = self.client.get('/stored-sitemap-%d.xml' % part.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertContains(response, '<loc>http://localhost/</loc>')
+        self.assertEqual(response['ETag'], '"%s"' % part.etag)
+
+        response = self.client.get(
+            '/stored-sitemap-%d.xml' % part.pk, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_sitemap_view_regenerates_stale_part(self):
+        build_sitemap_parts(Site.objects.get(is_default_site=True))
+        part = SitemapPart.objects.get()
+        Page.objects.get(id=2).unpublish()
+
+        response = self.client.get('/stored-sitemap-%d.xml' % part.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, '<loc>http://localhost/</loc>')
+
+    def test_sitemap_view_serves_part_being_regenerated(self):
+        build_sitemap_parts(Site.objects.get(is_default_site=True))
+        part = SitemapPart.objects.get()
+        Page.objects.get(id=2).unpublish()
+
+        # Another request holds the lock on the part
+        with mock.patch('wagtail.contrib.sitemaps.stored.lock_sitemap_part', return_value=None):
+            response = self.client.get('/stored-sitemap-%d.xml' % part.pk)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<loc>http://localhost/</loc>')
+        self.assertTrue(SitemapPart.objects.get().is_stale)
+
+    def test_sitemap_view_unknown_part(self):
+        response = self.client.get('/stored-sitemap-1000.xml')
+
+        self.assertEqual(response.status_code, 404)
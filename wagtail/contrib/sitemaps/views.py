@@ -1,4 +1,15 @@
+import hashlib
+from calendar import timegm
+
 from django.contrib.sitemaps import views as sitemap_views
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import date
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.html import escape
+from django.utils.http import http_date, quote_etag
 
 from .sitemap_generator import Sitemap
 
@@ -16,6 +27,49 @@ def sitemap(request, sitemaps=None, **kwargs):
     return sitemap_views.sitemap(request, sitemaps, **kwargs)
 
 
+def streaming_sitemap(request, sitemap_class=Sitemap, content_type='application/xml'):
+    """
+    Serves the sitemap of the current site, writing out the URLs as the pages are
+    loaded (see Sitemap.iter_page_urls) rather than building the whole sitemap first
+    """
+    sitemap = sitemap_class(request)
+    return StreamingHttpResponse(render_streaming_sitemap(sitemap), content_type=content_type)
+
+
+def render_streaming_sitemap(sitemap):
+    """
+    Yields the XML of the given sitemap, a chunk of pages at a time. The elements are
+    the same as those written by Django's sitemap.xml template.
+    """
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xhtml="http://www.w3.org/1999/xhtml">\n'
+    )
+
+    xml = []
+    for page, urls in sitemap.iter_page_urls():
+        xml.extend(render_sitemap_url(url_info) for url_info in urls)
+
+        if len(xml) >= sitemap.chunk_size:
+            yield ''.join(xml)
+            xml = []
+
+    xml.append('\n</urlset>\n')
+    yield ''.join(xml)
+
+
+def render_sitemap_url(url_info):
+    xml = ['<url>', '<loc>%s</loc>' % escape(url_info['location'])]
+    if url_info.get('lastmod'):
+        xml.append('<lastmod>%s</lastmod>' % date(url_info['lastmod'], 'Y-m-d'))
+    if url_info.get('changefreq'):
+        xml.append('<changefreq>%s</changefreq>' % escape(url_info['changefreq']))
+    if url_info.get('priority'):
+        xml.append('<priority>%s</priority>' % escape(url_info['priority']))
+    xml.append('</url>')
+    return ''.join(xml)
+
+
 def prepare_sitemaps(request, sitemaps):
     """Intialize the wagtail Sitemap by passing the request.site value. """
     initialised_sitemaps = {}
@@ -25,3 +79,64 @@ def prepare_sitemaps(request, sitemaps):
         else:
             initialised_sitemaps[name] = sitemap_cls
     return initialised_sitemaps
+
+
+def stored_index(request, sitemap_url_name='wagtailsitemaps_stored_sitemap',
+                 template_name='sitemap_index.xml', content_type='application/xml'):
+    """
+    Serves the index of the stored sitemap parts of the current site (see
+    wagtail.contrib.sitemaps.stored), generating any parts that are missing or stale
+    """
+    # Stored sitemaps need wagtail.contrib.sitemaps in INSTALLED_APPS, which the other
+    # views don't, so their models are only imported here
+    from .stored import get_sitemap_parts
+
+    if request.site is None:
+        raise Http404
+
+    parts = get_sitemap_parts(request.site)
+
+    locations = [
+        request.build_absolute_uri(reverse(sitemap_url_name, kwargs={'part_id': part.pk}))
+        for part in parts
+    ]
+    response = TemplateResponse(request, template_name, {'sitemaps': locations}, content_type=content_type)
+
+    # The index changes whenever one of the parts does, or parts are added or removed
+    etag = hashlib.sha1(' '.join('%d:%s' % (part.pk, part.etag) for part in parts).encode('utf-8')).hexdigest()
+    last_modified = max(part.last_modified for part in parts)
+    return conditional_response(request, response, etag, last_modified)
+
+
+def stored_sitemap(request, part_id, content_type='application/xml'):
+    """
+    Serves one of the stored sitemap parts of the current site, regenerating it first
+    if it is stale
+    """
+    from .models import SitemapPart
+    from .stored import update_sitemap_part
+
+    if request.site is None:
+        raise Http404
+
+    part = get_object_or_404(SitemapPart, site=request.site, pk=part_id)
+
+    # If another request is already regenerating the part, serve its previous XML
+    if part.is_stale and update_sitemap_part(part):
+        part.refresh_from_db()
+
+    response = HttpResponse(part.xml, content_type=content_type)
+    return conditional_response(request, response, part.etag, part.last_modified)
+
+
+def conditional_response(request, response, etag, last_modified):
+    """
+    Adds the ETag and Last-Modified headers to the response, and replaces it with a
+    304 Not Modified response if the client already has this version
+    """
+    response['ETag'] = quote_etag(etag)
+    last_modified = timegm(last_modified.utctimetuple())
+    response['Last-Modified'] = http_date(last_modified)
+    return get_conditional_response(
+        request, etag=response['ETag'], last_modified=last_modified, response=response
+    )
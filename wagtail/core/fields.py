@@ -31,6 +31,9 @@ class Creator:
     def __get__(self, obj, type=None):
         if obj is None:
             return self
+        if self.field.name not in obj.__dict__:
+            # The field was deferred
+            obj.refresh_from_db(fields=[self.field.attname])
         return obj.__dict__[self.field.name]
 
     def __set__(self, obj, value):
@@ -1,20 +1,18 @@
 import json
+import logging
+import time
 
 from django.core.management.base import BaseCommand
-from django.utils import dateparse, timezone
+from django.db import close_old_connections
+from django.db.models import Min
+from django.utils import timezone
 
 from wagtail.core.models import Page, PageRevision
 
+# The number of scheduled revisions that are published at once
+BATCH_SIZE = 100
 
-def revision_date_expired(r):
-    expiry_str = json.loads(r.content_json).get('expire_at')
-    if not expiry_str:
-        return False
-    expire_at = dateparse.parse_datetime(expiry_str)
-    if expire_at < timezone.now():
-        return True
-    else:
-        return False
+logger = logging.getLogger('wagtail.core')
 
 
 class Command(BaseCommand):
@@ -22,6 +20,9 @@ class Command(BaseCommand):
         parser.add_argument(
             '--dryrun', action='store_true', dest='dryrun', default=False,
             help="Dry run -- dont't change anything.")
+        parser.add_argument(
+            '--interval', type=int, dest='interval', default=None,
+            help="Keep running, checking for scheduled pages at least every INTERVAL seconds.")
 
     def handle(self, *args, **options):
         dryrun = False
@@ -29,10 +30,50 @@ class Command(BaseCommand):
             self.stdout.write("Will do a dry run.")
             dryrun = True
 
+        interval = options['interval']
+        if not interval or dryrun:
+            self.process_scheduled_pages(dryrun)
+            return
+
+        while True:
+            try:
+                self.process_scheduled_pages(dryrun)
+                next_due = self.get_next_due_time()
+            except Exception:
+                # Keep running, so that pages are published once the problem
+                # (such as the database being unavailable) goes away
+                logger.exception("Failed to publish scheduled pages")
+                next_due = None
+
+            # Sleep until the next page is due to be published or expired, but
+            # wake up at least once per interval to pick up newly scheduled pages
+            if next_due is None:
+                delay = interval
+            else:
+                delay = min(max((next_due - timezone.now()).total_seconds(), 0), interval)
+            time.sleep(delay)
+
+            # The database connection may have timed out or been closed while
+            # sleeping, as happens at the end of each request in the web server
+            close_old_connections()
+
+    def get_next_due_time(self):
+        due_times = [
+            Page.objects.filter(live=True).aggregate(due=Min('expire_at'))['due'],
+            PageRevision.objects.filter(submitted_for_moderation=True).aggregate(due=Min('expire_at'))['due'],
+            PageRevision.objects.aggregate(due=Min('approved_go_live_at'))['due'],
+        ]
+        due_times = [due for due in due_times if due is not None]
+        if due_times:
+            return min(due_times)
+
+    def process_scheduled_pages(self, dryrun):
+        now = timezone.now()
+
         # 1. get all expired pages with live = True
         expired_pages = Page.objects.filter(
             live=True,
-            expire_at__lt=timezone.now()
+            expire_at__lt=now
         )
         if dryrun:
             if expired_pages:
@@ -48,18 +89,13 @@ class Command(BaseCommand):
             else:
                 self.stdout.write("No expired pages to be deactivated found.")
         else:
-            # Unpublish the expired pages
-            # Cast to list to make sure the query is fully evaluated
-            # before unpublishing anything
-            for page in list(expired_pages):
-                page.unpublish(set_expired=True)
+            expired_pages.unpublish(set_expired=True)
 
         # 2. get all page revisions for moderation that have been expired
-        expired_revs = [
-            r for r in PageRevision.objects.filter(
-                submitted_for_moderation=True
-            ) if revision_date_expired(r)
-        ]
+        expired_revs = PageRevision.objects.filter(
+            submitted_for_moderation=True,
+            expire_at__lt=now
+        )
         if dryrun:
             self.stdout.write("---------------------------------")
             if expired_revs:
@@ -69,22 +105,18 @@ class Command(BaseCommand):
                 for er in expired_revs:
                     rev_data = json.loads(er.content_json)
                     self.stdout.write("{0}\t{1}\t{2}".format(
-                        dateparse.parse_datetime(
-                            rev_data.get('expire_at')
-                        ).strftime("%Y-%m-%d %H:%M"),
+                        er.expire_at.strftime("%Y-%m-%d %H:%M"),
                         rev_data.get('slug'),
                         rev_data.get('title')
                     ))
             else:
                 self.stdout.write("No expired revision to be dropped from moderation.")
         else:
-            for er in expired_revs:
-                er.submitted_for_moderation = False
-                er.save()
+            expired_revs.update(submitted_for_moderation=False)
 
         # 3. get all revisions that need to be published
         revs_for_publishing = PageRevision.objects.filter(
-            approved_go_live_at__lt=timezone.now()
+            approved_go_live_at__lt=now
         )
         if dryrun:
             self.stdout.write("---------------------------------")
@@ -102,7 +134,33 @@ class Command(BaseCommand):
             else:
                 self.stdout.write("No pages to go live.")
         else:
-            for rp in revs_for_publishing:
-                # just run publish for the revision -- since the approved go
-                # live datetime is before now it will make the page live
-                rp.publish()
+            due_revisions = list(revs_for_publishing.order_by('id').values_list('id', 'page_id'))
+            for start in range(0, len(due_revisions), BATCH_SIZE):
+                self.publish_revisions(due_revisions[start:start + BATCH_SIZE])
+
+    def publish_revisions(self, revisions):
+        page_ids = [page_id for revision_id, page_id in revisions]
+
+        latest_revision_ids = {}
+        latest_revisions = PageRevision.objects.filter(page_id__in=page_ids).order_by('page_id', 'created_at', 'id')
+        for page_id, revision_id in latest_revisions.values_list('page_id', 'id'):
+            latest_revision_ids[page_id] = revision_id
+
+        # Scheduled revisions that are the latest revision of their page are
+        # published together. Older revisions have to be published one at a
+        # time, as publishing them leaves the page with unpublished changes
+        bulk_page_ids = []
+        older_revision_ids = []
+        for revision_id, page_id in revisions:
+            if latest_revision_ids.get(page_id) == revision_id:
+                bulk_page_ids.append(page_id)
+            else:
+                older_revision_ids.append(revision_id)
+
+        if bulk_page_ids:
+            Page.objects.filter(pk__in=bulk_page_ids).publish()
+
+        for rp in PageRevision.objects.filter(pk__in=older_revision_ids).order_by('id'):
+            # just run publish for the revision -- since the approved go
+            # live datetime is before now it will make the page live
+            rp.publish()
@@ -1,25 +1,121 @@
+from collections import defaultdict
+
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
 from django.db import models
 from modelcluster.models import get_all_child_relations
 
-from wagtail.core.models import PageRevision, get_page_models
+from wagtail.core.models import Page, PageRevision, get_page_models
+from wagtail.core.rich_text import cache as rich_text_cache
+from wagtail.search import index
+
+try:
+    from django.db.models.functions import Replace
+except ImportError:
+    # Replace was added in Django 2.1. Instances are saved one at a time before that
+    Replace = None
+
+# The number of rows that are updated (and reindexed) at once
+BATCH_SIZE = 500
+
+
+def get_text_fields(model):
+    """
+    Returns the text fields that are stored in the model's own database table
+    """
+    return [
+        field for field in model._meta.local_concrete_fields
+        if isinstance(field, (models.TextField, models.CharField))
+    ]
+
+
+def get_concrete_models(model_classes):
+    """
+    Returns the given models along with their multi-table inheritance parents,
+    so that each database table appears exactly once
+    """
+    concrete_models = []
+    for model in model_classes:
+        for concrete_model in [model] + model._meta.get_parent_list():
+            concrete_model = concrete_model._meta.concrete_model
+            if concrete_model not in concrete_models:
+                concrete_models.append(concrete_model)
+    return concrete_models
 
 
-def replace_in_model(model, from_text, to_text):
-    text_field_names = [field.name for field in model._meta.fields if (
-        isinstance(field, models.TextField) or
-        isinstance(field, models.CharField)
-    )
+def replace_in_model(model, fields, from_text, to_text, dry_run=False):
+    """
+    Replaces from_text with to_text in the given fields of every instance of the
+    model, using REPLACE() in the database where it's available. Returns the
+    primary keys of the instances that contain from_text.
+    """
+    if not fields:
+        return []
+
+    condition = models.Q()
+    for field in fields:
+        condition |= models.Q(**{'%s__contains' % field.name: from_text})
+
+    # __contains is case-insensitive on SQLite and MySQL, so the values are
+    # checked again to find the instances that will actually change
+    field_names = [field.name for field in fields]
+    rows = model._base_manager.filter(condition).values_list('pk', *field_names)
+    pks = [
+        row[0] for row in rows.iterator()
+        if any(value and from_text in value for value in row[1:])
     ]
+
+    if not dry_run:
+        for i in range(0, len(pks), BATCH_SIZE):
+            batch = pks[i:i + BATCH_SIZE]
+
+            if Replace is None:
+                for obj in model._base_manager.filter(pk__in=batch):
+                    replace_in_object(obj, field_names, from_text, to_text)
+            else:
+                model._base_manager.filter(pk__in=batch).update(**{
+                    field_name: Replace(field_name, models.Value(from_text), models.Value(to_text))
+                    for field_name in field_names
+                })
+
+    return pks
+
+
+def replace_in_object(obj, field_names, from_text, to_text):
     updated_fields = []
-    for field in text_field_names:
-        field_value = getattr(model, field)
-        if field_value and (from_text in field_value):
-            updated_fields.append(field)
-            setattr(model, field, field_value.replace(from_text, to_text))
+    for field_name in field_names:
+        value = getattr(obj, field_name)
+        if value and from_text in value:
+            updated_fields.append(field_name)
+            setattr(obj, field_name, value.replace(from_text, to_text))
 
     if updated_fields:
-        model.save(update_fields=updated_fields)
+        obj.save(update_fields=updated_fields)
+
+
+def invalidate_page_caches(page_ids):
+    """
+    Clears the cached data that depends on the given pages, as they're updated
+    without being saved or published
+    """
+    cache.delete('wagtail_site_root_paths')
+    rich_text_cache.invalidate('page', page_ids)
+    rich_text_cache.invalidate_page_urls()
+
+
+def reindex_pages(page_ids):
+    for i in range(0, len(page_ids), BATCH_SIZE):
+        pages_by_class = defaultdict(list)
+        for page in Page.objects.filter(pk__in=page_ids[i:i + BATCH_SIZE]).specific():
+            pages_by_class[type(page)].append(page)
+
+        for page_class, pages in pages_by_class.items():
+            index.insert_or_update_objects(page_class, pages)
+
+
+def reindex_objects(model, pks):
+    for i in range(0, len(pks), BATCH_SIZE):
+        index.insert_or_update_objects(model, list(model.objects.filter(pk__in=pks[i:i + BATCH_SIZE])))
 
 
 class Command(BaseCommand):
@@ -28,24 +124,57 @@ class Command(BaseCommand):
         parser.add_argument('from_text')
         parser.add_argument('to_text')
 
+        parser.add_argument(
+            '--dry-run', action='store_true', dest='dry_run', default=False,
+            help="Count the objects that would be changed, without changing them.")
+
     def handle(self, *args, **options):
         from_text = options['from_text']
         to_text = options['to_text']
+        dry_run = options['dry_run']
+
+        if dry_run:
+            self.stdout.write("Will do a dry run.")
+
+        self.replace_in_model(PageRevision, [PageRevision._meta.get_field('content_json')], from_text, to_text, dry_run)
+
+        page_models = get_concrete_models(get_page_models())
+        child_models = get_concrete_models([
+            child_relation.related_model
+            for page_class in get_page_models()
+            for child_relation in get_all_child_relations(page_class)
+        ])
+
+        # Page fields are replaced one database table at a time, so the fields
+        # on the base Page model are updated for all page types at once
+        updated_page_ids = set()
+        for page_class in page_models:
+            updated_page_ids.update(
+                self.replace_in_model(page_class, get_text_fields(page_class), from_text, to_text, dry_run)
+            )
+
+        for model in child_models:
+            pks = self.replace_in_model(model, get_text_fields(model), from_text, to_text, dry_run)
+
+            if pks and not dry_run and model not in page_models and index.class_is_indexed(model):
+                reindex_objects(model, pks)
+
+        if updated_page_ids and not dry_run:
+            invalidate_page_caches(sorted(updated_page_ids))
+
+            self.stdout.write("reindexing %d pages" % len(updated_page_ids))
+            reindex_pages(sorted(updated_page_ids))
 
-        for revision in PageRevision.objects.filter(content_json__contains=from_text):
-            revision.content_json = revision.content_json.replace(from_text, to_text)
-            revision.save(update_fields=['content_json'])
+    def replace_in_model(self, model, fields, from_text, to_text, dry_run):
+        self.stdout.write("scanning %s" % model._meta.verbose_name)
 
-        for page_class in get_page_models():
-            self.stdout.write("scanning %s" % page_class._meta.verbose_name)
+        pks = replace_in_model(model, fields, from_text, to_text, dry_run=dry_run)
 
-            child_relation_names = [rel.get_accessor_name() for rel in get_all_child_relations(page_class)]
+        if pks:
+            self.stdout.write("%s %d %s" % (
+                "found" if dry_run else "updated",
+                len(pks),
+                model._meta.verbose_name_plural
+            ))
 
-            # Find all pages of this exact type; exclude subclasses, as they will
-            # appear in the get_page_models() list in their own right, and this
-            # ensures that replacement happens only once
-            for page in page_class.objects.exact_type(page_class):
-                replace_in_model(page, from_text, to_text)
-                for child_rel in child_relation_names:
-                    for child in getattr(page, child_rel).all():
-                        replace_in_model(child, from_text, to_text)
+        return pks
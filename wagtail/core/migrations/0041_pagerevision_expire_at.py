@@ -0,0 +1,38 @@
+import json
+
+from django.db import migrations, models
+from django.utils import dateparse
+
+
+def set_revision_expire_at(apps, schema_editor):
+    PageRevision = apps.get_model('wagtailcore', 'PageRevision')
+
+    # Only revisions in the moderation queue are checked for expiry, and new
+    # revisions have their expiry time set when they are saved
+    revisions = PageRevision.objects.filter(submitted_for_moderation=True).only('id', 'content_json')
+
+    for revision in revisions.iterator():
+        expire_at = json.loads(revision.content_json).get('expire_at')
+        if expire_at:
+            PageRevision.objects.filter(id=revision.id).update(expire_at=dateparse.parse_datetime(expire_at))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailcore', '0040_page_draft_title'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pagerevision',
+            name='approved_go_live_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='approved go live at'),
+        ),
+        migrations.AddField(
+            model_name='pagerevision',
+            name='expire_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='expiry date/time'),
+        ),
+        migrations.RunPython(set_revision_expire_at, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 import json
 import logging
+import operator
+import uuid
 from collections import defaultdict
+from functools import reduce
 from io import StringIO
 from urllib.parse import urlparse
 
@@ -8,25 +11,29 @@ from django.conf import settings
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
 from django.core import checks
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.exceptions import ValidationError
 from django.core.handlers.base import BaseHandler
 from django.core.handlers.wsgi import WSGIRequest
-from django.db import models, transaction
-from django.db.models import Q, Value
+from django.db import connections, models, router, transaction
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, Sum, Value, When, signals
 from django.db.models.functions import Concat, Substr
 from django.http import Http404
 from django.template.response import TemplateResponse
 from django.urls import reverse
-from django.utils import timezone
+from django.utils import dateparse, timezone
 from django.utils.functional import cached_property
 from django.utils.text import capfirst, slugify
 from django.utils.translation import ugettext_lazy as _
-from modelcluster.models import ClusterableModel, get_all_child_relations
+from modelcluster.models import (
+    ClusterableModel, get_all_child_m2m_relations, get_all_child_relations)
 from treebeard.mp_tree import MP_Node
 
 from wagtail.core.query import PageQuerySet, TreeQuerySet
-from wagtail.core.signals import page_published, page_unpublished
+from wagtail.core.rich_text import cache as rich_text_cache
+from wagtail.core.signals import page_moved, page_published, page_unpublished
 from wagtail.core.sites import get_site_for_hostname
 from wagtail.core.url_routing import RouteResult
 from wagtail.core.utils import WAGTAIL_APPEND_SLASH, camelcase_to_underscore, resolve_model_string
@@ -186,6 +193,130 @@ def get_default_page_content_type():
     return ContentType.objects.get_for_model(Page)
 
 
+def _bulk_insert_local_fields(model, objs):
+    """
+    Inserts the columns of the given objects that are stored in the table of
+    model, but not those in the tables of its parent models. Unlike bulk_create,
+    this works for models using multi-table inheritance as long as the rows in
+    the parent tables have already been inserted.
+    """
+    fields = model._meta.local_concrete_fields
+    connection = connections[router.db_for_write(model)]
+    batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+
+    quote_name = connection.ops.quote_name
+    insert_sql = 'INSERT INTO %s (%s) VALUES ' % (
+        quote_name(model._meta.db_table), ', '.join(quote_name(field.column) for field in fields)
+    )
+    row_sql = '(%s)' % ', '.join(['%s'] * len(fields))
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(objs), batch_size):
+            batch = objs[i:i + batch_size]
+            cursor.execute(insert_sql + ', '.join([row_sql] * len(batch)), [
+                field.get_db_prep_save(field.pre_save(obj, True), connection)
+                for obj in batch for field in fields
+            ])
+
+
+# The methods of Page that the bulk copy in Page._copy_descendants doesn't call.
+# Subtrees containing page types that override any of them are copied one page
+# at a time instead.
+BULK_COPY_BYPASSED_METHODS = ['copy', 'save', 'full_clean', 'clean', 'set_url_path']
+
+
+def _can_copy_in_bulk(page_models):
+    """
+    Returns True if pages of the given models, and their child objects, can be
+    copied by Page._copy_descendants, without calling their save methods
+    """
+    for model in page_models:
+        if any(getattr(model, name) is not getattr(Page, name) for name in BULK_COPY_BYPASSED_METHODS):
+            return False
+
+        # pre_save receivers could change the pages before they're saved
+        if signals.pre_save.has_listeners(model):
+            return False
+
+        # Child objects are inserted with bulk_create, which doesn't call their
+        # save methods or send any signals for them
+        for child_relation in get_all_child_relations(model):
+            child_model = child_relation.related_model
+
+            if child_model.save is not models.Model.save:
+                return False
+
+            if signals.pre_save.has_listeners(child_model) or signals.post_save.has_listeners(child_model):
+                return False
+
+    return True
+
+
+# The methods of Page that the bulk PageQuerySet.unpublish() doesn't call. Pages
+# of types that override any of them are unpublished one at a time instead.
+BULK_UNPUBLISH_BYPASSED_METHODS = ['unpublish', 'save']
+
+
+def _can_unpublish_in_bulk(model):
+    """
+    Returns True if pages of the given model can be unpublished by
+    PageQuerySet.unpublish() with UPDATE statements, without saving them
+    """
+    if any(getattr(model, name) is not getattr(Page, name) for name in BULK_UNPUBLISH_BYPASSED_METHODS):
+        return False
+
+    if signals.pre_save.has_listeners(model):
+        return False
+
+    # post_save receivers wouldn't be called, unless they have marked
+    # themselves as handling pages that are updated in bulk
+    return all(
+        getattr(receiver, 'handles_bulk_updates', False)
+        for receiver in signals.post_save._live_receivers(model)
+    )
+
+
+def _bulk_create_with_pks(model, objs):
+    """
+    Saves the given objects, making sure that their primary keys get set. This
+    uses bulk_create on databases that can return primary keys from it.
+    """
+    connection = connections[router.db_for_write(model)]
+
+    if connection.features.can_return_ids_from_bulk_insert and not model._meta.parents:
+        model._default_manager.bulk_create(objs)
+    else:
+        for obj in objs:
+            obj.save()
+
+
+def _get_copied_revision_content(content_json, page_copy, child_object_id_map):
+    """
+    Updates the ids in the content of a revision that is being copied to page_copy
+    """
+    revision_content = json.loads(content_json)
+    revision_content['pk'] = page_copy.pk
+
+    for child_relation in get_all_child_relations(page_copy):
+        accessor_name = child_relation.get_accessor_name()
+        try:
+            child_objects = revision_content[accessor_name]
+        except KeyError:
+            # KeyErrors are possible if the revision was created
+            # before this child relation was added to the database
+            continue
+
+        for child_object in child_objects:
+            child_object[child_relation.field.name] = page_copy.pk
+
+            # Remap primary key to copied versions
+            # If the primary key is not recognised (eg, the child object has been deleted from the database)
+            # set the primary key to None
+            child_object['pk'] = child_object_id_map[accessor_name].get(child_object['pk'], None)
+
+    return json.dumps(revision_content)
+
+
 class BasePageManager(models.Manager):
     def get_queryset(self):
         return self._queryset_class(self.model).order_by('path')
@@ -372,6 +503,15 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
     def __str__(self):
         return self.title
 
+    def refresh_from_db(self, using=None, fields=None):
+        # Pages from a specific(defer=True) query load their deferred fields
+        # together with the other pages of the same type from that query
+        loader = self.__dict__.get('_deferred_fields_loader')
+        if fields is not None and loader is not None and loader.load(fields):
+            return
+
+        super().refresh_from_db(using=using, fields=fields)
+
     def set_url_path(self, parent):
         """
         Populate the url_path field based on this page's slug and the specified parent page.
@@ -467,6 +607,7 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
 
         if update_descendant_url_paths:
             self._update_descendant_url_paths(old_url_path, new_url_path)
+            rich_text_cache.invalidate_page_urls()
 
         # Check if this is a root page of any sites and clear the 'wagtail_site_root_paths' key if so
         if Site.objects.filter(root_page=self).exists():
@@ -564,6 +705,44 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
                 Value(new_url_path),
                 Substr('url_path', len(old_url_path) + 1))))
 
+    def _rebuild_descendant_url_paths(self):
+        """
+        Recalculates the url_path of every descendant of this page from their
+        slugs, one level of the tree below this page at a time. Pages whose
+        url_path is already correct are left untouched.
+        """
+        # The url_paths of the pages on the level above, by their tree path
+        parent_url_paths = {self.path: self.url_path}
+        depth = self.depth + 1
+
+        while parent_url_paths:
+            url_paths = {}
+            changed_url_paths = {}
+            pages = Page.objects.filter(path__startswith=self.path, depth=depth).values_list(
+                'pk', 'path', 'slug', 'url_path'
+            )
+
+            for pk, path, slug, url_path in pages.iterator():
+                new_url_path = parent_url_paths[path[:-self.steplen]] + slug + '/'
+                url_paths[path] = new_url_path
+                if url_path != new_url_path:
+                    changed_url_paths[pk] = new_url_path
+
+            # The new url_paths are passed as parameters rather than read from the parent
+            # pages with a subquery, as MySQL can't update a table it selects from
+            changed_pks = list(changed_url_paths.keys())
+            for i in range(0, len(changed_pks), 200):
+                batch = changed_pks[i:i + 200]
+                Page.objects.filter(pk__in=batch).update(url_path=Case(
+                    *[When(pk=pk, then=Value(changed_url_paths[pk])) for pk in batch],
+                    output_field=models.TextField()
+                ))
+
+            parent_url_paths = url_paths
+            depth += 1
+
+        rich_text_cache.invalidate_page_urls()
+
     #: Return this page in its most specific subclassed form.
     @cached_property
     def specific(self):
@@ -1031,7 +1210,8 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
         """
         Extension to the treebeard 'move' method to ensure that url_path is updated too.
         """
-        old_url_path = Page.objects.get(id=self.id).url_path
+        old_path, old_url_path = Page.objects.filter(id=self.id).values_list('path', 'url_path').get()
+
         super().move(target, pos=pos)
         # treebeard's move method doesn't actually update the in-memory instance, so we need to work
         # with a freshly loaded one now
@@ -1039,18 +1219,29 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
         new_url_path = new_self.set_url_path(new_self.get_parent())
         new_self.save()
         new_self._update_descendant_url_paths(old_url_path, new_url_path)
+        rich_text_cache.invalidate_page_urls()
+
+        # Page permissions are indexed by path, which has changed for this page
+        # and its descendants
+        PagePermissionIndex.invalidate_cache_on_commit()
+
+        page_moved.send(
+            sender=new_self.specific_class, instance=new_self.specific,
+            old_path=old_path, old_url_path=old_url_path)
 
         # Log
         logger.info("Page moved: \"%s\" id=%d path=%s", self.title, self.id, new_url_path)
 
-    def copy(self, recursive=False, to=None, update_attrs=None, copy_revisions=True, keep_live=True, user=None):
-        # Fill dict with self.specific values
-        specific_self = self.specific
+    def _get_field_values_for_copy(self):
+        """
+        Returns a dict of the field values of this (specific) page that should be
+        given to a copy of it
+        """
         default_exclude_fields = ['id', 'path', 'depth', 'numchild', 'url_path', 'path', 'index_entries']
-        exclude_fields = default_exclude_fields + specific_self.exclude_fields_in_copy
-        specific_dict = {}
+        exclude_fields = default_exclude_fields + self.exclude_fields_in_copy
+        field_values = {}
 
-        for field in specific_self._meta.get_fields():
+        for field in self._meta.get_fields():
             # Ignore explicitly excluded fields
             if field.name in exclude_fields:
                 continue
@@ -1068,7 +1259,28 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
             if isinstance(field, models.OneToOneField) and field.remote_field.parent_link:
                 continue
 
-            specific_dict[field.name] = getattr(specific_self, field.name)
+            # Copy foreign keys by id, to avoid fetching the related objects
+            if isinstance(field, models.ForeignKey):
+                field_values[field.attname] = getattr(self, field.attname)
+                continue
+
+            field_values[field.name] = getattr(self, field.name)
+
+        return field_values
+
+    def copy(self, recursive=False, to=None, update_attrs=None, copy_revisions=True, keep_live=True, user=None):
+        """
+        Copies this page to a new location. By default the copy is created as a
+        sibling of this page, use `to` to pass in a different parent page.
+
+        If `recursive` is set, all of the descendants of this page are copied too.
+
+        `copy_revisions` may be set to False to not copy any revisions, or to
+        'latest' to only copy the latest revision of each page.
+        """
+        # Fill dict with self.specific values
+        specific_self = self.specific
+        specific_dict = specific_self._get_field_values_for_copy()
 
         # New instance from prepared dict values, in case the instance class implements multiple levels inheritance
         page_copy = self.specific_class(**specific_dict)
@@ -1117,34 +1329,20 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
 
         # Copy revisions
         if copy_revisions:
-            for revision in self.revisions.all():
+            revisions = self.revisions.order_by('created_at', 'id')
+            if copy_revisions == 'latest':
+                revisions = revisions.reverse()[:1]
+
+            for revision in revisions:
                 revision.pk = None
                 revision.submitted_for_moderation = False
                 revision.approved_go_live_at = None
                 revision.page = page_copy
 
                 # Update ID fields in content
-                revision_content = json.loads(revision.content_json)
-                revision_content['pk'] = page_copy.pk
-
-                for child_relation in get_all_child_relations(specific_self):
-                    accessor_name = child_relation.get_accessor_name()
-                    try:
-                        child_objects = revision_content[accessor_name]
-                    except KeyError:
-                        # KeyErrors are possible if the revision was created
-                        # before this child relation was added to the database
-                        continue
-
-                    for child_object in child_objects:
-                        child_object[child_relation.field.name] = page_copy.pk
-
-                        # Remap primary key to copied versions
-                        # If the primary key is not recognised (eg, the child object has been deleted from the database)
-                        # set the primary key to None
-                        child_object['pk'] = child_object_id_map[accessor_name].get(child_object['pk'], None)
-
-                revision.content_json = json.dumps(revision_content)
+                revision.content_json = _get_copied_revision_content(
+                    revision.content_json, page_copy, child_object_id_map
+                )
 
                 # Save
                 revision.save()
@@ -1172,10 +1370,22 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
 
         # Copy child pages
         if recursive:
-            for child_page in self.get_children():
-                child_page.specific.copy(
-                    recursive=True,
-                    to=page_copy,
+            descendants = list(self.get_descendants().specific())
+
+            if not _can_copy_in_bulk(set(type(page) for page in descendants)):
+                # Some pages customise how they are copied or saved, so they need to be copied one at a time
+                for child_page in self.get_children():
+                    child_page.specific.copy(
+                        recursive=True,
+                        to=page_copy,
+                        copy_revisions=copy_revisions,
+                        keep_live=keep_live,
+                        user=user
+                    )
+            else:
+                self._copy_descendants(
+                    descendants,
+                    page_copy,
                     copy_revisions=copy_revisions,
                     keep_live=keep_live,
                     user=user
@@ -1185,6 +1395,217 @@ class Page(AbstractPage, index.Indexed, ClusterableModel, metaclass=PageBase):
 
     copy.alters_data = True
 
+    def _copy_descendants(self, descendants, page_copy, copy_revisions=True, keep_live=True, user=None):
+        """
+        Copies the given descendants of this page (in their most specific form) to
+        be descendants of page_copy, using a fixed number of queries for each page
+        type and child relation instead of copying the pages one at a time.
+        """
+        if not descendants:
+            return
+
+        now = timezone.now()
+
+        # Treebeard paths for the whole subtree can be allocated up front, as
+        # page_copy has no children yet and the copied pages keep their relative
+        # positions
+        url_paths = {page_copy.path: page_copy.url_path}
+        numchild = defaultdict(int)
+        new_pages = {}
+
+        for page in descendants:
+            new_page = type(page)(**page._get_field_values_for_copy())
+            new_page.path = page_copy.path + page.path[len(self.path):]
+            new_page.depth = page_copy.depth + page.depth - self.depth
+
+            parent_path = new_page.path[:-self.steplen]
+            numchild[parent_path] += 1
+            new_page.url_path = url_paths[new_page.path] = url_paths[parent_path] + new_page.slug + '/'
+
+            new_page.live_revision = None
+            new_page.latest_revision_created_at = now
+
+            if keep_live:
+                new_page.first_published_at = now
+                new_page.last_published_at = now
+            else:
+                new_page.live = False
+                new_page.has_unpublished_changes = True
+                new_page.first_published_at = None
+                new_page.last_published_at = None
+
+            if user:
+                new_page.owner = user
+
+            new_pages[page.pk] = new_page
+
+        for new_page in new_pages.values():
+            new_page.numchild = numchild[new_page.path]
+
+        # Insert the pages, then the rows for each of their specific page types
+        Page.objects.bulk_create(new_pages.values())
+
+        new_page_ids = dict(
+            Page.objects.filter(path__startswith=page_copy.path, depth__gt=page_copy.depth)
+            .values_list('path', 'pk')
+        )
+
+        pages_by_model = defaultdict(list)
+        for new_page in new_pages.values():
+            new_page.id = new_page_ids[new_page.path]
+
+            for model in [type(new_page)] + new_page._meta.get_parent_list():
+                if model is not Page and issubclass(model, Page):
+                    # Point the parent links of this model at the new page
+                    setattr(new_page, model._meta.pk.attname, new_page.id)
+                    pages_by_model[model].append(new_page)
+
+            new_page._state.adding = False
+
+        # Insert the most general models first so that the parent links are valid
+        for model in sorted(pages_by_model.keys(), key=lambda model: len(model._meta.get_parent_list())):
+            _bulk_insert_local_fields(model, pages_by_model[model])
+
+        Page.objects.filter(pk=page_copy.pk).update(numchild=numchild[page_copy.path])
+        page_copy.numchild = numchild[page_copy.path]
+
+        # Copy child objects
+        # This maps the id of each original page to the new ids of its child objects
+        # (in the same format as child_object_id_map in Page.copy)
+        child_object_id_maps = defaultdict(lambda: defaultdict(dict))
+        child_relations = {
+            (child_relation.related_model, child_relation.field.name): child_relation
+            for page_model in set(type(page) for page in descendants)
+            for child_relation in get_all_child_relations(page_model)
+        }
+
+        for new_page in new_pages.values():
+            # Keep the copied child objects on the new pages, so that they can be
+            # serialised without querying them again
+            for child_relation in get_all_child_relations(new_page):
+                setattr(new_page, child_relation.get_accessor_name(), [])
+
+            # Many to many relations aren't copied
+            for field in get_all_child_m2m_relations(new_page):
+                setattr(new_page, field.name, [])
+
+        for child_relation in child_relations.values():
+            accessor_name = child_relation.get_accessor_name()
+            parental_key_name = child_relation.field.attname
+            child_objects = list(child_relation.related_model._default_manager.filter(**{
+                parental_key_name + '__in': new_pages.keys(),
+            }))
+            copied_from = []
+
+            for child_object in child_objects:
+                copied_from.append((getattr(child_object, parental_key_name), child_object.pk))
+                child_object.pk = None
+                setattr(child_object, parental_key_name, new_pages[copied_from[-1][0]].id)
+
+            _bulk_create_with_pks(child_relation.related_model, child_objects)
+
+            child_objects_by_page = defaultdict(list)
+            for (old_page_id, old_pk), child_object in zip(copied_from, child_objects):
+                # Add mapping to new primary key (so we can apply this change to revisions)
+                child_object_id_maps[old_page_id][accessor_name][old_pk] = child_object.pk
+                child_objects_by_page[old_page_id].append(child_object)
+
+            for old_page_id, page_child_objects in child_objects_by_page.items():
+                setattr(new_pages[old_page_id], accessor_name, page_child_objects)
+
+        # Copy revisions, rewriting their content as they're streamed from the database
+        latest_revision_content = {}
+
+        if copy_revisions:
+            revisions = PageRevision.objects.filter(page_id__in=new_pages.keys()).order_by('page_id', 'created_at', 'id')
+            if copy_revisions == 'latest':
+                latest_revision_ids = {}
+                for page_id, revision_id in revisions.values_list('page_id', 'id').iterator():
+                    latest_revision_ids[page_id] = revision_id
+                revisions = revisions.filter(id__in=latest_revision_ids.values())
+
+            revision_copies = []
+            for revision in revisions.iterator():
+                new_page = new_pages[revision.page_id]
+                content_json = _get_copied_revision_content(
+                    revision.content_json, new_page, child_object_id_maps[revision.page_id]
+                )
+                latest_revision_content[revision.page_id] = content_json
+
+                revision_copies.append(PageRevision(
+                    page_id=new_page.id,
+                    content_json=content_json,
+                    created_at=revision.created_at,
+                    user_id=revision.user_id,
+                    expire_at=revision.expire_at,
+                ))
+
+                if len(revision_copies) >= 100:
+                    PageRevision.objects.bulk_create(revision_copies)
+                    revision_copies = []
+
+            PageRevision.objects.bulk_create(revision_copies)
+
+        # Create a new revision of each page
+        # (See the comment on the equivalent step in Page.copy)
+        new_revisions = []
+        for page in descendants:
+            new_page = new_pages[page.pk]
+
+            if new_page.has_unpublished_changes and page.pk in latest_revision_content:
+                content_json = latest_revision_content[page.pk]
+            else:
+                content_json = new_page.to_json()
+
+            new_revisions.append(PageRevision(
+                page_id=new_page.id,
+                content_json=content_json,
+                created_at=now,
+                user=user,
+                expire_at=PageRevision.get_expire_at_from_content(content_json),
+            ))
+
+        PageRevision.objects.bulk_create(new_revisions)
+
+        live_revision_ids = {}
+        if keep_live:
+            Page.objects.filter(pk__in=new_page_ids.values()).update(
+                live_revision=Subquery(
+                    PageRevision.objects.filter(page=OuterRef('pk'))
+                    .order_by('-created_at', '-id').values('pk')[:1]
+                )
+            )
+            live_revision_ids = dict(
+                Page.objects.filter(pk__in=new_page_ids.values()).values_list('pk', 'live_revision_id')
+            )
+
+        pages_by_specific_model = defaultdict(list)
+        for page in descendants:
+            new_page = new_pages[page.pk]
+            if keep_live:
+                new_page.live_revision_id = live_revision_ids.get(new_page.pk)
+
+            pages_by_specific_model[type(new_page)].append(new_page)
+
+        for model, model_pages in pages_by_specific_model.items():
+            index.insert_or_update_objects(model, model_pages)
+
+        # Send the post_save signal that saving each page would have sent. It's
+        # sent with bulk=True, so that the search signal handler doesn't index
+        # the pages again
+        using = router.db_for_write(Page)
+        for page in descendants:
+            new_page = new_pages[page.pk]
+
+            signals.post_save.send(
+                sender=type(new_page), instance=new_page, created=True, update_fields=None, raw=False, using=using,
+                bulk=True
+            )
+
+            logger.info("Page copied: \"%s\" id=%d from=%d", page.title, new_page.id, page.id)
+
+    _copy_descendants.alters_data = True
+
     def permissions_for_user(self, user):
         """
         Return a PagePermissionsTester object defining what actions the user can perform on this page
@@ -1418,7 +1839,15 @@ class PageRevision(models.Model):
         on_delete=models.SET_NULL
     )
     content_json = models.TextField(verbose_name=_('content JSON'))
-    approved_go_live_at = models.DateTimeField(verbose_name=_('approved go live at'), null=True, blank=True)
+    approved_go_live_at = models.DateTimeField(
+        verbose_name=_('approved go live at'), null=True, blank=True, db_index=True
+    )
+
+    # A copy of the expire_at value in content_json, so that expired revisions can
+    # be found without decoding the content of every revision
+    expire_at = models.DateTimeField(
+        verbose_name=_('expiry date/time'), null=True, blank=True, db_index=True, editable=False
+    )
 
     objects = models.Manager()
     submitted_revisions = SubmittedRevisionsManager()
@@ -1430,11 +1859,21 @@ class PageRevision(models.Model):
         if self.created_at is None:
             self.created_at = timezone.now()
 
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content_json' in update_fields:
+            self.expire_at = self.get_expire_at_from_content(self.content_json)
+
         super().save(*args, **kwargs)
         if self.submitted_for_moderation:
             # ensure that all other revisions of this page have the 'submitted for moderation' flag unset
             self.page.revisions.exclude(id=self.id).update(submitted_for_moderation=False)
 
+    @staticmethod
+    def get_expire_at_from_content(content_json):
+        expire_at = json.loads(content_json).get('expire_at')
+        if expire_at:
+            return dateparse.parse_datetime(expire_at)
+
     def as_page_object(self):
         obj = self.page.specific_class.from_json(self.content_json)
 
@@ -1582,6 +2021,123 @@ class GroupPagePermission(models.Model):
         )
 
 
+class PagePermissionIndex:
+    """
+    A compiled form of the page permissions that a user has been granted through
+    their groups. This maps the path of each page that has permissions to the
+    set of permission types that apply to that page and all of its descendants.
+
+    Indexes are cached per user. The cache is invalidated whenever page
+    permissions, group memberships or page paths change.
+
+    Indexes are only cached if the default cache is shared between processes.
+    A process-local cache (such as LocMemCache) can't be invalidated by other
+    processes, so they would keep using revoked permissions until their
+    cached indexes expired.
+    """
+    CACHE_VERSION_KEY = 'wagtail_page_permissions_version'
+
+    def __init__(self, permissions):
+        """
+        Takes an iterable of (page path, permission type) tuples
+        """
+        self.permission_types_by_path = defaultdict(set)
+
+        for path, permission_type in permissions:
+            self.permission_types_by_path[path].add(permission_type)
+
+    @classmethod
+    def cache_is_shared(cls):
+        return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+    @classmethod
+    def for_user(cls, user):
+        if not cls.cache_is_shared():
+            return cls(GroupPagePermission.objects.filter(group__user=user).values_list('page__path', 'permission_type'))
+
+        version = cache.get(cls.CACHE_VERSION_KEY)
+        if version is None:
+            version = cls.invalidate_cache()
+
+        cache_key = 'wagtail_page_permissions:%s:%s' % (user.pk, version)
+        permissions = cache.get(cache_key)
+
+        if permissions is None:
+            permissions = list(
+                GroupPagePermission.objects.filter(group__user=user).values_list('page__path', 'permission_type')
+            )
+            cache.set(cache_key, permissions, 3600)
+
+        return cls(permissions)
+
+    @classmethod
+    def invalidate_cache(cls):
+        """
+        Invalidates the cached indexes of all users
+        """
+        # Use a random version rather than a counter so that indexes cached under
+        # an old version can't be picked up again if the version key is evicted
+        version = uuid.uuid4().hex
+        cache.set(cls.CACHE_VERSION_KEY, version, None)
+        return version
+
+    @classmethod
+    def invalidate_cache_on_commit(cls):
+        """
+        Invalidates the cached indexes now, and again once the current transaction
+        is committed. Other requests could otherwise rebuild an index from the
+        permissions as they were before the commit, and cache it under the new version.
+        """
+        cls.invalidate_cache()
+        transaction.on_commit(cls.invalidate_cache)
+
+    def get_permission_types(self, page):
+        """
+        Returns the set of permission types that apply to the specified page
+        """
+        permission_types = set()
+
+        # Check the page and each of its ancestors
+        for i in range(Page.steplen, len(page.path) + 1, Page.steplen):
+            permission_types.update(self.permission_types_by_path.get(page.path[:i], ()))
+
+        return permission_types
+
+    def get_paths(self, permission_type):
+        """
+        Returns a sorted list of the paths of the subtrees that the specified
+        permission type applies to. Subtrees that are inside another subtree in
+        the list are left out.
+        """
+        paths = []
+
+        # As the paths are sorted, any descendants of a path come straight after it
+        for path in sorted(self.permission_types_by_path.keys()):
+            if permission_type not in self.permission_types_by_path[path]:
+                continue
+
+            if paths and path.startswith(paths[-1]):
+                continue
+
+            paths.append(path)
+
+        return paths
+
+    def get_filter(self, permission_type, path_field='path'):
+        """
+        Returns a Q object that matches all the pages (or objects that relate to
+        a page, with path_field set to eg 'page__path') that the specified
+        permission type applies to. Returns None if there are no such pages.
+        """
+        query = None
+
+        for path in self.get_paths(permission_type):
+            path_query = Q(**{path_field + '__startswith': path})
+            query = path_query if query is None else query | path_query
+
+        return query
+
+
 class UserPagePermissionsProxy:
     """Helper object that encapsulates all the page permission rules that this user has
     across the page hierarchy."""
@@ -1592,6 +2148,13 @@ class UserPagePermissionsProxy:
         if user.is_active and not user.is_superuser:
             self.permissions = GroupPagePermission.objects.filter(group__user=self.user).select_related('page')
 
+        # Counts of pages within the subtree of each page, keyed by page id
+        self.subtree_stats = {}
+
+    @cached_property
+    def permission_index(self):
+        return PagePermissionIndex.for_user(self.user)
+
     def revisions_for_moderation(self):
         """Return a queryset of page revisions awaiting moderation that this user has publish permission on"""
 
@@ -1601,17 +2164,12 @@ class UserPagePermissionsProxy:
         if self.user.is_superuser:
             return PageRevision.submitted_revisions.all()
 
-        # get the list of pages for which they have direct publish permission
-        # (i.e. they can publish any page within this subtree)
-        publishable_pages = [perm.page for perm in self.permissions if perm.permission_type == 'publish']
-        if not publishable_pages:
-            return PageRevision.objects.none()
-
         # compile a filter expression to apply to the PageRevision.submitted_revisions manager:
-        # return only those pages whose paths start with one of the publishable_pages paths
-        only_my_sections = Q(page__path__startswith=publishable_pages[0].path)
-        for page in publishable_pages[1:]:
-            only_my_sections = only_my_sections | Q(page__path__startswith=page.path)
+        # return only those pages whose paths start with one of the paths that the user
+        # has direct publish permission on (i.e. they can publish any page within this subtree)
+        only_my_sections = self.permission_index.get_filter('publish', path_field='page__path')
+        if only_my_sections is None:
+            return PageRevision.objects.none()
 
         # return the filtered queryset
         return PageRevision.submitted_revisions.filter(only_my_sections)
@@ -1621,6 +2179,48 @@ class UserPagePermissionsProxy:
         permission to perform specific tasks on the given page"""
         return PagePermissionTester(self, page)
 
+    def prefetch_subtree_stats(self, pages):
+        """
+        Fetch the counts needed by PagePermissionTester.can_delete and can_move_to for
+        all of the given pages (and their descendants) at once, rather than with
+        separate queries for each page. This should be used for listings that check
+        these permissions on many pages.
+        """
+        if not self.user.is_active or self.user.is_superuser:
+            # These users never need to look at the subtree
+            return
+
+        pages_by_path = {page.path: page for page in pages if page.pk not in self.subtree_stats}
+
+        # Pages at the same depth share the same length of path prefix, so
+        # the subtrees of all of them can be counted in a single grouped query
+        paths_by_depth = defaultdict(list)
+        for path in pages_by_path.keys():
+            paths_by_depth[len(path)].append(path)
+
+        not_owned = ~Q(owner=self.user)
+
+        def count_where(condition):
+            # Count(filter=...) is ignored before Django 2.0, so add up a
+            # conditional expression instead
+            return Sum(Case(When(condition, then=1), default=0, output_field=IntegerField()))
+
+        for path_length, paths in paths_by_depth.items():
+            stats = (
+                Page.objects.filter(reduce(operator.or_, (Q(path__startswith=path) for path in paths)))
+                .annotate(subtree_path=Substr('path', 1, path_length))
+                .values('subtree_path')
+                .annotate(
+                    live_count=count_where(Q(live=True)),
+                    not_owned_count=count_where(not_owned),
+                    live_or_not_owned_count=count_where(Q(live=True) | not_owned),
+                )
+                .order_by()
+            )
+
+            for row in stats:
+                self.subtree_stats[pages_by_path[row.pop('subtree_path')].pk] = row
+
     def editable_pages(self):
         """Return a queryset of the pages that this user has permission to edit"""
         # Deal with the trivial cases first...
@@ -1629,19 +2229,21 @@ class UserPagePermissionsProxy:
         if self.user.is_superuser:
             return Page.objects.all()
 
-        editable_pages = Page.objects.none()
+        # user has edit permission on any subpage of a page they have 'edit' permission on
+        # (including that page itself) regardless of owner
+        editable_pages = self.permission_index.get_filter('edit')
 
-        for perm in self.permissions.filter(permission_type='add'):
-            # user has edit permission on any subpage of perm.page
-            # (including perm.page itself) that is owned by them
-            editable_pages |= Page.objects.descendant_of(perm.page, inclusive=True).filter(owner=self.user)
+        # user has edit permission on any subpage of a page they have 'add' permission on
+        # (including that page itself) that is owned by them
+        owned_pages = self.permission_index.get_filter('add')
+        if owned_pages is not None:
+            owned_pages &= Q(owner=self.user)
+            editable_pages = owned_pages if editable_pages is None else editable_pages | owned_pages
 
-        for perm in self.permissions.filter(permission_type='edit'):
-            # user has edit permission on any subpage of perm.page
-            # (including perm.page itself) regardless of owner
-            editable_pages |= Page.objects.descendant_of(perm.page, inclusive=True)
+        if editable_pages is None:
+            return Page.objects.none()
 
-        return editable_pages
+        return Page.objects.filter(editable_pages)
 
     def can_edit_pages(self):
         """Return True if the user has permission to edit any pages"""
@@ -1655,14 +2257,13 @@ class UserPagePermissionsProxy:
         if self.user.is_superuser:
             return Page.objects.all()
 
-        publishable_pages = Page.objects.none()
-
-        for perm in self.permissions.filter(permission_type='publish'):
-            # user has publish permission on any subpage of perm.page
-            # (including perm.page itself)
-            publishable_pages |= Page.objects.descendant_of(perm.page, inclusive=True)
+        # user has publish permission on any subpage of a page they have 'publish'
+        # permission on (including that page itself)
+        publishable_pages = self.permission_index.get_filter('publish')
+        if publishable_pages is None:
+            return Page.objects.none()
 
-        return publishable_pages
+        return Page.objects.filter(publishable_pages)
 
     def can_publish_pages(self):
         """Return True if the user has permission to publish any pages"""
@@ -1677,10 +2278,7 @@ class PagePermissionTester:
         self.page_is_root = page.depth == 1  # Equivalent to page.is_root()
 
         if self.user.is_active and not self.user.is_superuser:
-            self.permissions = set(
-                perm.permission_type for perm in user_perms.permissions
-                if self.page.path.startswith(perm.page.path)
-            )
+            self.permissions = user_perms.permission_index.get_permission_types(self.page)
 
     def can_add_subpage(self):
         if not self.user.is_active:
@@ -1715,13 +2313,19 @@ class PagePermissionTester:
         if 'bulk_delete' not in self.permissions and not self.page.is_leaf():
             return False
 
+        subtree_stats = self.user_perms.subtree_stats.get(self.page.pk)
+
         if 'edit' in self.permissions:
             # if the user does not have publish permission, we also need to confirm that there
             # are no published pages here
             if 'publish' not in self.permissions:
-                pages_to_delete = self.page.get_descendants(inclusive=True)
-                if pages_to_delete.live().exists():
-                    return False
+                if subtree_stats is not None:
+                    if subtree_stats['live_count']:
+                        return False
+                else:
+                    pages_to_delete = self.page.get_descendants(inclusive=True)
+                    if pages_to_delete.live().exists():
+                        return False
 
             return True
 
@@ -1730,10 +2334,14 @@ class PagePermissionTester:
             if 'publish' in self.permissions:
                 # we don't care about live state, but all pages must be owned by this user
                 # (i.e. eliminating pages owned by this user must give us the empty set)
+                if subtree_stats is not None:
+                    return not subtree_stats['not_owned_count']
                 return not pages_to_delete.exclude(owner=self.user).exists()
             else:
                 # all pages must be owned by this user and non-live
                 # (i.e. eliminating non-live pages owned by this user must give us the empty set)
+                if subtree_stats is not None:
+                    return not subtree_stats['live_or_not_owned_count']
                 return not pages_to_delete.exclude(live=False, owner=self.user).exists()
 
         else:
@@ -1826,7 +2434,13 @@ class PagePermissionTester:
         if 'add' not in destination_perms.permissions:
             return False
 
-        if self.page.live or self.page.get_descendants().filter(live=True).exists():
+        subtree_stats = self.user_perms.subtree_stats.get(self.page.pk)
+        if subtree_stats is not None:
+            has_live_pages = bool(subtree_stats['live_count'])
+        else:
+            has_live_pages = self.page.live or self.page.get_descendants().filter(live=True).exists()
+
+        if has_live_pages:
             # moving this page will entail publishing within the destination section
             return ('publish' in destination_perms.permissions)
         else:
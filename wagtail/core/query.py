@@ -1,15 +1,25 @@
+import logging
 import posixpath
 from collections import defaultdict
 
+import django
 from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import CharField, Q
-from django.db.models.functions import Length, Substr
-from django.db.models.query import BaseIterable
+from django.db import transaction
+from django.db.models import DEFERRED, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.query import BaseIterable, ModelIterable
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE
+from django.utils import timezone
 from treebeard.mp_tree import MP_NodeQuerySet
 
+from wagtail.core.signals import (
+    page_published, page_unpublished, pages_published, pages_unpublished)
+from wagtail.search import index
 from wagtail.search.queryset import SearchableQuerySetMixin
 
+logger = logging.getLogger('wagtail.core')
+
 
 class TreeQuerySet(MP_NodeQuerySet):
     """
@@ -281,37 +291,23 @@ class PageQuerySet(SearchableQuerySetMixin, TreeQuerySet):
         node is returned in these cases. If ``strict`` is True, then a
         ``ObjectDoesNotExist`` is raised.
         """
+        # Find the common prefix of the paths of all the matched pages in a
+        # single pass, without keeping all of the paths in memory. The empty
+        # `.order_by()` stops the database from sorting the paths.
+        paths = self.order_by().values_list('path', flat=True).iterator()
+        if not include_self:
+            # Use the paths of the parents of the matched pages
+            paths = (path[:-self.model.steplen] for path in paths)
+
+        common_parent_path = get_common_ancestor_path(paths, self.model.steplen)
+
         # An empty queryset has no ancestors. This is a problem
-        if not self.exists():
+        if common_parent_path is None:
             if strict:
                 raise self.model.DoesNotExist('Can not find ancestor of empty queryset')
             return self.model.get_first_root_node()
 
-        if include_self:
-            # Get all the paths of the matched pages.
-            paths = self.order_by().values_list('path', flat=True)
-        else:
-            # Find all the distinct parent paths of all matched pages.
-            # The empty `.order_by()` ensures that `Page.path` is not also
-            # selected to order the results, which makes `.distinct()` works.
-            paths = self.order_by()\
-                .annotate(parent_path=Substr(
-                    'path', 1, Length('path') - self.model.steplen,
-                    output_field=CharField(max_length=255)))\
-                .values_list('parent_path', flat=True)\
-                .distinct()
-
-        # This method works on anything, not just file system paths.
-        common_parent_path = posixpath.commonprefix(paths)
-
-        # That may have returned a path like (0001, 0002, 000), which is
-        # missing some chars off the end. Fix this by trimming the path to a
-        # multiple of `Page.steplen`
-        extra_chars = len(common_parent_path) % self.model.steplen
-        if extra_chars != 0:
-            common_parent_path = common_parent_path[:-extra_chars]
-
-        if common_parent_path is '':
+        if common_parent_path == '':
             # This should only happen when there are multiple trees,
             # a situation that Wagtail does not support;
             # or when the root node itself is part of the queryset.
@@ -329,12 +325,174 @@ class PageQuerySet(SearchableQuerySetMixin, TreeQuerySet):
         # got bigger problems.
         return self.model.objects.get(path=common_parent_path)
 
-    def unpublish(self):
+    def publish(self):
+        """
+        This publishes the latest revision of every page in the QuerySet.
+
+        The publishing state of the pages is updated with a few UPDATE statements,
+        and the ``pages_published`` signal is sent once for all of the pages. Pages
+        with unpublished changes are still saved one at a time, as the content of
+        their latest revision has to be written to them, so the number of queries
+        only stays fixed for pages without unpublished changes. Pages whose latest
+        revision is scheduled to go live in the future are scheduled individually.
+        """
+        from wagtail.core.models import Page, PageRevision
+
+        now = timezone.now()
+        pages = list(self.specific())
+        page_ids = [page.pk for page in pages]
+
+        # Find the latest revision of each page
+        latest_revision_ids = {}
+        for batch in _batches(page_ids):
+            revisions = PageRevision.objects.filter(page_id__in=batch).order_by('page_id', 'created_at', 'id')
+            for page_id, revision_id in revisions.values_list('page_id', 'id').iterator():
+                latest_revision_ids[page_id] = revision_id
+
+        revisions = {}
+        for batch in _batches(list(latest_revision_ids.values())):
+            revisions.update(PageRevision.objects.select_related('page').in_bulk(batch))
+
+        published_pages = []
+        published_revisions = []
+
+        with transaction.atomic():
+            for page in pages:
+                revision = revisions.get(latest_revision_ids.get(page.pk))
+
+                if revision is not None and page.has_unpublished_changes:
+                    # The content of the page has changed since it was saved, so the
+                    # revision needs to be written to the database
+                    revision_page = revision.as_page_object()
+
+                    if revision_page.go_live_at and revision_page.go_live_at > now:
+                        revision.publish()
+                        continue
+
+                    revision_page.live = True
+                    revision_page.has_unpublished_changes = False
+                    revision_page.expired = False
+                    revision_page.live_revision = revision
+                    revision_page.last_published_at = now
+                    if revision_page.first_published_at is None:
+                        revision_page.first_published_at = now
+                    revision_page.save()
+
+                    page = revision_page
+
+                elif page.go_live_at and page.go_live_at > now:
+                    if revision is not None:
+                        revision.publish()
+                    continue
+
+                published_pages.append(page)
+                published_revisions.append(revision)
+
+            published_page_ids = [page.pk for page in published_pages]
+
+            for batch in _batches(published_page_ids):
+                Page.objects.filter(pk__in=batch).update(
+                    live=True,
+                    has_unpublished_changes=False,
+                    expired=False,
+                    last_published_at=now,
+                    first_published_at=Coalesce('first_published_at', Value(now)),
+                    live_revision=Subquery(
+                        PageRevision.objects.filter(page=OuterRef('pk'))
+                        .order_by('-created_at', '-id').values('pk')[:1]
+                    ),
+                )
+                PageRevision.objects.filter(page_id__in=batch).update(
+                    approved_go_live_at=None, submitted_for_moderation=False
+                )
+
+            for page, revision in zip(published_pages, published_revisions):
+                if revision is not None:
+                    revision.approved_go_live_at = None
+                    revision.submitted_for_moderation = False
+
+                page.live = True
+                page.has_unpublished_changes = False
+                page.expired = False
+                page.last_published_at = now
+                if page.first_published_at is None:
+                    page.first_published_at = now
+                page.live_revision = revision
+
+            self._send_bulk_signals(
+                pages_published, page_published, published_pages, revisions=published_revisions
+            )
+
+        for page, revision in zip(published_pages, published_revisions):
+            logger.info(
+                "Page published: \"%s\" id=%d revision_id=%s", page.title, page.id, revision.id if revision else None
+            )
+
+    def unpublish(self, set_expired=False):
         """
         This unpublishes all live pages in the QuerySet.
+
+        The pages are updated with a few UPDATE statements, rather than by saving
+        each page, and the ``pages_unpublished`` signal is sent once for all of
+        the pages. Pages of types that override ``unpublish`` or ``save``, or
+        that have ``pre_save`` or ``post_save`` receivers, are unpublished one
+        at a time instead.
+        """
+        from wagtail.core.models import Page, PageRevision, _can_unpublish_in_bulk
+
+        pages = list(self.live().specific())
+        bulk_models = set(model for model in set(type(page) for page in pages) if _can_unpublish_in_bulk(model))
+        bulk_pages = [page for page in pages if type(page) in bulk_models]
+
+        changes = {'live': False, 'has_unpublished_changes': True, 'live_revision': None}
+        if set_expired:
+            changes['expired'] = True
+
+        with transaction.atomic():
+            for page in pages:
+                if type(page) not in bulk_models:
+                    page.unpublish(set_expired=set_expired)
+
+            for batch in _batches([page.pk for page in bulk_pages]):
+                Page.objects.filter(pk__in=batch).update(**changes)
+                PageRevision.objects.filter(page_id__in=batch).update(approved_go_live_at=None)
+
+            for page in bulk_pages:
+                for field, value in changes.items():
+                    setattr(page, field, value)
+
+            self._send_bulk_signals(pages_unpublished, page_unpublished, bulk_pages)
+
+        for page in pages:
+            logger.info("Page unpublished: \"%s\" id=%d", page.title, page.id)
+
+    def _send_bulk_signals(self, bulk_signal, page_signal, pages, revisions=None):
+        """
+        Updates the search index for pages that have been updated in bulk, and
+        sends a single signal for all of them followed by the per-page signals.
+        The per-page signals are sent with bulk=True, so that receivers of the
+        bulk signal can ignore them
         """
-        for page in self.live():
-            page.unpublish()
+        if not pages:
+            return
+
+        pages_by_model = defaultdict(list)
+        for page in pages:
+            pages_by_model[type(page)].append(page)
+
+        for model, model_pages in pages_by_model.items():
+            index.insert_or_update_objects(model, model_pages)
+
+        if revisions is None:
+            bulk_signal.send(sender=self.model, instances=pages)
+
+            for page in pages:
+                page_signal.send(sender=page.specific_class, instance=page, bulk=True)
+        else:
+            bulk_signal.send(sender=self.model, instances=pages, revisions=revisions)
+
+            for page, revision in zip(pages, revisions):
+                page_signal.send(sender=page.specific_class, instance=page, revision=revision, bulk=True)
 
     def specific(self, defer=False):
         """
@@ -342,9 +500,14 @@ class PageQuerySet(SearchableQuerySetMixin, TreeQuerySet):
         the minimum number of queries.
 
         When the "defer" keyword argument is set to True, only the basic page
-        fields will be loaded and all specific fields will be deferred. It
-        will still generate a query for each page type though (this may be
-        improved to generate only a single query in a future release).
+        fields will be loaded, in a single query, and all specific fields will
+        be deferred. Accessing a deferred field on one of the pages loads that
+        field for all of the pages of the same type in the result set at once.
+
+        The pages can be streamed with ``.specific().iterator(chunk_size=...)``,
+        which loads the specific pages one window of ``chunk_size`` pages at a time.
+        Before Django 2.0, ``iterator()`` doesn't take a ``chunk_size`` and the
+        windows are 100 pages long.
         """
         clone = self._clone()
         if defer:
@@ -360,48 +523,228 @@ class PageQuerySet(SearchableQuerySetMixin, TreeQuerySet):
         return self.descendant_of(site.root_page, inclusive=True)
 
 
-def specific_iterator(qs, defer=False):
+def get_common_ancestor_path(paths, steplen):
+    """
+    Returns the longest common prefix of the given tree paths, trimmed to a
+    whole number of steps, or None if there are no paths. An empty string is
+    returned if the paths have no common ancestor.
+    """
+    common_path = None
+    for path in paths:
+        if common_path is None:
+            common_path = path
+        elif not path.startswith(common_path):
+            common_path = posixpath.commonprefix([common_path, path])
+
+    if common_path is None:
+        return None
+
+    # The prefix may end part way through a step, such as (0001, 0002, 000).
+    # Fix this by trimming the path to a multiple of `steplen`
+    return common_path[:len(common_path) - len(common_path) % steplen]
+
+
+def specific_iterator(qs, defer=False, chunk_size=None):
     """
     This efficiently iterates all the specific pages in a queryset, using
     the minimum number of queries.
 
+    When ``chunk_size`` is given, the queryset is processed in windows of that
+    many pages, so that only one window of specific pages is held in memory
+    at a time. Each window uses one query per page type it contains.
+
     This should be called from ``PageQuerySet.specific``
     """
     pks_and_types = qs.values_list('pk', 'content_type')
+
+    if chunk_size is None:
+        yield from _specific_pages(qs.model, list(pks_and_types), defer=defer)
+        return
+
+    if django.VERSION >= (2, 0):
+        rows = pks_and_types.iterator(chunk_size=chunk_size)
+    else:
+        rows = pks_and_types.iterator()
+
+    window = []
+    for pk_and_type in rows:
+        window.append(pk_and_type)
+        if len(window) >= chunk_size:
+            yield from _specific_pages(qs.model, window, defer=defer)
+            window = []
+
+    if window:
+        yield from _specific_pages(qs.model, window, defer=defer)
+
+
+def _specific_pages(base_model, pks_and_types, defer=False):
+    """
+    Yields the specific page for each (pk, content_type) pair, in order
+    """
     pks_by_type = defaultdict(list)
     for pk, content_type in pks_and_types:
         pks_by_type[content_type].append(pk)
 
-    # Content types are cached by ID, so this will not run any queries.
-    content_types = {pk: ContentType.objects.get_for_id(pk)
-                     for _, pk in pks_and_types}
-
     # Get the specific instances of all pages, one model class at a time.
     pages_by_type = {}
     for content_type, pks in pks_by_type.items():
         # look up model class for this content type, falling back on the original
-        # model (i.e. Page) if the more specific one is missing
-        model = content_types[content_type].model_class() or qs.model
-        pages = model.objects.filter(pk__in=pks)
+        # model (i.e. Page) if the more specific one is missing. Content types are
+        # cached by ID, so this will not run any queries.
+        model = ContentType.objects.get_for_id(content_type).model_class() or base_model
+        pages_by_type[content_type] = {}
 
-        if defer:
-            # Defer all specific fields
-            from wagtail.core.models import Page
-            fields = [field.attname for field in Page._meta.get_fields() if field.concrete]
-            pages = pages.only(*fields)
+        for batch in _batches(pks):
+            pages = model.objects.filter(pk__in=batch)
+
+            if defer:
+                # Defer all specific fields
+                from wagtail.core.models import Page
+                fields = [field.attname for field in Page._meta.get_fields() if field.concrete]
+                pages = pages.only(*fields)
 
-        pages_by_type[content_type] = {page.pk: page for page in pages}
+            pages_by_type[content_type].update((page.pk, page) for page in pages)
 
     # Yield all of the pages, in the order they occurred in the original query.
     for pk, content_type in pks_and_types:
         yield pages_by_type[content_type][pk]
 
 
+def _get_chunk_size(iterable):
+    """
+    Returns the number of rows that the iterable's queryset is streamed in, or
+    None if it's fetched all at once
+    """
+    if not iterable.chunked_fetch:
+        return None
+
+    # QuerySet.iterator() takes a chunk_size from Django 2.0
+    return getattr(iterable, 'chunk_size', GET_ITERATOR_CHUNK_SIZE)
+
+
 class SpecificIterable(BaseIterable):
     def __iter__(self):
-        return specific_iterator(self.queryset)
+        return specific_iterator(self.queryset, chunk_size=_get_chunk_size(self))
 
 
-class DeferredSpecificIterable(BaseIterable):
+class DeferredSpecificIterable(ModelIterable):
+    """
+    Yields the specific pages for a queryset, built from the fields of the
+    base pages, without any additional queries. The specific fields are
+    deferred, and are loaded for each page type in bulk on first access.
+    """
     def __iter__(self):
-        return specific_iterator(self.queryset, defer=True)
+        loaders = {}
+        annotation_names = list(self.queryset.query.annotation_select)
+        chunk_size = _get_chunk_size(self)
+        for i, page in enumerate(super().__iter__()):
+            if chunk_size and i % chunk_size == 0:
+                # Don't keep references to all of the pages when streaming
+                loaders = {}
+
+            yield _deferred_specific_page(page, loaders, annotation_names)
+
+
+def _deferred_specific_page(page, loaders, annotation_names=()):
+    """
+    Returns the specific version of a page with the specific fields deferred,
+    using the fields that have already been loaded on the page
+    """
+    model = page.specific_class
+    if model is None or model is type(page) or not issubclass(model, type(page)):
+        return page
+
+    values = []
+    for field in model._meta.concrete_fields:
+        if field.attname in page.__dict__:
+            values.append(page.__dict__[field.attname])
+        elif field.remote_field and field.remote_field.parent_link:
+            values.append(page.pk)
+        else:
+            values.append(DEFERRED)
+
+    specific_page = model.from_db(page._state.db, [field.attname for field in model._meta.concrete_fields], values)
+
+    # Keep any annotations and related objects that were fetched with the page
+    for attr in annotation_names:
+        setattr(specific_page, attr, getattr(page, attr))
+    _copy_related_object_cache(page, specific_page)
+
+    if model not in loaders:
+        loaders[model] = DeferredFieldsLoader(model, page._state.db)
+    loaders[model].add(specific_page)
+
+    return specific_page
+
+
+def _copy_related_object_cache(from_page, to_page):
+    """
+    Gives to_page the related objects that have been fetched for from_page, such
+    as the ones from select_related
+    """
+    if django.VERSION >= (2, 0):
+        to_page._state.fields_cache = from_page._state.fields_cache.copy()
+        return
+
+    # Before Django 2.0, each related object is cached in an attribute of the instance
+    for field in from_page._meta.get_fields():
+        if field.is_relation and (field.many_to_one or field.one_to_one):
+            cache_name = field.get_cache_name()
+            if cache_name in from_page.__dict__:
+                to_page.__dict__[cache_name] = from_page.__dict__[cache_name]
+
+
+class DeferredFieldsLoader:
+    """
+    Loads the deferred fields of a group of pages of the same type with a
+    single query, the first time that a deferred field is accessed on any of
+    them. See ``Page.refresh_from_db``.
+    """
+    def __init__(self, model, using):
+        self.model = model
+        self.using = using
+        self.pages = {}
+
+    def add(self, page):
+        self.pages[page.pk] = page
+        page._deferred_fields_loader = self
+
+    def load(self, fields):
+        """
+        Loads the deferred fields of all of the pages, if the given fields are
+        among them. Returns False if the fields could not be loaded.
+        """
+        if not self.pages:
+            return False
+
+        deferred_fields = set()
+        for page in self.pages.values():
+            deferred_fields.update(page.get_deferred_fields())
+
+        if not set(fields) <= deferred_fields:
+            return False
+
+        pages, self.pages = self.pages, {}
+        deferred_fields = sorted(deferred_fields)
+        for batch in _batches(list(pages.keys())):
+            rows = self.model._base_manager.using(self.using).filter(pk__in=batch).values_list('pk', *deferred_fields)
+            for row in rows:
+                page = pages[row[0]]
+                page_deferred_fields = page.get_deferred_fields()
+                for attname, value in zip(deferred_fields, row[1:]):
+                    if attname in page_deferred_fields:
+                        page.__dict__[attname] = value
+
+        for page in pages.values():
+            del page._deferred_fields_loader
+
+        return True
+
+
+def _batches(ids, batch_size=500):
+    """
+    Splits a list of ids into lists that are short enough to be used in an
+    ``__in`` lookup on any database
+    """
+    for i in range(0, len(ids), batch_size):
+        yield ids[i:i + batch_size]
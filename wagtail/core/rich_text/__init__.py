@@ -1,7 +1,8 @@
 from django.utils.safestring import mark_safe
 
+from wagtail.core.rich_text.cache import get_or_expand
 from wagtail.core.rich_text.feature_registry import FeatureRegistry
-from wagtail.core.rich_text.rewriters import EmbedRewriter, LinkRewriter, MultiRuleRewriter
+from wagtail.core.rich_text.rewriters import LinkAndEmbedRewriter
 
 
 features = FeatureRegistry()
@@ -16,18 +17,17 @@ FRONTEND_REWRITER = None
 
 def expand_db_html(html):
     """
-    Expand database-representation HTML into proper HTML usable on front-end templates
+    Expand database-representation HTML into proper HTML usable on front-end templates.
+    The result is cached if the WAGTAIL_RICH_TEXT_CACHE_TIMEOUT setting is set.
     """
     global FRONTEND_REWRITER
 
     if FRONTEND_REWRITER is None:
         embed_rules = features.get_embed_types()
         link_rules = features.get_link_types()
-        FRONTEND_REWRITER = MultiRuleRewriter([
-            LinkRewriter(link_rules), EmbedRewriter(embed_rules)
-        ])
+        FRONTEND_REWRITER = LinkAndEmbedRewriter(link_rules, embed_rules)
 
-    return FRONTEND_REWRITER(html)
+    return get_or_expand(html, FRONTEND_REWRITER)
 
 
 class RichText:
@@ -0,0 +1,144 @@
+"""
+An opt-in cache for expanded rich text, enabled with the WAGTAIL_RICH_TEXT_CACHE_TIMEOUT setting.
+
+Each expanded fragment is cached under a key made from a hash of its source HTML and
+the current version of every page, document and image that it refers to. The versions
+are changed whenever those objects are published, moved, renamed or deleted, so that a
+stale fragment is never found again. Media embeds are versioned by their URL.
+
+Fragments that contain something temporary, such as a placeholder for an embed that
+hasn't been fetched yet, aren't cached (see skip_cache).
+"""
+
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from wagtail.core.rich_text.rewriters import FIND_A_OR_EMBED_TAG, extract_attrs
+
+CACHE_KEY_PREFIX = 'wagtail_rich_text:'
+VERSION_KEY_PREFIX = 'wagtail_rich_text_version:'
+
+# The URLs of all pages depend on their ancestors' slugs and on the site root paths,
+# so changes to those invalidate every fragment with a page link
+PAGE_URLS_VERSION = 'page_urls'
+
+# Whether the fragment that is being expanded in this thread should not be cached
+_expanding = threading.local()
+
+
+def get_cache_timeout():
+    """
+    Returns the number of seconds to cache expanded rich text for, or None if the
+    cache is disabled
+    """
+    return getattr(settings, 'WAGTAIL_RICH_TEXT_CACHE_TIMEOUT', None)
+
+
+def get_references(html):
+    """
+    Returns the names of the versions that the expanded form of the given HTML
+    depends on, such as 'page:42'
+    """
+    references = set()
+
+    for match in FIND_A_OR_EMBED_TAG.finditer(html):
+        link_attrs, embed_attrs = match.groups()
+        if link_attrs is not None:
+            if 'linktype' not in link_attrs:
+                continue
+            attrs = extract_attrs(link_attrs)
+            tag_type = attrs.get('linktype')
+        else:
+            attrs = extract_attrs(embed_attrs)
+            tag_type = attrs.get('embedtype')
+
+        if tag_type and 'id' in attrs:
+            references.add('%s:%s' % (tag_type, attrs['id']))
+
+            if tag_type == 'page':
+                references.add(PAGE_URLS_VERSION)
+        elif tag_type and 'url' in attrs:
+            # Media embeds refer to the URL being embedded, rather than an object
+            references.add('%s:%s' % (tag_type, get_url_id(attrs['url'])))
+
+    return references
+
+
+def get_url_id(url):
+    """
+    Returns the ID that stands for the given URL in the names of versions, for tags that
+    refer to a URL rather than an object
+    """
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def get_cache_key(html):
+    version_keys = sorted(VERSION_KEY_PREFIX + reference for reference in get_references(html))
+    versions = cache.get_many(version_keys)
+
+    # Start a new version for any objects that haven't been seen before (or whose
+    # version has been evicted from the cache)
+    new_versions = {key: uuid.uuid4().hex for key in version_keys if key not in versions}
+    if new_versions:
+        cache.set_many(new_versions, None)
+        versions.update(new_versions)
+
+    source = '\n'.join([html] + [versions[key] for key in version_keys])
+    return CACHE_KEY_PREFIX + hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def get_or_expand(html, expand):
+    """
+    Returns the expanded form of the given HTML from the cache, calling expand(html)
+    to build it if necessary
+    """
+    timeout = get_cache_timeout()
+    if not timeout:
+        return expand(html)
+
+    cache_key = get_cache_key(html)
+    result = cache.get(cache_key)
+
+    if result is None:
+        outer_skip_cache = getattr(_expanding, 'skip_cache', False)
+        _expanding.skip_cache = False
+        try:
+            result = expand(html)
+            cacheable = not _expanding.skip_cache
+        finally:
+            # A fragment that contains this one can't be cached either
+            _expanding.skip_cache = outer_skip_cache or not cacheable
+
+        if cacheable:
+            cache.set(cache_key, result, timeout)
+
+    return result
+
+
+def skip_cache():
+    """
+    Stops the rich text that is being expanded from being cached. This is called by
+    handlers that render something temporary, such as a failed or placeholder embed
+    """
+    _expanding.skip_cache = True
+
+
+def invalidate(reference_type, ids):
+    """
+    Changes the versions of the given objects, so that any rich text that refers to
+    them is expanded again. reference_type is the link or embed type, such as 'page'
+    """
+    if get_cache_timeout():
+        cache.delete_many([VERSION_KEY_PREFIX + '%s:%s' % (reference_type, pk) for pk in ids])
+
+
+def invalidate_page_urls():
+    """
+    Invalidates all rich text that contains page links
+    """
+    if get_cache_timeout():
+        cache.delete(VERSION_KEY_PREFIX + PAGE_URLS_VERSION)
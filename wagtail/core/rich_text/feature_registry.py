@@ -28,13 +28,17 @@ class FeatureRegistry:
 
         # a mapping of linktype names to rewriter functions for converting database representations
         # of links (e.g. <a linktype="page" id="123">) into front-end HTML. Each rewriter function
-        # takes a dict of attributes, and returns the rewritten opening tag as a string
+        # takes a dict of attributes, and returns the rewritten opening tag as a string.
+        # A rewriter function may also have an `expand_db_attributes_many` attribute: a function
+        # that takes a list of attribute dicts and returns a list of opening tags, so that all of
+        # the links of that type in a piece of rich text can be looked up at once
         self.link_types = {}
 
         # a mapping of embedtype names to rewriter functions for converting database representations
         # of embedded content (e.g. <embed embedtype="image" id="123" format="left" alt="foo">)
         # into front-end HTML. Each rewriter function takes a dict of attributes, and returns an
-        # HTML fragment to replace it with
+        # HTML fragment to replace it with. As with link types, a rewriter function may also have an
+        # `expand_db_attributes_many` attribute for rewriting many embeds at once
         self.embed_types = {}
 
         # a dict of dicts, one for each converter backend (editorhtml, contentstate etc);
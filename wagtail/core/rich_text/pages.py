@@ -1,6 +1,8 @@
+from collections import defaultdict
+
 from django.utils.html import escape
 
-from wagtail.core.models import Page
+from wagtail.core.models import Page, Site
 
 
 class PageLinkHandler:
@@ -35,8 +37,52 @@ class PageLinkHandler:
 
 
 def page_linktype_handler(attrs):
-    try:
-        page = Page.objects.get(id=attrs['id'])
-        return '<a href="%s">' % escape(page.specific.url)
-    except Page.DoesNotExist:
-        return "<a>"
+    return expand_page_links([attrs])[0]
+
+
+def get_page_urls(page_ids):
+    """
+    Returns a dict of the URLs of the given pages, keyed by id, using as few queries as
+    possible. Pages are only fetched in their specific form if their class has its own
+    ``get_url_parts`` method.
+    """
+    pages = Page.objects.in_bulk(page_ids)
+    site_root_paths = Site.get_site_root_paths()
+
+    specific_page_ids = defaultdict(list)
+    for page in pages.values():
+        if page.specific_class is not None and page.specific_class.get_url_parts is not Page.get_url_parts:
+            specific_page_ids[page.specific_class].append(page.pk)
+
+    for page_class, ids in specific_page_ids.items():
+        pages.update(page_class.objects.in_bulk(ids))
+
+    urls = {}
+    for page in pages.values():
+        # Share the site root paths between the pages, as a request would
+        page._wagtail_cached_site_root_paths = site_root_paths
+        urls[page.pk] = page.url
+
+    return urls
+
+
+def expand_page_links(attrs_list):
+    page_ids = set()
+    for attrs in attrs_list:
+        try:
+            page_ids.add(int(attrs['id']))
+        except (KeyError, ValueError):
+            pass
+
+    urls = get_page_urls(page_ids) if page_ids else {}
+
+    tags = []
+    for attrs in attrs_list:
+        try:
+            tags.append('<a href="%s">' % escape(urls[int(attrs['id'])]))
+        except (KeyError, ValueError):
+            tags.append("<a>")
+    return tags
+
+
+page_linktype_handler.expand_db_attributes_many = expand_page_links
@@ -6,69 +6,183 @@ import re
 
 FIND_A_TAG = re.compile(r'<a(\b[^>]*)>')
 FIND_EMBED_TAG = re.compile(r'<embed(\b[^>]*)/>')
+# Matches either of the above, with the attributes of an <a> tag in group 1 and the
+# attributes of an <embed> tag in group 2
+FIND_A_OR_EMBED_TAG = re.compile(r'<(?:a(\b[^>]*)|embed(\b[^>]*)/)>')
 FIND_ATTRS = re.compile(r'([\w-]+)\="([^"]*)"')
+FIND_ENTITY = re.compile(r'&(lt|gt|quot|amp);')
+ENTITIES = {'lt': '<', 'gt': '>', 'quot': '"', 'amp': '&'}
+
+
+def unescape_entity(match):
+    return ENTITIES[match.group(1)]
 
 
 def extract_attrs(attr_string):
     """
     helper method to extract tag attributes, as a dict of un-escaped strings
     """
+    if '&' not in attr_string:
+        # Nothing to unescape
+        return dict(FIND_ATTRS.findall(attr_string))
+
     attributes = {}
     for name, val in FIND_ATTRS.findall(attr_string):
-        val = val.replace('&lt;', '<').replace('&gt;', '>').replace('&quot;', '"').replace('&amp;', '&')
+        if '&' in val:
+            val = FIND_ENTITY.sub(unescape_entity, val)
         attributes[name] = val
     return attributes
 
 
-class EmbedRewriter:
+def replace_matches(html, matches, replacements):
+    """
+    Returns the HTML with each of the regex matches replaced by the corresponding
+    replacement string
+    """
+    output = []
+    position = 0
+    for match, replacement in zip(matches, replacements):
+        output.append(html[position:match.start()])
+        output.append(replacement)
+        position = match.end()
+    output.append(html[position:])
+    return ''.join(output)
+
+
+def expand_tags(rule, attrs_list):
+    """
+    Applies a rule to a list of tag attribute dicts, returning a list of HTML fragments.
+    Rules that provide an ``expand_db_attributes_many`` function are given all of the
+    tags at once, so that they can look up the objects they refer to in bulk.
+    """
+    expand_db_attributes_many = getattr(rule, 'expand_db_attributes_many', None)
+    if expand_db_attributes_many is not None:
+        return expand_db_attributes_many(attrs_list)
+
+    return [rule(attrs) for attrs in attrs_list]
+
+
+class TagRewriter:
+    """
+    Base class for rewriters that replace tags with the HTML fragments given by the rule
+    for their type. This works in two passes: all of the tags in the HTML are found first,
+    and then the tags of each type are passed to their rule together.
+    """
+    tag_regex = None
+    type_attribute = None
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def get_unhandled_replacement(self, match, attrs):
+        """
+        Returns the replacement for a tag that has no rule
+        """
+        raise NotImplementedError
+
+    def get_replacements(self, tags):
+        """
+        Takes a list of (match, attrs) tuples for the tags in a piece of HTML, and
+        returns a list of the replacement for each tag
+        """
+        # Group the tags by their type
+        attrs_by_type = {}
+        for match, attrs in tags:
+            tag_type = attrs.get(self.type_attribute)
+            if tag_type in self.rules:
+                attrs_by_type.setdefault(tag_type, []).append(attrs)
+
+        replacements_by_type = {
+            tag_type: iter(expand_tags(self.rules[tag_type], attrs_list))
+            for tag_type, attrs_list in attrs_by_type.items()
+        }
+
+        replacements = []
+        for match, attrs in tags:
+            tag_type = attrs.get(self.type_attribute)
+            if tag_type in replacements_by_type:
+                replacements.append(next(replacements_by_type[tag_type]))
+            else:
+                replacements.append(self.get_unhandled_replacement(match, attrs))
+        return replacements
+
+    def __call__(self, html):
+        matches = list(self.tag_regex.finditer(html))
+        if not matches:
+            return html
+
+        tags = [(match, extract_attrs(match.group(1))) for match in matches]
+        return replace_matches(html, matches, self.get_replacements(tags))
+
+
+class EmbedRewriter(TagRewriter):
     """
     Rewrites <embed embedtype="foo" /> tags within rich text into the HTML fragment given by the
     embed rule for 'foo'. Each embed rule is a function that takes a dict of attributes and
     returns the HTML fragment.
     """
-    def __init__(self, embed_rules):
-        self.embed_rules = embed_rules
-
-    def replace_tag(self, match):
-        attrs = extract_attrs(match.group(1))
-        try:
-            rule = self.embed_rules[attrs['embedtype']]
-        except KeyError:
-            # silently drop any tags with an unrecognised or missing embedtype attribute
-            return ''
-        return rule(attrs)
+    tag_regex = FIND_EMBED_TAG
+    type_attribute = 'embedtype'
 
-    def __call__(self, html):
-        return FIND_EMBED_TAG.sub(self.replace_tag, html)
+    def get_unhandled_replacement(self, match, attrs):
+        # silently drop any tags with an unrecognised or missing embedtype attribute
+        return ''
 
 
-class LinkRewriter:
+class LinkRewriter(TagRewriter):
     """
     Rewrites <a linktype="foo"> tags within rich text into the HTML fragment given by the
     rule for 'foo'. Each link rule is a function that takes a dict of attributes and
     returns the HTML fragment for the opening tag (only).
     """
-    def __init__(self, link_rules):
-        self.link_rules = link_rules
-
-    def replace_tag(self, match):
-        attrs = extract_attrs(match.group(1))
-        try:
-            link_type = attrs['linktype']
-        except KeyError:
+    tag_regex = FIND_A_TAG
+    type_attribute = 'linktype'
+
+    def get_unhandled_replacement(self, match, attrs):
+        if self.type_attribute not in attrs:
             # return ordinary links without a linktype unchanged
             return match.group(0)
 
-        try:
-            rule = self.link_rules[link_type]
-        except KeyError:
-            # unrecognised link type
-            return '<a>'
+        # unrecognised link type
+        return '<a>'
 
-        return rule(attrs)
+
+class LinkAndEmbedRewriter:
+    """
+    Rewrites both <a linktype="foo"> and <embed embedtype="foo" /> tags, as LinkRewriter
+    and EmbedRewriter do, in a single pass over the HTML
+    """
+    def __init__(self, link_rules, embed_rules):
+        self.link_rewriter = LinkRewriter(link_rules)
+        self.embed_rewriter = EmbedRewriter(embed_rules)
 
     def __call__(self, html):
-        return FIND_A_TAG.sub(self.replace_tag, html)
+        matches = list(FIND_A_OR_EMBED_TAG.finditer(html))
+        if not matches:
+            return html
+
+        tag_matches = []
+        links = []
+        embeds = []
+        for match in matches:
+            link_attrs, embed_attrs = match.groups()
+            if link_attrs is not None:
+                if 'linktype' not in link_attrs:
+                    # Ordinary links are left as they are
+                    continue
+                links.append((match, extract_attrs(link_attrs)))
+            else:
+                embeds.append((match, extract_attrs(embed_attrs)))
+            tag_matches.append(match)
+
+        link_replacements = iter(self.link_rewriter.get_replacements(links))
+        embed_replacements = iter(self.embed_rewriter.get_replacements(embeds))
+        replacements = [
+            next(link_replacements) if match.group(1) is not None else next(embed_replacements)
+            for match in tag_matches
+        ]
+
+        return replace_matches(html, tag_matches, replacements)
 
 
 class MultiRuleRewriter:
@@ -1,20 +1,38 @@
 import logging
 
+from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.db.models.signals import post_delete, post_save, pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 
-from wagtail.core.models import Page, Site
+from wagtail.core.models import GroupPagePermission, Page, PagePermissionIndex, Site
+from wagtail.core.rich_text import cache as rich_text_cache
+from wagtail.core.signals import page_published, page_unpublished
 
 logger = logging.getLogger('wagtail.core')
 
 
 # Clear the wagtail_site_root_paths from the cache whenever Site records are updated.
+# Page URLs in cached rich text depend on the site root paths too.
 def post_save_site_signal_handler(instance, update_fields=None, **kwargs):
     cache.delete('wagtail_site_root_paths')
+    rich_text_cache.invalidate_page_urls()
 
 
 def post_delete_site_signal_handler(instance, **kwargs):
     cache.delete('wagtail_site_root_paths')
+    rich_text_cache.invalidate_page_urls()
+
+
+# Expand links to a page in rich text again whenever the page is published,
+# unpublished or deleted
+def page_changed_rich_text_signal_handler(instance, **kwargs):
+    rich_text_cache.invalidate('page', [instance.pk])
+
+
+# Clear the cached page permission indexes whenever the page permissions of a group
+# or the groups of a user change.
+def page_permissions_changed_signal_handler(**kwargs):
+    PagePermissionIndex.invalidate_cache_on_commit()
 
 
 def pre_delete_page_unpublish(sender, instance, **kwargs):
@@ -32,5 +50,13 @@ def register_signal_handlers():
     post_save.connect(post_save_site_signal_handler, sender=Site)
     post_delete.connect(post_delete_site_signal_handler, sender=Site)
 
+    post_save.connect(page_permissions_changed_signal_handler, sender=GroupPagePermission)
+    post_delete.connect(page_permissions_changed_signal_handler, sender=GroupPagePermission)
+    m2m_changed.connect(page_permissions_changed_signal_handler, sender=get_user_model().groups.through)
+
     pre_delete.connect(pre_delete_page_unpublish, sender=Page)
     post_delete.connect(post_delete_page_log_deletion, sender=Page)
+
+    page_published.connect(page_changed_rich_text_signal_handler)
+    page_unpublished.connect(page_changed_rich_text_signal_handler)
+    post_delete.connect(page_changed_rich_text_signal_handler, sender=Page)
@@ -2,3 +2,9 @@ from django.dispatch import Signal
 
 page_published = Signal(providing_args=['instance', 'revision'])
 page_unpublished = Signal(providing_args=['instance'])
+page_moved = Signal(providing_args=['instance', 'old_path', 'old_url_path'])
+
+# Sent once by the bulk PageQuerySet.publish() and unpublish() methods, before
+# page_published/page_unpublished are sent for each page
+pages_published = Signal(providing_args=['instances', 'revisions'])
+pages_unpublished = Signal(providing_args=['instances'])
@@ -0,0 +1,101 @@
+from django.test import TestCase
+
+from wagtail.core.models import Page
+from wagtail.core.rich_text import expand_db_html
+from wagtail.core.rich_text.rewriters import (
+    EmbedRewriter, LinkAndEmbedRewriter, LinkRewriter, MultiRuleRewriter)
+from wagtail.core.whitelist import Whitelister
+from wagtail.tests.benchmark import Benchmark
+
+LINK_RULES = {'page': lambda attrs: '<a href="/pages/%s/">' % attrs['id']}
+EMBED_RULES = {'media': lambda attrs: '<iframe src="%s"></iframe>' % attrs['url']}
+
+
+def get_article_html(page_ids, paragraphs=500):
+    """
+    Returns around 150KB of rich text, in the form it is stored in the database,
+    with links, embeds and plenty of text and markup in between
+    """
+    html = []
+    for i in range(paragraphs):
+        page_id = page_ids[i % len(page_ids)]
+        html.append(
+            '<h2>Section %(i)d</h2>'
+            '<p>Lorem ipsum dolor sit amet, <b>consectetur</b> adipiscing elit, sed do eiusmod tempor '
+            'incididunt ut labore et dolore magna aliqua. See <a linktype="page" id="%(page_id)d">'
+            'this page</a> and <a href="https://example.com/?a=1&amp;b=2">this site</a> for '
+            '<i>more</i> details.</p>'
+            '<ul><li>Ut enim ad minim veniam</li><li>quis nostrud exercitation ullamco laboris</li></ul>'
+            % {'i': i, 'page_id': page_id}
+        )
+        if i % 10 == 0:
+            html.append('<embed embedtype="media" url="https://www.youtube.com/watch?v=%d"/>' % i)
+    return ''.join(html)
+
+
+class BenchRichTextRewriting(Benchmark, TestCase):
+    """
+    Rewrites a long article with a single pass over the HTML, without any database
+    lookups, to measure the cost of finding and replacing the tags.
+    """
+    def setUp(self):
+        self.html = get_article_html(list(range(1, 100)))
+        self.rewriter = LinkAndEmbedRewriter(LINK_RULES, EMBED_RULES)
+
+    def bench(self):
+        self.rewriter(self.html)
+
+
+class BenchRichTextRewritingWithMultipleRules(Benchmark, TestCase):
+    """
+    The same as BenchRichTextRewriting, but with a separate pass over the HTML for
+    links and embeds, for comparison.
+    """
+    def setUp(self):
+        self.html = get_article_html(list(range(1, 100)))
+        self.rewriter = MultiRuleRewriter([LinkRewriter(LINK_RULES), EmbedRewriter(EMBED_RULES)])
+
+    def bench(self):
+        self.rewriter(self.html)
+
+
+class BenchExpandDbHtml(Benchmark, TestCase):
+    """
+    Expands a long article that links to every page in the test fixture.
+    """
+    fixtures = ['test.json']
+
+    def setUp(self):
+        self.html = get_article_html(list(Page.objects.values_list('id', flat=True))).replace(
+            'embedtype="media"', 'embedtype="unknown"'
+        )
+
+    def bench(self):
+        expand_db_html(self.html)
+
+
+def get_pasted_html(paragraphs=500):
+    """
+    Returns around 200KB of HTML in the style of a document pasted from a word processor,
+    with plenty of elements and attributes for the whitelister to remove
+    """
+    return (
+        '<p class="MsoNormal" style="margin:0"><span style="font-family:Arial"><span lang="EN-GB">'
+        'Lorem ipsum <b>dolor</b> sit amet, <a href="http://example.com/?a=1&amp;b=2" target="_blank">'
+        'link</a> <font color="red">consectetur</font> &amp; &lt;adipiscing&gt; "elit"</span></span>'
+        '<!--[if gte mso 9]>junk<![endif]--><o:p></o:p></p>'
+        '<table><tr><td><span>cell</span></td><td><img src="/image.png" width="10" onclick="x"></td></tr></table>'
+        '<ul><li><span><span>item</span></span></li></ul>'
+    ) * paragraphs
+
+
+class BenchWhitelisterClean(Benchmark, TestCase):
+    """
+    Cleans a long document pasted from a word processor, which has many elements to unwrap.
+    """
+    def setUp(self):
+        self.html = get_pasted_html()
+        self.whitelister = Whitelister()
+
+    def bench(self):
+        self.whitelister.clean(self.html)
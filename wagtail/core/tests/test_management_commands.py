@@ -1,6 +1,7 @@
 from datetime import timedelta
 from io import StringIO
 
+import mock
 from django.core import management
 from django.db import models
 from django.test import TestCase
@@ -140,6 +141,24 @@ class TestSetUrlPathsCommand(TestCase):
     def test_set_url_paths(self):
         self.run_command()
 
+    def test_set_url_paths_fixes_broken_url_paths(self):
+        url_paths = dict(Page.objects.values_list('id', 'url_path'))
+        Page.objects.filter(url_path__startswith='/home/events/').update(url_path='/broken/')
+        Page.objects.filter(depth=1).update(url_path='/broken/')
+
+        self.run_command()
+
+        self.assertEqual(dict(Page.objects.values_list('id', 'url_path')), url_paths)
+
+    def test_set_url_paths_uses_one_query_per_level(self):
+        max_depth = Page.objects.order_by('-depth').values_list('depth', flat=True).first()
+
+        # One query to find the root nodes, then one to fetch each level below the
+        # root, and one that finds there are no more levels. No url_paths change, so
+        # nothing is updated
+        with self.assertNumQueries(max_depth + 1):
+            self.run_command()
+
 
 class TestReplaceTextCommand(TestCase):
     fixtures = ['test.json']
@@ -165,6 +184,70 @@ class TestReplaceTextCommand(TestCase):
         self.assertEqual(easter_page.speakers.first().last_name, "Easter")
         self.assertEqual(easter_page.advert_placements.first().colour, "greener than a Easter tree")
 
+    def test_replace_text_in_revisions(self):
+        christmas_page = EventPage.objects.get(url_path='/home/events/christmas/')
+        revision = christmas_page.save_revision()
+
+        self.run_command("Christmas", "Easter")
+
+        revision = PageRevision.objects.get(id=revision.id)
+        self.assertNotIn("Christmas", revision.content_json)
+        self.assertEqual(revision.as_page_object().title, "Easter")
+
+    def test_replace_text_updates_all_page_types(self):
+        self.run_command("Christmas", "Easter")
+
+        self.assertFalse(Page.objects.filter(title__contains="Christmas").exists())
+        self.assertFalse(EventPage.objects.filter(location__contains="Christmas").exists())
+
+    def test_replace_text_dry_run(self):
+        output = StringIO()
+        management.call_command('replace_text', "Christmas", "Easter", dry_run=True, stdout=output)
+
+        christmas_page = EventPage.objects.get(url_path='/home/events/christmas/')
+        self.assertEqual(christmas_page.title, "Christmas")
+        self.assertEqual(christmas_page.speakers.first().last_name, "Christmas")
+        self.assertIn("found 1 pages", output.getvalue())
+
+    def test_replace_text_reindexes_pages(self):
+        with mock.patch('wagtail.search.index.insert_or_update_objects') as insert_or_update_objects:
+            self.run_command("Christmas", "Easter")
+
+        reindexed_pages = [
+            page for call in insert_or_update_objects.call_args_list for page in call[0][1]
+        ]
+        self.assertIn('/home/events/christmas/', [page.url_path for page in reindexed_pages])
+        christmas_page = [page for page in reindexed_pages if page.url_path == '/home/events/christmas/'][0]
+        self.assertIsInstance(christmas_page, EventPage)
+        self.assertEqual(christmas_page.title, "Easter")
+
+
+    def test_replace_text_without_replace_function(self):
+        # Django versions before 2.1 don't have the Replace function
+        with mock.patch('wagtail.core.management.commands.replace_text.Replace', None):
+            self.run_command("Christmas", "Easter")
+
+        easter_page = EventPage.objects.get(url_path='/home/events/christmas/')
+        self.assertEqual(easter_page.title, "Easter")
+        self.assertEqual(easter_page.speakers.first().last_name, "Easter")
+        self.assertEqual(easter_page.advert_placements.first().colour, "greener than a Easter tree")
+
+    def test_replace_text_is_case_sensitive(self):
+        output = StringIO()
+        management.call_command('replace_text', "CHRISTMAS", "Easter", stdout=output)
+
+        self.assertNotIn("updated", output.getvalue())
+        self.assertEqual(EventPage.objects.get(url_path='/home/events/christmas/').title, "Christmas")
+
+    def test_replace_text_invalidates_rich_text_cache(self):
+        christmas_page = EventPage.objects.get(url_path='/home/events/christmas/')
+
+        with mock.patch('wagtail.core.rich_text.cache.invalidate') as invalidate:
+            self.run_command("Christmas", "Easter")
+
+        invalidate.assert_called_once_with('page', mock.ANY)
+        self.assertIn(christmas_page.id, invalidate.call_args[0][1])
+
 
 class TestPublishScheduledPagesCommand(TestCase):
     def setUp(self):
@@ -332,3 +415,110 @@ class TestPublishScheduledPagesCommand(TestCase):
 
         p = Page.objects.get(slug='hello-world')
         self.assertFalse(PageRevision.objects.filter(page=p, submitted_for_moderation=True).exists())
+
+    def test_expired_revision_is_stored_on_revision(self):
+        expire_at = (timezone.now() - timedelta(days=1)).replace(microsecond=0)
+        page = SimplePage(
+            title="Hello world!",
+            slug="hello-world",
+            content="hello",
+            live=False,
+            expire_at=expire_at,
+        )
+        self.root_page.add_child(instance=page)
+
+        revision = page.save_revision(submitted_for_moderation=True)
+
+        self.assertEqual(PageRevision.objects.get(id=revision.id).expire_at, expire_at)
+
+    def test_go_live_pages_are_published_together(self):
+        published_pages = []
+
+        def page_published_handler(sender, instance, **kwargs):
+            published_pages.append(instance)
+
+        page_published.connect(page_published_handler)
+
+        try:
+            for i in range(3):
+                page = SimplePage(
+                    title="Hello world %d!" % i,
+                    slug="hello-world-%d" % i,
+                    content="hello",
+                    live=False,
+                    has_unpublished_changes=True,
+                    go_live_at=timezone.now() - timedelta(days=1),
+                )
+                self.root_page.add_child(instance=page)
+                page.save_revision(approved_go_live_at=timezone.now() - timedelta(days=1))
+
+            management.call_command('publish_scheduled_pages')
+        finally:
+            page_published.disconnect(page_published_handler)
+
+        pages = Page.objects.filter(slug__startswith='hello-world-')
+        self.assertEqual(pages.count(), 3)
+        self.assertFalse(pages.filter(live=False).exists())
+        self.assertFalse(pages.filter(live_revision__isnull=True).exists())
+        self.assertFalse(
+            PageRevision.objects.filter(page__in=pages, approved_go_live_at__isnull=False).exists()
+        )
+        self.assertEqual(len(published_pages), 3)
+
+    def test_interval_sleeps_until_next_due_page(self):
+        page = SimplePage(
+            title="Hello world!",
+            slug="hello-world",
+            content="hello",
+            live=True,
+            expire_at=timezone.now() + timedelta(seconds=30),
+        )
+        self.root_page.add_child(instance=page)
+
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            raise KeyboardInterrupt
+
+        with mock.patch('wagtail.core.management.commands.publish_scheduled_pages.time.sleep', sleep):
+            with self.assertRaises(KeyboardInterrupt):
+                management.call_command('publish_scheduled_pages', interval=60)
+
+        self.assertEqual(len(delays), 1)
+        self.assertTrue(0 < delays[0] <= 30)
+
+    def test_interval_is_capped(self):
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            raise KeyboardInterrupt
+
+        with mock.patch('wagtail.core.management.commands.publish_scheduled_pages.time.sleep', sleep):
+            with self.assertRaises(KeyboardInterrupt):
+                management.call_command('publish_scheduled_pages', interval=60)
+
+        self.assertEqual(delays, [60])
+
+    def test_interval_keeps_running_after_errors(self):
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            if len(delays) == 2:
+                raise KeyboardInterrupt
+
+        command_module = 'wagtail.core.management.commands.publish_scheduled_pages'
+        with mock.patch(command_module + '.time.sleep', sleep), \
+                mock.patch(command_module + '.close_old_connections') as close_old_connections, \
+                mock.patch(command_module + '.Command.process_scheduled_pages', side_effect=[Exception, None]):
+            with self.assertLogs('wagtail.core', level='ERROR') as logs:
+                with self.assertRaises(KeyboardInterrupt):
+                    management.call_command('publish_scheduled_pages', interval=60)
+
+        self.assertEqual(delays, [60, 60])
+        self.assertEqual(len(logs.records), 1)
+
+        # Connections that went stale while sleeping are closed before checking again
+        self.assertEqual(close_old_connections.call_count, 1)
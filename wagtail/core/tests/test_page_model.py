@@ -1,24 +1,29 @@
 import datetime
 import json
 
+import mock
 import pytz
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models.signals import post_save, pre_save
 from django.http import Http404, HttpRequest
 from django.test import Client, TestCase
 from django.test.client import RequestFactory
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from freezegun import freeze_time
 
 from wagtail.core.models import Page, PageManager, Site, get_page_models
+from wagtail.core.signals import page_moved
 from wagtail.tests.testapp.models import (
     AbstractPage, Advert, AlwaysShowInMenusPage, BlogCategory, BlogCategoryBlogPage, BusinessChild,
     BusinessIndex, BusinessNowherePage, BusinessSubIndex, CustomManager, CustomManagerPage,
-    CustomPageQuerySet, EventIndex, EventPage, GenericSnippetPage, ManyToManyBlogPage, MTIBasePage,
-    MTIChildPage, MyCustomPage, OneToOnePage, PageWithExcludedCopyField, SimplePage,
-    SingleEventPage, SingletonPage, StandardIndex, TaggedPage)
+    CustomPageQuerySet, EventIndex, EventPage, EventPageSpeaker, GenericSnippetPage,
+    ManyToManyBlogPage, MTIBasePage, MTIChildPage, MyCustomPage, OneToOnePage,
+    PageWithExcludedCopyField, SimplePage, SingleEventPage, SingletonPage, StandardIndex,
+    TaggedPage)
 from wagtail.tests.utils import WagtailTestUtils
 
 
@@ -563,6 +568,45 @@ class TestMovePage(TestCase):
         self.assertEqual(christmas.depth, 5)
         self.assertEqual(christmas.url_path, '/home/about-us/events/christmas/')
 
+    def test_move_page_updates_descendant_url_paths_with_one_query(self):
+        about_us_page = SimplePage.objects.get(url_path='/home/about-us/')
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+
+        with CaptureQueriesContext(connection) as queries:
+            events_index.move(about_us_page, pos='last-child')
+
+        url_path_updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE') and 'url_path' in query['sql']
+        ]
+        # One for the moved page itself, and one for all of its descendants
+        self.assertEqual(len(url_path_updates), 2)
+
+    def test_move_page_sends_signal(self):
+        about_us_page = SimplePage.objects.get(url_path='/home/about-us/')
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+        old_path = events_index.path
+
+        moved_signals_fired = []
+
+        def page_moved_handler(sender, instance, **kwargs):
+            moved_signals_fired.append((sender, instance, kwargs))
+
+        page_moved.connect(page_moved_handler)
+        try:
+            events_index.move(about_us_page, pos='last-child')
+        finally:
+            page_moved.disconnect(page_moved_handler)
+
+        self.assertEqual(len(moved_signals_fired), 1)
+        sender, instance, kwargs = moved_signals_fired[0]
+        self.assertEqual(sender, EventIndex)
+        self.assertEqual(instance, events_index)
+        self.assertIsInstance(instance, EventIndex)
+        self.assertEqual(instance.url_path, '/home/about-us/events/')
+        self.assertEqual(kwargs['old_path'], old_path)
+        self.assertEqual(kwargs['old_url_path'], '/home/events/')
+
 
 class TestPrevNextSiblings(TestCase):
     fixtures = ['test.json']
@@ -930,6 +974,189 @@ class TestCopyPage(TestCase):
             )
         self.assertEqual(str(exception.exception), "You cannot copy a tree branch recursively into itself")
 
+    def test_copy_page_copies_recursively_in_bulk(self):
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+        christmas_event = EventPage.objects.get(url_path='/home/events/christmas/')
+        christmas_event.speakers.add(EventPageSpeaker(first_name="Santa", last_name="Claus"))
+        christmas_event.save()
+        christmas_event.save_revision()
+
+        new_events_index = events_index.copy(
+            recursive=True, update_attrs={'title': "New events index", 'slug': 'new-events-index'}
+        )
+
+        # Check that the tree is still valid
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+        # Check that the subtree has the same structure as the original
+        def get_structure(page):
+            return [
+                (descendant.path[len(page.path):], descendant.depth - page.depth, descendant.numchild,
+                 descendant.slug, descendant.url_path[len(page.url_path):], descendant.content_type_id, descendant.live)
+                for descendant in page.get_descendants()
+            ]
+
+        self.assertEqual(get_structure(new_events_index), get_structure(events_index))
+        self.assertEqual(new_events_index.numchild, events_index.numchild)
+
+        # Check that multi-table inheritance pages were copied in their most specific form
+        new_saint_patrick_event = SingleEventPage.objects.get(url_path='/home/new-events-index/saint-patrick/')
+        self.assertEqual(new_saint_patrick_event.excerpt, SingleEventPage.objects.get(url_path='/home/events/saint-patrick/').excerpt)
+
+        # Check that the copied revisions point to the copies of the page and its child objects
+        new_christmas_event = EventPage.objects.get(url_path='/home/new-events-index/christmas/')
+        new_speaker_ids = set(new_christmas_event.speakers.values_list('id', flat=True))
+        self.assertEqual(len(new_speaker_ids), 2)
+
+        for revision in new_christmas_event.revisions.all():
+            revision_page = revision.as_page_object()
+            self.assertEqual(revision_page.id, new_christmas_event.id)
+            self.assertTrue(set(speaker.id for speaker in revision_page.speakers.all()) <= new_speaker_ids)
+
+        # Check that the new revision was made live
+        self.assertEqual(new_christmas_event.live_revision, new_christmas_event.get_latest_revision())
+
+    def test_copy_page_sends_post_save_when_copying_in_bulk(self):
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+        saved_pages = []
+
+        def post_save_handler(instance, created, **kwargs):
+            saved_pages.append((instance.url_path, created))
+
+        post_save.connect(post_save_handler, sender=EventPage)
+        try:
+            events_index.copy(recursive=True, update_attrs={'title': "New events index", 'slug': 'new-events-index'})
+        finally:
+            post_save.disconnect(post_save_handler, sender=EventPage)
+
+        self.assertIn(('/home/new-events-index/christmas/', True), saved_pages)
+
+    def test_copy_page_copies_one_at_a_time_if_a_page_type_overrides_save(self):
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+
+        with mock.patch.object(EventPage, 'save', side_effect=Page.save, autospec=True) as save:
+            with mock.patch.object(
+                Page, '_copy_descendants', side_effect=Page._copy_descendants, autospec=True
+            ) as copy_descendants:
+                new_events_index = events_index.copy(
+                    recursive=True, update_attrs={'title': "New events index", 'slug': 'new-events-index'}
+                )
+
+        # The children are copied recursively, so subtrees without event pages may still be copied in bulk
+        for call in copy_descendants.call_args_list:
+            descendants = call[0][1]
+            self.assertFalse(any(isinstance(page, EventPage) for page in descendants))
+
+        self.assertTrue(save.called)
+        self.assertTrue(EventPage.objects.filter(url_path='/home/new-events-index/christmas/').exists())
+        self.assertEqual(new_events_index.get_children_count(), events_index.get_children_count())
+
+    def test_copy_page_copies_one_at_a_time_if_a_page_type_has_pre_save_receivers(self):
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+
+        def pre_save_handler(instance, **kwargs):
+            instance.location = "Somewhere else"
+
+        pre_save.connect(pre_save_handler, sender=EventPage)
+        try:
+            events_index.copy(recursive=True, update_attrs={'title': "New events index", 'slug': 'new-events-index'})
+        finally:
+            pre_save.disconnect(pre_save_handler, sender=EventPage)
+
+        new_christmas_event = EventPage.objects.get(url_path='/home/new-events-index/christmas/')
+        self.assertEqual(new_christmas_event.location, "Somewhere else")
+
+    def test_copy_page_copies_one_at_a_time_if_a_child_object_has_post_save_receivers(self):
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+        saved_speakers = []
+
+        def post_save_handler(instance, **kwargs):
+            saved_speakers.append(instance.pk)
+
+        post_save.connect(post_save_handler, sender=EventPageSpeaker)
+        try:
+            events_index.copy(recursive=True, update_attrs={'title': "New events index", 'slug': 'new-events-index'})
+        finally:
+            post_save.disconnect(post_save_handler, sender=EventPageSpeaker)
+
+        new_christmas_event = EventPage.objects.get(url_path='/home/new-events-index/christmas/')
+        self.assertTrue(new_christmas_event.speakers.exists())
+        self.assertTrue(set(new_christmas_event.speakers.values_list('pk', flat=True)) <= set(saved_speakers))
+
+    def test_copy_page_indexes_pages_copied_in_bulk_once_per_model(self):
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+
+        with mock.patch('wagtail.search.index.insert_or_update_objects') as insert_or_update_objects:
+            with mock.patch('wagtail.search.index.insert_or_update_object') as insert_or_update_object:
+                events_index.copy(recursive=True, update_attrs={'title': "New events index", 'slug': 'new-events-index'})
+
+        indexed_models = [call[0][0] for call in insert_or_update_objects.call_args_list]
+        self.assertEqual(len(indexed_models), len(set(indexed_models)))
+        self.assertIn(EventPage, indexed_models)
+
+        # Only the copy of the events index itself is indexed on its own
+        self.assertEqual(
+            [call[0][0].url_path for call in insert_or_update_object.call_args_list],
+            ['/home/new-events-index/'] * insert_or_update_object.call_count
+        )
+
+    def test_copy_page_copies_recursively_with_a_fixed_number_of_queries(self):
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+
+        def add_events(count):
+            for i in range(count):
+                events_index.add_child(instance=EventPage(
+                    title="Event", slug='event-%d' % events_index.get_children_count(), location='the moon',
+                    audience='public', cost='free', date_from='2001-01-01',
+                )).save_revision()
+
+        def count_copy_queries():
+            with CaptureQueriesContext(connection) as queries:
+                events_index.copy(
+                    recursive=True, update_attrs={'slug': 'new-events-index-%d' % events_index.get_children_count()}
+                )
+            return len(queries)
+
+        add_events(2)
+        num_queries = count_copy_queries()
+
+        add_events(10)
+        self.assertEqual(count_copy_queries(), num_queries)
+
+    def test_copy_page_copies_only_latest_revision(self):
+        christmas_event = EventPage.objects.get(url_path='/home/events/christmas/')
+        christmas_event.title = "First revision"
+        christmas_event.save_revision()
+        christmas_event.title = "Latest revision"
+        christmas_event.save_revision()
+
+        new_christmas_event = christmas_event.copy(
+            update_attrs={'title': "New christmas event", 'slug': 'new-christmas-event'},
+            copy_revisions='latest'
+        )
+
+        # Copying creates a new revision so we're expecting the new page to have two revisions
+        self.assertEqual(new_christmas_event.revisions.count(), 2)
+        self.assertEqual(new_christmas_event.revisions.order_by('id').first().as_page_object().title, "Latest revision")
+
+    def test_copy_page_copies_recursively_with_only_latest_revision(self):
+        events_index = EventIndex.objects.get(url_path='/home/events/')
+        christmas_event = EventPage.objects.get(url_path='/home/events/christmas/')
+        christmas_event.title = "First revision"
+        christmas_event.save_revision()
+        christmas_event.title = "Latest revision"
+        christmas_event.save_revision()
+
+        new_events_index = events_index.copy(
+            recursive=True,
+            update_attrs={'title': "New events index", 'slug': 'new-events-index'},
+            copy_revisions='latest'
+        )
+
+        new_christmas_event = new_events_index.get_children().get(slug='christmas')
+        self.assertEqual(new_christmas_event.revisions.count(), 2)
+        self.assertEqual(new_christmas_event.revisions.order_by('id').first().as_page_object().title, "Latest revision")
+
     def test_copy_page_updates_user(self):
         event_moderator = get_user_model().objects.get(username='eventmoderator')
         christmas_event = EventPage.objects.get(url_path='/home/events/christmas/')
@@ -1,8 +1,11 @@
+import mock
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 
-from wagtail.core.models import GroupPagePermission, Page, UserPagePermissionsProxy
+from wagtail.core.models import (
+    GroupPagePermission, Page, PagePermissionIndex, UserPagePermissionsProxy)
 from wagtail.tests.testapp.models import BusinessSubIndex, EventIndex, EventPage
 
 
@@ -464,3 +467,164 @@ class TestPagePermission(TestCase):
         perms = UserPagePermissionsProxy(user).for_page(christmas_page)
 
         self.assertFalse(perms.can_lock())
+
+
+class TestPrefetchSubtreeStats(TestCase):
+    fixtures = ['test.json']
+
+    def get_permissions(self, user_perms, pages):
+        destination = Page.objects.get(url_path='/home/events/')
+
+        return [
+            (
+                user_perms.for_page(page).can_delete(),
+                user_perms.for_page(page).can_move(),
+                user_perms.for_page(page).can_move_to(destination),
+            )
+            for page in pages
+        ]
+
+    def test_prefetched_permissions_match(self):
+        # Include pages at several depths
+        pages = list(Page.objects.filter(depth__gt=1))
+
+        # Create a page with no owner
+        pages[0].owner = None
+        pages[0].save()
+
+        for username in ['superuser', 'eventeditor', 'eventmoderator', 'siteeditor', 'inactiveuser']:
+            user = get_user_model().objects.get(username=username)
+
+            user_perms = UserPagePermissionsProxy(user)
+            expected = self.get_permissions(user_perms, pages)
+
+            user_perms = UserPagePermissionsProxy(user)
+            user_perms.prefetch_subtree_stats(pages)
+            self.assertEqual(self.get_permissions(user_perms, pages), expected, username)
+
+    def test_prefetch_subtree_stats(self):
+        event_moderator = get_user_model().objects.get(username='eventmoderator')
+        events_index = Page.objects.get(url_path='/home/events/')
+        pages = list(events_index.get_children())
+        user_perms = UserPagePermissionsProxy(event_moderator)
+
+        with self.assertNumQueries(1):
+            user_perms.prefetch_subtree_stats(pages)
+
+        christmas_page = Page.objects.get(url_path='/home/events/christmas/')
+        self.assertEqual(user_perms.subtree_stats[christmas_page.pk]['live_count'], 1)
+
+        page_perms = user_perms.for_page(christmas_page)
+        with self.assertNumQueries(0):
+            self.assertTrue(page_perms.can_delete())
+            self.assertTrue(page_perms.can_move())
+
+        # Pages that have already been fetched aren't fetched again
+        with self.assertNumQueries(0):
+            user_perms.prefetch_subtree_stats(pages)
+
+
+class TestPagePermissionIndex(TestCase):
+    fixtures = ['test.json']
+
+    def test_get_permission_types(self):
+        index = PagePermissionIndex([
+            ('00010001', 'add'),
+            ('000100010002', 'edit'),
+            ('000100010002', 'publish'),
+            ('00010002', 'lock'),
+        ])
+
+        self.assertEqual(index.get_permission_types(Page(path='0001')), set())
+        self.assertEqual(index.get_permission_types(Page(path='00010001')), {'add'})
+        self.assertEqual(index.get_permission_types(Page(path='0001000100020005')), {'add', 'edit', 'publish'})
+        self.assertEqual(index.get_permission_types(Page(path='000100010003')), {'add'})
+
+        # Paths that share a prefix which isn't a whole path step are not ancestors
+        self.assertEqual(index.get_permission_types(Page(path='00010000')), set())
+
+    def test_get_paths_leaves_out_nested_subtrees(self):
+        index = PagePermissionIndex([
+            ('000100010002', 'edit'),
+            ('00010001', 'edit'),
+            ('00010002', 'edit'),
+            ('000100020003', 'edit'),
+            ('00010003', 'add'),
+        ])
+
+        self.assertEqual(index.get_paths('edit'), ['00010001', '00010002'])
+        self.assertEqual(index.get_paths('publish'), [])
+        self.assertIsNone(index.get_filter('publish'))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_index_is_cached(self):
+        event_editor = get_user_model().objects.get(username='eventeditor')
+        christmas_page = EventPage.objects.get(url_path='/home/events/christmas/')
+
+        # Pretend that the local memory cache is shared, to test without any cache queries
+        with mock.patch.object(PagePermissionIndex, 'cache_is_shared', return_value=True):
+            PagePermissionIndex.for_user(event_editor)
+
+            with self.assertNumQueries(0):
+                perms = UserPagePermissionsProxy(event_editor).for_page(christmas_page)
+                self.assertTrue(perms.can_add_subpage())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_index_isnt_cached_in_process_local_cache(self):
+        event_editor = get_user_model().objects.get(username='eventeditor')
+        PagePermissionIndex.for_user(event_editor)
+
+        with self.assertNumQueries(1):
+            PagePermissionIndex.for_user(event_editor)
+
+    def test_cache_invalidated_when_permissions_change(self):
+        event_editor = get_user_model().objects.get(username='eventeditor')
+        christmas_page = EventPage.objects.get(url_path='/home/events/christmas/')
+        self.assertFalse(christmas_page.permissions_for_user(event_editor).can_publish())
+
+        GroupPagePermission.objects.create(
+            group=Group.objects.get(name='Event editors'),
+            page=christmas_page,
+            permission_type='publish',
+        )
+        self.assertTrue(christmas_page.permissions_for_user(event_editor).can_publish())
+
+        GroupPagePermission.objects.filter(page=christmas_page, permission_type='publish').delete()
+        self.assertFalse(christmas_page.permissions_for_user(event_editor).can_publish())
+
+    def test_cache_invalidated_when_groups_change(self):
+        event_editor = get_user_model().objects.get(username='eventeditor')
+        christmas_page = EventPage.objects.get(url_path='/home/events/christmas/')
+        self.assertTrue(christmas_page.permissions_for_user(event_editor).can_add_subpage())
+
+        event_editor.groups.clear()
+        self.assertFalse(christmas_page.permissions_for_user(event_editor).can_add_subpage())
+
+        event_editor.groups.add(Group.objects.get(name='Event editors'))
+        self.assertTrue(christmas_page.permissions_for_user(event_editor).can_add_subpage())
+
+    def test_cache_invalidated_when_page_moved(self):
+        event_editor = get_user_model().objects.get(username='eventeditor')
+        homepage = Page.objects.get(url_path='/home/')
+        christmas_page = EventPage.objects.get(url_path='/home/events/christmas/')
+        self.assertTrue(christmas_page.permissions_for_user(event_editor).can_add_subpage())
+
+        christmas_page.move(homepage, pos='last-child')
+        christmas_page.refresh_from_db()
+        self.assertFalse(christmas_page.permissions_for_user(event_editor).can_add_subpage())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache_invalidated_again_on_commit(self):
+        christmas_page = EventPage.objects.get(url_path='/home/events/christmas/')
+
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            GroupPagePermission.objects.create(
+                group=Group.objects.get(name='Event editors'),
+                page=christmas_page,
+                permission_type='publish',
+            )
+
+        # Other requests may rebuild indexes before the permission is committed
+        version = cache.get(PagePermissionIndex.CACHE_VERSION_KEY)
+        on_commit.call_args[0][0]()
+        self.assertNotEqual(cache.get(PagePermissionIndex.CACHE_VERSION_KEY), version)
@@ -1,10 +1,21 @@
+import datetime
+import unittest
+
+import django
+import mock
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models.functions import Length
+from django.db.models.signals import post_save
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
 
-from wagtail.core.models import Page, PageViewRestriction, Site
-from wagtail.core.signals import page_unpublished
+from wagtail.core.models import Page, PageRevision, PageViewRestriction, Site
+from wagtail.core.signals import (
+    page_published, page_unpublished, pages_published, pages_unpublished)
 from wagtail.search.query import MATCH_ALL
-from wagtail.tests.testapp.models import EventPage, SimplePage, SingleEventPage
+from wagtail.tests.testapp.models import EventPage, SimplePage, SingleEventPage, StreamPage
 
 
 class TestPageQuerySet(TestCase):
@@ -470,6 +481,10 @@ class TestPageQuerySetSearch(TestCase):
             Page.objects.get(url_path='/home/events/someone-elses-event/').specific,
         ])
 
+
+class TestPublishAndUnpublish(TestCase):
+    fixtures = ['test.json']
+
     def test_unpublish(self):
         # set up a listener for the unpublish signal
         unpublish_signals_fired = []
@@ -498,6 +513,151 @@ class TestPageQuerySetSearch(TestCase):
         # but already unpublished
         self.assertNotIn((EventPage, unpublished_event), unpublish_signals_fired)
 
+    def test_unpublish_sends_bulk_signal(self):
+        signals_fired = []
+
+        def pages_unpublished_handler(sender, instances, **kwargs):
+            signals_fired.append((sender, instances))
+
+        pages_unpublished.connect(pages_unpublished_handler)
+        self.addCleanup(pages_unpublished.disconnect, pages_unpublished_handler)
+
+        events_index = Page.objects.get(url_path='/home/events/')
+        events_index.get_children().unpublish()
+
+        self.assertEqual(len(signals_fired), 1)
+        sender, instances = signals_fired[0]
+        self.assertEqual(sender, Page)
+        self.assertIn(EventPage.objects.get(url_path='/home/events/christmas/'), instances)
+        self.assertIn(SingleEventPage.objects.get(url_path='/home/events/saint-patrick/'), instances)
+        self.assertNotIn(EventPage.objects.get(url_path='/home/events/tentative-unpublished-event/'), instances)
+        self.assertFalse(any(page.live for page in instances))
+
+    def test_unpublish_calls_overridden_unpublish(self):
+        events_index = Page.objects.get(url_path='/home/events/')
+        live_events = set(EventPage.objects.child_of(events_index).live().values_list('url_path', flat=True))
+
+        with mock.patch.object(EventPage, 'unpublish', side_effect=Page.unpublish, autospec=True) as unpublish:
+            events_index.get_children().unpublish()
+
+        self.assertEqual(set(call[0][0].url_path for call in unpublish.call_args_list), live_events)
+        self.assertFalse(EventPage.objects.get(url_path='/home/events/christmas/').live)
+        self.assertFalse(SingleEventPage.objects.get(url_path='/home/events/saint-patrick/').live)
+
+    def test_unpublish_saves_pages_with_post_save_receivers(self):
+        saved_pages = []
+
+        def post_save_handler(instance, **kwargs):
+            saved_pages.append(instance.url_path)
+
+        post_save.connect(post_save_handler, sender=SingleEventPage)
+        self.addCleanup(post_save.disconnect, post_save_handler, sender=SingleEventPage)
+
+        events_index = Page.objects.get(url_path='/home/events/')
+        events_index.get_children().unpublish()
+
+        self.assertEqual(saved_pages, ['/home/events/saint-patrick/'])
+        self.assertFalse(SingleEventPage.objects.get(url_path='/home/events/saint-patrick/').live)
+        self.assertFalse(EventPage.objects.get(url_path='/home/events/christmas/').live)
+
+    def test_publish(self):
+        # set up listeners for the publish signals
+        publish_signals_fired = []
+        bulk_signals_fired = []
+
+        def page_published_handler(sender, instance, revision, **kwargs):
+            publish_signals_fired.append((sender, instance, revision))
+
+        def pages_published_handler(sender, instances, revisions, **kwargs):
+            bulk_signals_fired.append((instances, revisions))
+
+        page_published.connect(page_published_handler)
+        self.addCleanup(page_published.disconnect, page_published_handler)
+        pages_published.connect(pages_published_handler)
+        self.addCleanup(pages_published.disconnect, pages_published_handler)
+
+        events_index = Page.objects.get(url_path='/home/events/')
+        unpublished_event = EventPage.objects.get(url_path='/home/events/tentative-unpublished-event/')
+        unpublished_event.title = "Definite event"
+        revision = unpublished_event.save_revision()
+
+        christmas = EventPage.objects.get(url_path='/home/events/christmas/')
+        christmas.save_revision(submitted_for_moderation=True)
+
+        events_index.get_children().type(EventPage).publish()
+
+        unpublished_event = EventPage.objects.get(url_path='/home/events/tentative-unpublished-event/')
+        self.assertTrue(unpublished_event.live)
+        self.assertFalse(unpublished_event.has_unpublished_changes)
+        self.assertEqual(unpublished_event.title, "Definite event")
+        self.assertEqual(unpublished_event.live_revision, revision)
+        self.assertIsNotNone(unpublished_event.first_published_at)
+
+        christmas = EventPage.objects.get(url_path='/home/events/christmas/')
+        self.assertEqual(christmas.live_revision, christmas.get_latest_revision())
+        self.assertFalse(christmas.revisions.filter(submitted_for_moderation=True).exists())
+
+        # Check that the signals were fired
+        self.assertIn((EventPage, unpublished_event, revision), publish_signals_fired)
+        self.assertIn((SingleEventPage, SingleEventPage.objects.get(url_path='/home/events/saint-patrick/')),
+                      [(sender, instance) for sender, instance, revision in publish_signals_fired])
+        self.assertEqual(len(bulk_signals_fired), 1)
+        self.assertEqual(len(bulk_signals_fired[0][0]), len(publish_signals_fired))
+
+    def test_publish_schedules_pages_going_live_in_future(self):
+        unpublished_event = EventPage.objects.get(url_path='/home/events/tentative-unpublished-event/')
+        unpublished_event.go_live_at = timezone.now() + datetime.timedelta(days=1)
+        revision = unpublished_event.save_revision()
+
+        Page.objects.filter(id=unpublished_event.id).publish()
+
+        unpublished_event = EventPage.objects.get(id=unpublished_event.id)
+        self.assertFalse(unpublished_event.live)
+        self.assertIsNotNone(PageRevision.objects.get(id=revision.id).approved_go_live_at)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_publish_uses_a_fixed_number_of_queries_for_pages_without_unpublished_changes(self):
+        events_index = Page.objects.get(url_path='/home/events/')
+        events_index.get_children().unpublish()
+
+        def count_publish_queries():
+            events_index.get_children().unpublish()
+            with CaptureQueriesContext(connection) as queries:
+                events_index.get_children().publish()
+            return len(queries)
+
+        num_queries = count_publish_queries()
+
+        for i in range(5):
+            events_index.add_child(instance=EventPage(
+                title="Event", slug='event-%d' % i, location='the moon', audience='public',
+                cost='free', date_from='2001-01-01',
+            ))
+
+        self.assertFalse(events_index.get_children().filter(has_unpublished_changes=True).exists())
+        self.assertEqual(count_publish_queries(), num_queries)
+
+    def test_publish_saves_pages_with_unpublished_changes(self):
+        events_index = Page.objects.get(url_path='/home/events/')
+
+        revisions = {}
+        for i in range(3):
+            event = EventPage(
+                title="Event", slug='event-%d' % i, location='the moon', audience='public',
+                cost='free', date_from='2001-01-01', live=False,
+            )
+            events_index.add_child(instance=event)
+            event.location = "Mars %d" % i
+            revisions[event.pk] = event.save_revision()
+
+        EventPage.objects.filter(pk__in=revisions.keys()).publish()
+
+        for event in EventPage.objects.filter(pk__in=revisions.keys()):
+            self.assertTrue(event.live)
+            self.assertFalse(event.has_unpublished_changes)
+            self.assertEqual(event.location, "Mars %s" % event.slug[len('event-'):])
+            self.assertEqual(event.live_revision, revisions[event.pk])
+
 
 class TestSpecificQuery(TestCase):
     """
@@ -627,11 +787,9 @@ class TestSpecificQuery(TestCase):
             # The query should be lazy.
             qs = root.get_descendants().specific(defer=True)
 
-        with self.assertNumQueries(4):
-            # This still performs 4 queries (one for each specific class)
-            # even though we're only pulling in fields from the base Page
-            # model.
-            # TODO: Find a way to make this perform a single query
+        with self.assertNumQueries(1):
+            # The specific pages are built from the base Page fields, so
+            # this only performs a single query
             pages = list(qs)
 
         self.assertIsInstance(pages, list)
@@ -654,6 +812,110 @@ class TestSpecificQuery(TestCase):
         with self.assertNumQueries(1):
             pages[1].body
 
+        # The deferred fields are loaded for all pages of the same type at once
+        with self.assertNumQueries(0):
+            for page in pages:
+                if isinstance(page, EventPage):
+                    page.body
+
+    def test_deferred_specific_query_keeps_annotations(self):
+        root = Page.objects.get(url_path='/home/')
+        pages = list(root.get_descendants().annotate(title_length=Length('title')).specific(defer=True))
+
+        for page in pages:
+            self.assertEqual(page.title_length, len(page.title))
+
+    def test_deferred_specific_query_keeps_related_objects(self):
+        root = Page.objects.get(url_path='/home/')
+        pages = list(root.get_descendants().select_related('content_type').specific(defer=True))
+
+        with self.assertNumQueries(0):
+            for page in pages:
+                self.assertEqual(page.content_type.model_class(), type(page))
+
+    def test_deferred_specific_iterator(self):
+        root = Page.objects.get(url_path='/home/')
+        pages = list(root.get_descendants().select_related('content_type').specific(defer=True).iterator())
+
+        self.assertEqual(len(pages), 7)
+        with self.assertNumQueries(0):
+            for page in pages:
+                self.assertIsInstance(page, page.content_type.model_class())
+
+        # The deferred fields of each page type are still loaded together
+        with self.assertNumQueries(1):
+            for page in pages:
+                if isinstance(page, EventPage):
+                    page.body
+
+    def test_deferred_specific_query_with_stream_field(self):
+        homepage = Page.objects.get(url_path='/home/')
+        homepage.add_child(instance=StreamPage(
+            title="Stream page", slug="stream-page",
+            body='[{"type": "text", "value": "foo"}]',
+        ))
+
+        page = homepage.get_children().filter(slug='stream-page').specific(defer=True).get()
+        self.assertIsInstance(page, StreamPage)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(page.body[0].value, "foo")
+
+    def test_specific_iterator(self):
+        root = Page.objects.get(url_path='/home/')
+        qs = root.get_descendants().specific()
+
+        with self.assertNumQueries(4):
+            # One query to get page type and ID, then one query per page type:
+            # EventIndex, EventPage, SimplePage
+            pages = list(qs.iterator())
+
+        self.assertEqual(pages, list(qs))
+        for page in pages:
+            self.assertIsInstance(page, page.content_type.model_class())
+
+    @unittest.skipIf(django.VERSION < (2, 0), "QuerySet.iterator() takes a chunk_size from Django 2.0")
+    def test_specific_iterator_in_chunks(self):
+        root = Page.objects.get(url_path='/home/')
+        qs = root.get_descendants().specific()
+
+        with self.assertNumQueries(6):
+            # One query to get page type and ID, then one query per page type
+            # in each window of three pages:
+            # EventIndex, EventPage / EventPage, SimplePage / EventPage
+            pages = list(qs.iterator(chunk_size=3))
+
+        self.assertEqual(pages, list(qs))
+        self.assertEqual([page.url_path for page in pages], [
+            page.url_path for page in root.get_descendants()
+        ])
+
+        for page in pages:
+            self.assertIsInstance(page, page.content_type.model_class())
+
+    @unittest.skipIf(django.VERSION < (2, 0), "QuerySet.iterator() takes a chunk_size from Django 2.0")
+    def test_specific_iterator_in_chunks_is_lazy(self):
+        root = Page.objects.get(url_path='/home/')
+        iterator = root.get_descendants().specific().iterator(chunk_size=1)
+
+        with self.assertNumQueries(2):
+            # The page type and ID query, and one query for the first page
+            page = next(iterator)
+
+        self.assertEqual(page, Page.objects.get(url_path='/home/events/').specific)
+
+    @unittest.skipIf(django.VERSION < (2, 0), "QuerySet.iterator() takes a chunk_size from Django 2.0")
+    def test_deferred_specific_iterator_in_chunks(self):
+        root = Page.objects.get(url_path='/home/')
+        pages = list(root.get_descendants().specific(defer=True).iterator(chunk_size=3))
+
+        self.assertEqual(len(pages), 7)
+        for page in pages:
+            self.assertIsInstance(page, page.content_type.model_class())
+
+        with self.assertNumQueries(1):
+            pages[1].body
+
 
 class TestFirstCommonAncestor(TestCase):
     """
@@ -671,6 +933,11 @@ class TestFirstCommonAncestor(TestCase):
         self.assertEqual(self.all_events.count(), 4)
         self.assertEqual(self.regular_events.count(), 3)
 
+    def test_num_queries(self):
+        with self.assertNumQueries(2):
+            # One query for the paths, and one for the ancestor
+            self.all_events.first_common_ancestor()
+
     def test_event_pages(self):
         """Common ancestor for EventPages"""
         # As there are event pages in multiple trees under /home/, the home
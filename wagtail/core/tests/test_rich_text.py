@@ -1,12 +1,14 @@
 from bs4 import BeautifulSoup
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from mock import patch
 
 from wagtail.core.models import Page
 from wagtail.core.rich_text import RichText, expand_db_html
 from wagtail.core.rich_text.feature_registry import FeatureRegistry
 from wagtail.core.rich_text.pages import PageLinkHandler, page_linktype_handler
-from wagtail.core.rich_text.rewriters import extract_attrs
+from wagtail.core.rich_text.rewriters import (
+    EmbedRewriter, LinkAndEmbedRewriter, LinkRewriter, MultiRuleRewriter, extract_attrs)
 
 
 class TestPageLinkHandler(TestCase):
@@ -41,6 +43,27 @@ class TestPageLinkHandler(TestCase):
         result = page_linktype_handler({'id': 1})
         self.assertEqual(result, '<a href="None">')
 
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_expand_db_html_looks_up_links_in_bulk(self):
+        page_ids = list(Page.objects.filter(depth__gt=2).values_list('pk', flat=True))
+        html = ''.join('<a linktype="page" id="%d">link</a>' % page_id for page_id in page_ids)
+        cache.delete('wagtail_site_root_paths')
+
+        with self.assertNumQueries(3):
+            # Pages, the site root paths (which are then cached) and the specific
+            # pages that override get_url_parts
+            result = expand_db_html(html)
+
+        for page_id in page_ids:
+            self.assertIn('<a href="%s">' % Page.objects.get(id=page_id).specific.url, result)
+
+    def test_expand_db_html_uses_custom_url(self):
+        page = Page.objects.get(url_path='/home/events/saint-patrick/')
+        result = expand_db_html('<a linktype="page" id="%d">foo</a><a linktype="page" id="0">bar</a>' % page.id)
+        self.assertEqual(
+            result, '<a href="/events/saint-patrick/pointless-suffix/">foo</a><a>bar</a>'
+        )
+
 
 class TestExtractAttrs(TestCase):
     def test_extract_attr(self):
@@ -48,6 +71,47 @@ class TestExtractAttrs(TestCase):
         result = extract_attrs(html)
         self.assertEqual(result, {'foo': 'bar', 'baz': 'quux'})
 
+    def test_extract_attr_unescapes_entities(self):
+        html = '<a foo="&lt;b&gt; &quot;&amp;lt;&quot;">snowman</a>'
+        result = extract_attrs(html)
+        self.assertEqual(result, {'foo': '<b> "&lt;"'})
+
+
+class TestLinkAndEmbedRewriter(TestCase):
+    def setUp(self):
+        self.rewriter = LinkAndEmbedRewriter(
+            {'thing': lambda attrs: '<a href="/things/%s/">' % attrs['id']},
+            {'widget': lambda attrs: '<widget %s>' % attrs['id']},
+        )
+
+    def test_rewrites_links_and_embeds_in_order(self):
+        html = (
+            '<p><a linktype="thing" id="1">one</a><embed embedtype="widget" id="2"/>'
+            '<a href="/plain/">plain</a><abbr>abbr</abbr><a linktype="thing" id="3">three</a></p>'
+        )
+        self.assertEqual(
+            self.rewriter(html),
+            '<p><a href="/things/1/">one</a><widget 2>'
+            '<a href="/plain/">plain</a><abbr>abbr</abbr><a href="/things/3/">three</a></p>'
+        )
+
+    def test_unknown_types(self):
+        html = '<a linktype="unknown" id="1">one</a><embed embedtype="unknown" id="2"/><embed id="3"/>'
+        self.assertEqual(self.rewriter(html), '<a>one</a>')
+
+    def test_matches_separate_rewriters(self):
+        link_rules = {'thing': lambda attrs: '<a href="/things/%s/">' % attrs['id']}
+        embed_rules = {'widget': lambda attrs: '<widget %s>' % attrs['id']}
+        html = (
+            '<p>Some <a linktype="thing" id="1">text</a>, <embed embedtype="widget" id="2"/>'
+            '<embed embedtype="other"/><a>bare</a> <a linktype="other" id="4">link</a></p>'
+        ) * 10
+
+        self.assertEqual(
+            LinkAndEmbedRewriter(link_rules, embed_rules)(html),
+            MultiRuleRewriter([LinkRewriter(link_rules), EmbedRewriter(embed_rules)])(html)
+        )
+
 
 class TestExpandDbHtml(TestCase):
     def test_expand_db_html_with_linktype(self):
@@ -116,3 +180,70 @@ class TestFeatureRegistry(TestCase):
         self.assertIsNone(
             features.get_editor_plugin('hallo', 'made_up_feature')
         )
+
+
+@override_settings(
+    WAGTAIL_RICH_TEXT_CACHE_TIMEOUT=60,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+)
+class TestRichTextCache(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        self.christmas_page = Page.objects.get(url_path='/home/events/christmas/')
+        self.html = '<p>Merry <a linktype="page" id="%d">Christmas</a>!</p>' % self.christmas_page.id
+
+    def test_expanded_html_is_cached(self):
+        result = expand_db_html(self.html)
+        self.assertEqual(result, '<p>Merry <a href="/events/christmas/">Christmas</a>!</p>')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(expand_db_html(self.html), result)
+
+    @override_settings(WAGTAIL_RICH_TEXT_CACHE_TIMEOUT=None)
+    def test_cache_is_disabled_by_default(self):
+        expand_db_html(self.html)
+
+        with self.assertNumQueries(1):
+            expand_db_html(self.html)
+
+    def test_slug_change(self):
+        expand_db_html(self.html)
+
+        self.christmas_page.slug = 'xmas'
+        self.christmas_page.save()
+
+        self.assertEqual(expand_db_html(self.html), '<p>Merry <a href="/events/xmas/">Christmas</a>!</p>')
+
+    def test_parent_slug_change(self):
+        expand_db_html(self.html)
+
+        events_page = Page.objects.get(url_path='/home/events/')
+        events_page.slug = 'whats-on'
+        events_page.save()
+
+        self.assertEqual(expand_db_html(self.html), '<p>Merry <a href="/whats-on/christmas/">Christmas</a>!</p>')
+
+    def test_move(self):
+        expand_db_html(self.html)
+
+        self.christmas_page.move(Page.objects.get(url_path='/home/about-us/'), pos='last-child')
+
+        self.assertEqual(expand_db_html(self.html), '<p>Merry <a href="/about-us/christmas/">Christmas</a>!</p>')
+
+    def test_publish(self):
+        expand_db_html(self.html)
+
+        page = self.christmas_page.specific
+        page.slug = 'xmas'
+        page.save_revision().publish()
+
+        self.assertEqual(expand_db_html(self.html), '<p>Merry <a href="/events/xmas/">Christmas</a>!</p>')
+
+    def test_delete(self):
+        expand_db_html(self.html)
+
+        self.christmas_page.delete()
+
+        self.assertEqual(expand_db_html(self.html), '<p>Merry <a>Christmas</a>!</p>')
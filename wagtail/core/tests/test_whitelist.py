@@ -150,3 +150,67 @@ class TestWhitelister(TestCase):
         string = '<img alt="Arthur &quot;two sheds&quot; Jackson" sheds="2">'
         cleaned_string = self.whitelister.clean(string)
         self.assertEqual(cleaned_string, '<img alt="Arthur &quot;two sheds&quot; Jackson"/>')
+
+    def test_clean_many_unrecognised_nodes(self):
+        string = (
+            '<html><body><table><tr><td><span>one</span></td><td>two <font>three</font></td></tr></table>'
+            '<span><span lang="en">four</span></span><p><o:p>five</o:p><b class="x">six</b></p></body></html>'
+        )
+        cleaned_string = self.whitelister.clean(string)
+        self.assertEqual(cleaned_string, 'onetwo threefour<p>five<b>six</b></p>')
+
+
+class UnwrappingWhitelister(Whitelister):
+    """
+    Unwraps unrecognised tags as soon as they are found, as Whitelister originally did
+    """
+    def clean_tag_node(self, doc, tag):
+        for child in list(tag.contents):
+            self.clean_node(doc, child)
+
+        try:
+            rule = self.element_rules[tag.name]
+        except KeyError:
+            tag.unwrap()
+            return
+
+        rule(tag)
+
+
+class TestWhitelisterMatchesUnwrapping(TestCase):
+    """
+    Whitelister defers unwrapping unrecognised tags to their parent, so that long documents
+    can be cleaned in linear time; this must give the same output as unwrapping them immediately
+    """
+    def assertSameOutput(self, string):
+        self.assertEqual(Whitelister().clean(string), UnwrappingWhitelister().clean(string))
+
+    def test_pasted_word_document(self):
+        self.assertSameOutput(
+            '<p class="MsoNormal" style="margin:0"><span style="font-family:Arial"><span lang="EN-GB">'
+            'Lorem ipsum <b>dolor</b> sit amet, <a href="http://example.com/?a=1&amp;b=2" target="_blank">'
+            'link</a> <font color="red">consectetur</font> &amp; &lt;adipiscing&gt; "elit"</span></span>'
+            '<!--[if gte mso 9]>junk<![endif]--><o:p></o:p></p>' * 20
+        )
+
+    def test_tables_and_lists(self):
+        self.assertSameOutput(
+            '<table><thead><tr><th>Head</th></tr></thead><tr><td><span>cell</span></td>'
+            '<td><img src="javascript:alert(1)" width="10" onclick="x"></td></tr></table>'
+            '<ul><li><span><span>item</span></span></li><li><ol><li>nested</li></ol></li></ul>'
+        )
+
+    def test_misnested_tags(self):
+        self.assertSameOutput(
+            '<b><span>one<p>two</b>three</span></p><table>four<span>five</table>'
+            '<a href="/"><div><a href="/other">six</a></div></a><font><h2>seven</font></h2>'
+        )
+
+    def test_unrecognised_tags_with_no_contents(self):
+        self.assertSameOutput('<p>one<wbr>two<input value="three"><span></span><o:p></o:p></p>')
+
+    def test_script_and_style(self):
+        self.assertSameOutput(
+            '<head><title>Title</title><style>p { color: red; }</style></head>'
+            '<body><script>alert("XSS")</script><p>text</p></body>'
+        )
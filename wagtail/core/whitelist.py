@@ -136,18 +136,54 @@ class Whitelister:
         # to avoid losing our place in the sequence.
         for child in list(tag.contents):
             self.clean_node(doc, child)
+        self.unwrap_removed_children(tag)
 
         # see if there is a rule in element_rules for this tag type
         try:
             rule = self.element_rules[tag.name]
         except KeyError:
             # don't recognise this tag name, so KILL IT WITH FIRE
-            tag.unwrap()
+            self.remove_tag(tag)
             return
 
         # apply the rule
         rule(tag)
 
+    def remove_tag(self, tag):
+        """
+        Mark a tag to be replaced by its contents. Rather than unwrapping it straight away,
+        which means searching the parent's children for the tag's position (and becomes
+        quadratic for long documents), we leave that to the parent's unwrap_removed_children
+        call so that all of its removed children are unwrapped in one pass.
+        """
+        # BeautifulSoup outputs just the contents of a hidden tag, as it does for the
+        # document root, so the tag's own markup is dropped even if it is never unwrapped
+        tag.hidden = True
+
+    def unwrap_removed_children(self, tag):
+        """
+        Replace any children of this tag that were passed to remove_tag with their contents
+        """
+        if not any(isinstance(child, Tag) and child.hidden for child in tag.contents):
+            return
+
+        new_contents = []
+        for child in tag.contents:
+            if isinstance(child, Tag) and child.hidden:
+                new_contents.extend(child.contents)
+            else:
+                new_contents.append(child)
+
+        # Detach everything from the tree before reattaching it in its new place. clear()
+        # extracts elements from the front of the list, so each extract is cheap.
+        for child in tag.contents:
+            if isinstance(child, Tag) and child.hidden:
+                child.clear()
+        tag.clear()
+
+        for child in new_contents:
+            tag.append(child)
+
     def clean_unknown_node(self, doc, node):
         # don't know what type of object this is, so KILL IT WITH FIRE
         node.decompose()
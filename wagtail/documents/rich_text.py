@@ -9,12 +9,31 @@ from wagtail.documents.models import get_document_model
 # Front-end conversion
 
 def document_linktype_handler(attrs):
+    return expand_document_links([attrs])[0]
+
+
+def expand_document_links(attrs_list):
     Document = get_document_model()
-    try:
-        doc = Document.objects.get(id=attrs['id'])
-        return '<a href="%s">' % escape(doc.url)
-    except Document.DoesNotExist:
-        return "<a>"
+
+    document_ids = set()
+    for attrs in attrs_list:
+        try:
+            document_ids.add(int(attrs['id']))
+        except (KeyError, ValueError):
+            pass
+
+    documents = Document.objects.in_bulk(document_ids) if document_ids else {}
+
+    tags = []
+    for attrs in attrs_list:
+        try:
+            tags.append('<a href="%s">' % escape(documents[int(attrs['id'])].url))
+        except (KeyError, ValueError):
+            tags.append("<a>")
+    return tags
+
+
+document_linktype_handler.expand_db_attributes_many = expand_document_links
 
 
 # hallo.js / editor-html conversion
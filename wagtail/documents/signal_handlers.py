@@ -1,6 +1,7 @@
 from django.db import transaction
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 
+from wagtail.core.rich_text import cache as rich_text_cache
 from wagtail.documents.models import get_document_model
 
 
@@ -9,6 +10,14 @@ def post_delete_file_cleanup(instance, **kwargs):
     transaction.on_commit(lambda: instance.file.delete(False))
 
 
+def document_changed_rich_text_signal_handler(instance, **kwargs):
+    # Expand references to this document in rich text again
+    rich_text_cache.invalidate('document', [instance.pk])
+
+
 def register_signal_handlers():
     Document = get_document_model()
     post_delete.connect(post_delete_file_cleanup, sender=Document)
+
+    post_save.connect(document_changed_rich_text_signal_handler, sender=Document)
+    post_delete.connect(document_changed_rich_text_signal_handler, sender=Document)
@@ -1,6 +1,8 @@
 from bs4 import BeautifulSoup
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
+from wagtail.core.rich_text import expand_db_html
+from wagtail.documents.models import get_document_model
 from wagtail.documents.rich_text import DocumentLinkHandler, document_linktype_handler
 
 
@@ -27,3 +29,25 @@ class TestDocumentRichTextLinkHandler(TestCase):
         result = document_linktype_handler({'id': 1})
         self.assertEqual(result,
                          '<a href="/documents/1/test.pdf">')
+
+    def test_expand_db_html_looks_up_documents_in_bulk(self):
+        html = '<a linktype="document" id="1">foo</a> <a linktype="document" id="0">bar</a>' * 3
+
+        with self.assertNumQueries(1):
+            result = expand_db_html(html)
+
+        self.assertEqual(result, '<a href="/documents/1/test.pdf">foo</a> <a>bar</a>' * 3)
+
+    @override_settings(
+        WAGTAIL_RICH_TEXT_CACHE_TIMEOUT=60,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    )
+    def test_cached_expand_db_html_is_invalidated_when_document_changes(self):
+        html = '<a linktype="document" id="1">foo</a>'
+        self.assertEqual(expand_db_html(html), '<a href="/documents/1/test.pdf">foo</a>')
+
+        document = get_document_model().objects.get(id=1)
+        document.file.name = 'documents/other.pdf'
+        document.save()
+
+        self.assertEqual(expand_db_html(html), '<a href="/documents/1/other.pdf">foo</a>')
@@ -3,7 +3,9 @@ from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 
 from wagtail.core import blocks
-from wagtail.embeds.format import embed_to_frontend_html
+from wagtail.embeds import embeds
+from wagtail.embeds.exceptions import EmbedException
+from wagtail.embeds.format import embed_to_frontend_html, render_frontend_embed
 
 
 class EmbedValue:
@@ -14,11 +16,16 @@ class EmbedValue:
     we want to be able to do {% embed value.url 500 %} without
     doing a redundant fetch of the embed at the default width.
     """
-    def __init__(self, url):
+    def __init__(self, url, embed=None):
         self.url = url
+        # The Embed object for the URL, if it has already been looked up
+        self.embed = embed
 
     @cached_property
     def html(self):
+        if self.embed is not None:
+            return render_frontend_embed(self.embed)
+
         return embed_to_frontend_html(self.url)
 
     def __str__(self):
@@ -44,6 +51,16 @@ class EmbedBlock(blocks.URLBlock):
         else:
             return EmbedValue(value)
 
+    def bulk_to_python(self, values):
+        """
+        Converts a list of URLs to EmbedValues (or None), looking up the embeds that
+        have already been fetched at once, rather than as each value is rendered
+        """
+        urls = [value for value in values if value]
+        stored_embeds = embeds.get_stored_embeds(urls) if urls else {}
+
+        return [EmbedValue(value, stored_embeds.get(value)) if value else None for value in values]
+
     def get_prep_value(self, value):
         # serialisable value should be a URL string
         if value is None:
@@ -66,8 +83,13 @@ class EmbedBlock(blocks.URLBlock):
             return EmbedValue(value)
 
     def clean(self, value):
-        if isinstance(value, EmbedValue) and not value.html:
-            raise ValidationError(_("Cannot find an embed for this URL."))
+        if isinstance(value, EmbedValue):
+            # Fetch the embed now, even if embeds are otherwise fetched in the background
+            # or it failed recently, so that editors find out about URLs that can't be embedded
+            try:
+                value.embed = embeds.get_embed(value.url, ignore_failures=True)
+            except EmbedException:
+                raise ValidationError(_("Cannot find an embed for this URL."))
         return super().clean(value)
 
     class Meta:
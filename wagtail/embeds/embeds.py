@@ -1,16 +1,111 @@
-from datetime import datetime
+import hashlib
+import time
 
-from .exceptions import EmbedUnsupportedProviderException
+from django.conf import settings
+from django.core.cache import cache
+
+from .exceptions import EmbedException, EmbedNotFoundException, EmbedUnsupportedProviderException
 from .finders import get_finders
 from .models import Embed
 
+CACHE_KEY_PREFIX = 'wagtail_embed:'
+FAILURE_KEY_PREFIX = 'wagtail_embed_failure:'
+
+# The number of seconds to wait before asking a provider for an embed again after it
+# failed. This doubles with each failure in a row, up to MAX_FAILURE_BACKOFF.
+FAILURE_BACKOFF = 60
+MAX_FAILURE_BACKOFF = 24 * 60 * 60
+
+
+def get_cache_timeout():
+    """
+    Returns the number of seconds to cache embeds for in the default cache, in front
+    of the database, or None if the cache is disabled
+    """
+    return getattr(settings, 'WAGTAILEMBEDS_CACHE_TIMEOUT', None)
+
+
+def get_cache_key(url, max_width=None, prefix=CACHE_KEY_PREFIX):
+    # URLs can contain characters that aren't allowed in cache keys, and be too long
+    source = '%s\n%s' % (url, max_width)
+    return prefix + hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def get_stored_embeds(urls, max_width=None):
+    """
+    Returns a dict of URL to Embed for the given URLs whose embeds have already been
+    fetched, looking them all up in the cache and then the database at once
+    """
+    embeds = {}
+
+    timeout = get_cache_timeout()
+    if timeout:
+        cache_keys = {get_cache_key(url, max_width): url for url in urls}
+        for cache_key, embed in cache.get_many(cache_keys.keys()).items():
+            embeds[cache_keys[cache_key]] = embed
+
+    missing_urls = set(urls) - set(embeds.keys())
+    if missing_urls:
+        stored_embeds = {
+            embed.url: embed
+            for embed in Embed.objects.filter(url__in=missing_urls, max_width=max_width)
+        }
+
+        if timeout and stored_embeds:
+            cache.set_many({
+                get_cache_key(url, max_width): embed for url, embed in stored_embeds.items()
+            }, timeout)
+
+        embeds.update(stored_embeds)
+
+    return embeds
+
+
+def get_failing_urls(urls, max_width=None):
+    """
+    Returns the set of the given URLs whose embeds failed to be fetched recently, and
+    shouldn't be fetched again yet
+    """
+    failure_keys = {get_cache_key(url, max_width, FAILURE_KEY_PREFIX): url for url in urls}
+    now = time.time()
+
+    return {
+        failure_keys[failure_key]
+        for failure_key, (failures, retry_at) in cache.get_many(failure_keys.keys()).items()
+        if retry_at > now
+    }
 
-def get_embed(url, max_width=None, finder=None):
-    # Check database
-    try:
-        return Embed.objects.get(url=url, max_width=max_width)
-    except Embed.DoesNotExist:
-        pass
+
+def record_failure(url, max_width=None):
+    """
+    Records that the given embed couldn't be fetched, so that it isn't fetched again
+    until its backoff period is over
+    """
+    failure_key = get_cache_key(url, max_width, FAILURE_KEY_PREFIX)
+    failures = cache.get(failure_key, (0, None))[0] + 1
+
+    backoff = min(FAILURE_BACKOFF * 2 ** min(failures - 1, 16), MAX_FAILURE_BACKOFF)
+
+    # Remember the number of failures beyond the backoff period, so that the next
+    # failure in a row waits longer
+    cache.set(failure_key, (failures, time.time() + backoff), backoff + MAX_FAILURE_BACKOFF)
+
+
+def get_embed(url, max_width=None, finder=None, ignore_failures=False):
+    """
+    Returns the Embed for the given URL, fetching it from the provider if it hasn't been
+    fetched yet. Unless ignore_failures is True, the provider isn't asked again while
+    it's backing off after a failure (see record_failure), and EmbedNotFoundException is
+    raised instead. Editors who enter a URL should always have it checked again.
+    """
+    # Check cache and database
+    embed = get_stored_embeds([url], max_width).get(url)
+    if embed is not None:
+        return embed
+
+    # Don't ask the provider again while it's backing off after a failure
+    if not ignore_failures and get_failing_urls([url], max_width):
+        raise EmbedNotFoundException
 
     # Get/Call finder
     if not finder:
@@ -21,7 +116,16 @@ def get_embed(url, max_width=None, finder=None):
 
             raise EmbedUnsupportedProviderException
 
-    embed_dict = finder(url, max_width)
+    try:
+        embed_dict = finder(url, max_width)
+    except EmbedUnsupportedProviderException:
+        raise
+    except EmbedException:
+        record_failure(url, max_width)
+        raise
+
+    # Start the backoff from the beginning if the embed fails again later
+    cache.delete(get_cache_key(url, max_width, FAILURE_KEY_PREFIX))
 
     # Make sure width and height are valid integers before inserting into database
     try:
@@ -38,15 +142,40 @@ def get_embed(url, max_width=None, finder=None):
     if 'html' not in embed_dict or not embed_dict['html']:
         embed_dict['html'] = ''
 
-    # Create database record
+    # Create database record. last_updated is set when it's created, so there's no
+    # need to save it again
     embed, created = Embed.objects.get_or_create(
         url=url,
         max_width=max_width,
         defaults=embed_dict,
     )
 
-    # Save
-    embed.last_updated = datetime.now()
-    embed.save()
-
     return embed
+
+
+def get_embeds(urls, max_width=None, finder=None):
+    """
+    Returns a dict of URL to Embed for the given URLs. The embeds that have already been
+    fetched are looked up at once, and the others are fetched with get_embed. URLs
+    whose embeds can't be fetched are left out.
+    """
+    embeds = get_stored_embeds(urls, max_width)
+
+    for url in set(urls) - set(embeds.keys()):
+        try:
+            embeds[url] = get_embed(url, max_width=max_width, finder=finder)
+        except EmbedException:
+            pass
+
+    return embeds
+
+
+def invalidate_embed(url, max_width=None):
+    """
+    Removes the given embed from the cache, along with any failures recorded for it
+    """
+    cache_keys = [get_cache_key(url, max_width, FAILURE_KEY_PREFIX)]
+    if get_cache_timeout():
+        cache_keys.append(get_cache_key(url, max_width))
+
+    cache.delete_many(cache_keys)
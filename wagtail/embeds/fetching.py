@@ -0,0 +1,104 @@
+"""
+Fetches embeds in background threads, enabled with the WAGTAILEMBEDS_FETCH_WORKERS setting.
+
+Rendering an embed that hasn't been fetched yet then adds it to a queue and shows a
+placeholder, rather than making the request wait for the provider. Up to
+WAGTAILEMBEDS_FETCH_WORKERS embeds are fetched at once, and an embed is only queued once
+at a time. Embeds that fail to be fetched are left out of pages, and aren't queued again
+until their backoff period is over (see wagtail.embeds.embeds.record_failure).
+"""
+
+import logging
+import threading
+from concurrent import futures
+
+from django.conf import settings
+from django.db import connections
+
+from wagtail.embeds import embeds
+from wagtail.embeds.exceptions import EmbedException
+
+logger = logging.getLogger('wagtail.embeds')
+
+_fetch_queue = None
+_fetch_queue_lock = threading.Lock()
+
+
+class EmbedFetchQueue:
+    def __init__(self, workers):
+        self.executor = futures.ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+
+        # The futures of the embeds that are queued or being fetched, by (url, max_width)
+        self.fetches = {}
+
+    def add(self, url, max_width=None):
+        """
+        Queues the given embed to be fetched, unless it already is
+        """
+        key = (url, max_width)
+        with self.lock:
+            if key not in self.fetches:
+                self.fetches[key] = self.executor.submit(self.fetch, key)
+
+    def fetch(self, key):
+        url, max_width = key
+        try:
+            embeds.get_embed(url, max_width=max_width)
+        except EmbedException:
+            # get_embed has recorded the failure, so the embed won't be queued again
+            # until its backoff period is over
+            pass
+        except Exception:
+            logger.exception("Failed to fetch the embed for %s", url)
+        finally:
+            # The worker threads aren't part of a request, so their database connections
+            # wouldn't be closed otherwise
+            connections.close_all()
+
+            with self.lock:
+                del self.fetches[key]
+
+    def get_stored_or_queue(self, urls, max_width=None):
+        """
+        Returns a dict of URL to Embed for the given URLs whose embeds have already been
+        fetched, and a set of the other URLs, which have been queued to be fetched. URLs
+        whose embeds failed to be fetched recently are in neither.
+        """
+        stored_embeds = embeds.get_stored_embeds(urls, max_width)
+
+        queued_urls = set(urls) - set(stored_embeds.keys())
+        if queued_urls:
+            queued_urls -= embeds.get_failing_urls(queued_urls, max_width)
+
+            for url in queued_urls:
+                self.add(url, max_width)
+
+        return stored_embeds, queued_urls
+
+    def wait(self, timeout=None):
+        """
+        Waits for the embeds that have been queued so far to be fetched
+        """
+        with self.lock:
+            pending = list(self.fetches.values())
+
+        futures.wait(pending, timeout)
+
+
+def get_fetch_queue():
+    """
+    Returns the queue that embeds are fetched from in the background, or None if
+    embeds are fetched while pages are rendered
+    """
+    global _fetch_queue
+
+    workers = getattr(settings, 'WAGTAILEMBEDS_FETCH_WORKERS', None)
+    if not workers:
+        return None
+
+    with _fetch_queue_lock:
+        if _fetch_queue is None:
+            _fetch_queue = EmbedFetchQueue(workers)
+
+    return _fetch_queue
@@ -1,22 +1,39 @@
-import json
 import re
-from urllib import request as urllib_request
-from urllib.error import URLError
-from urllib.parse import urlencode
-from urllib.request import Request
+import threading
+
+import requests
 
 from wagtail.embeds.exceptions import EmbedNotFoundException
 from wagtail.embeds.oembed_providers import all_providers
 
 from .base import EmbedFinder
 
+# The number of seconds to wait for a provider to respond, unless the finder or the
+# provider sets another timeout
+DEFAULT_TIMEOUT = 10
+
+_local = threading.local()
+
+
+def get_session():
+    """
+    Returns the requests session for the current thread, which keeps the connections
+    to providers open between requests
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+        session.headers['User-agent'] = 'Mozilla/5.0'
+    return session
+
 
 class OEmbedFinder(EmbedFinder):
     options = {}
     _endpoints = None
 
-    def __init__(self, providers=None, options=None):
+    def __init__(self, providers=None, options=None, timeout=DEFAULT_TIMEOUT):
         self._endpoints = {}
+        self._timeouts = {}
 
         for provider in providers or all_providers:
             patterns = []
@@ -27,6 +44,7 @@ class OEmbedFinder(EmbedFinder):
                 patterns.append(re.compile(url))
 
             self._endpoints[endpoint] = patterns
+            self._timeouts[endpoint] = provider.get('timeout', timeout)
 
         if options:
             self.options = self.options.copy()
@@ -55,13 +73,21 @@ class OEmbedFinder(EmbedFinder):
             params['maxwidth'] = max_width
 
         # Perform request
-        request = Request(endpoint + '?' + urlencode(params))
-        request.add_header('User-agent', 'Mozilla/5.0')
         try:
-            r = urllib_request.urlopen(request)
-        except URLError:
+            response = get_session().get(endpoint, params=params, timeout=self._timeouts[endpoint])
+            response.raise_for_status()
+            oembed = response.json()
+        except (requests.RequestException, ValueError):
+            # Includes timeouts, error responses and invalid JSON
+            raise EmbedNotFoundException
+
+        # Check that the response is an oEmbed response that can be embedded
+        if not isinstance(oembed, dict) or 'type' not in oembed:
+            raise EmbedNotFoundException
+        if oembed['type'] == 'photo' and not oembed.get('url'):
+            raise EmbedNotFoundException
+        if oembed['type'] in ('video', 'rich') and not oembed.get('html'):
             raise EmbedNotFoundException
-        oembed = json.loads(r.read().decode('utf-8'))
 
         # Convert photos into HTML
         if oembed['type'] == 'photo':
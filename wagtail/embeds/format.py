@@ -1,21 +1,65 @@
 from django.template.loader import render_to_string
 
-from wagtail.embeds import embeds
+from wagtail.core.rich_text import cache as rich_text_cache
+from wagtail.embeds import embeds, fetching
 from wagtail.embeds.exceptions import EmbedException
 
 
 def embed_to_frontend_html(url):
+    if fetching.get_fetch_queue() is not None:
+        return embeds_to_frontend_html([url])[0]
+
     try:
         embed = embeds.get_embed(url)
-
-        # Render template
-        return render_to_string('wagtailembeds/embed_frontend.html', {
-            'embed': embed,
-        })
     except EmbedException:
-        # silently ignore failed embeds, rather than letting them crash the page
+        # silently ignore failed embeds, rather than letting them crash the page.
+        # The embed may work next time, so don't cache rich text without it
+        rich_text_cache.skip_cache()
         return ''
 
+    return render_frontend_embed(embed)
+
+
+def embeds_to_frontend_html(urls):
+    """
+    Returns a list of the front-end HTML for each of the given URLs, looking up all of
+    their embeds at once. If embeds are fetched in the background, a placeholder is
+    returned for those that haven't been fetched yet.
+    """
+    fetch_queue = fetching.get_fetch_queue()
+    if fetch_queue is None:
+        found_embeds = embeds.get_embeds(urls)
+        queued_urls = set()
+    else:
+        found_embeds, queued_urls = fetch_queue.get_stored_or_queue(urls)
+
+    html = []
+    for url in urls:
+        if url in found_embeds:
+            html.append(render_frontend_embed(found_embeds[url]))
+        elif url in queued_urls:
+            rich_text_cache.skip_cache()
+            html.append(render_embed_placeholder(url))
+        else:
+            # silently ignore failed embeds, rather than letting them crash the page.
+            # The embed may work next time, so don't cache rich text without it
+            rich_text_cache.skip_cache()
+            html.append('')
+
+    return html
+
+
+def render_frontend_embed(embed):
+    return render_to_string('wagtailembeds/embed_frontend.html', {
+        'embed': embed,
+    })
+
+
+def render_embed_placeholder(url):
+    return render_to_string('wagtailembeds/embed_placeholder.html', {
+        'url': url,
+    })
+
 
 def embed_to_editor_html(url):
     embed = embeds.get_embed(url)
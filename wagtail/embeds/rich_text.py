@@ -17,6 +17,17 @@ def media_embedtype_handler(attrs):
     return format.embed_to_frontend_html(attrs['url'])
 
 
+def expand_media_embeds(attrs_list):
+    """
+    Given a list of dicts of attributes from <embed> tags, return the real HTML
+    representation of each of them, looking up all of the embeds at once.
+    """
+    return format.embeds_to_frontend_html([attrs['url'] for attrs in attrs_list])
+
+
+media_embedtype_handler.expand_db_attributes_many = expand_media_embeds
+
+
 # hallo.js / editor-html conversion
 
 class MediaEmbedHandler:
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+
+from wagtail.core.rich_text import cache as rich_text_cache
+from wagtail.embeds.embeds import invalidate_embed
+from wagtail.embeds.models import Embed
+
+
+def embed_changed_signal_handler(instance, **kwargs):
+    invalidate_embed(instance.url, instance.max_width)
+
+    # Rich text may have been cached with a placeholder or an older version of the embed
+    rich_text_cache.invalidate('media', [rich_text_cache.get_url_id(instance.url)])
+
+
+def register_signal_handlers():
+    post_save.connect(embed_changed_signal_handler, sender=Embed)
+    post_delete.connect(embed_changed_signal_handler, sender=Embed)
@@ -1,14 +1,25 @@
 from django import template
 from django.utils.safestring import mark_safe
 
-from wagtail.embeds import embeds
+from wagtail.embeds import embeds, fetching
 from wagtail.embeds.exceptions import EmbedException
+from wagtail.embeds.format import render_embed_placeholder
 
 register = template.Library()
 
 
 @register.simple_tag(name='embed')
 def embed_tag(url, max_width=None):
+    fetch_queue = fetching.get_fetch_queue()
+    if fetch_queue is not None:
+        found_embeds, queued_urls = fetch_queue.get_stored_or_queue([url], max_width)
+        if url in found_embeds:
+            return mark_safe(found_embeds[url].html)
+        elif url in queued_urls:
+            return render_embed_placeholder(url)
+        else:
+            return ''
+
     try:
         embed = embeds.get_embed(url, max_width=max_width)
         return mark_safe(embed.html)
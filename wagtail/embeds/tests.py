@@ -1,21 +1,27 @@
 import json
+import threading
+import time
 import unittest
-import urllib.request
-from urllib.error import URLError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 
+import requests
 from bs4 import BeautifulSoup
 from django import template
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.test import TestCase, override_settings
 from django.urls import reverse
-from mock import patch
+from mock import Mock, patch
 
 from wagtail.core import blocks
 from wagtail.core.rich_text import expand_db_html
 from wagtail.embeds import oembed_providers
 from wagtail.embeds.blocks import EmbedBlock, EmbedValue
-from wagtail.embeds.embeds import get_embed
+from wagtail.embeds.embeds import (
+    FAILURE_BACKOFF, get_embed, get_embeds, get_failing_urls, record_failure)
 from wagtail.embeds.exceptions import EmbedNotFoundException, EmbedUnsupportedProviderException
+from wagtail.embeds.fetching import get_fetch_queue
 from wagtail.embeds.finders import get_finders
 from wagtail.embeds.finders.embedly import EmbedlyFinder as EmbedlyFinder
 from wagtail.embeds.finders.embedly import AccessDeniedEmbedlyException, EmbedlyException
@@ -160,6 +166,142 @@ class TestEmbeds(TestCase):
         with self.assertRaises(EmbedUnsupportedProviderException):
             get_embed('www.test.com/1234', max_width=400)
 
+    def test_get_embeds(self):
+        get_embed('www.test.com/1234', finder=self.dummy_finder)
+        self.assertEqual(self.hit_count, 1)
+
+        def finder(url, max_width=None):
+            if url == 'www.test.com/404':
+                raise EmbedNotFoundException
+            return self.dummy_finder(url, max_width)
+
+        embeds = get_embeds(['www.test.com/1234', 'www.test.com/4321', 'www.test.com/404'], finder=finder)
+
+        # Only the embed that hadn't been fetched yet was looked up with the finder, and
+        # the one that couldn't be found was left out
+        self.assertEqual(self.hit_count, 2)
+        self.assertEqual(set(embeds.keys()), {'www.test.com/1234', 'www.test.com/4321'})
+        self.assertEqual(embeds['www.test.com/4321'].title, "Test: www.test.com/4321")
+
+    def test_get_embeds_looks_up_stored_embeds_at_once(self):
+        for i in range(3):
+            get_embed('www.test.com/%d' % i, finder=self.dummy_finder)
+
+        with self.assertNumQueries(1):
+            embeds = get_embeds(['www.test.com/%d' % i for i in range(3)], finder=self.dummy_finder)
+
+        self.assertEqual(len(embeds), 3)
+        self.assertEqual(self.hit_count, 3)
+
+    def test_get_embed_does_not_write_for_stored_embed(self):
+        embed = get_embed('www.test.com/1234', finder=self.dummy_finder)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_embed('www.test.com/1234', finder=self.dummy_finder), embed)
+
+    def not_found_finder(self, url, max_width=None):
+        self.hit_count += 1
+        raise EmbedNotFoundException
+
+    def test_failed_embed_is_retried_after_backoff(self):
+        for i in range(2):
+            with self.assertRaises(EmbedNotFoundException):
+                get_embed('www.test.com/404', finder=self.not_found_finder)
+
+        # The finder isn't called again until the backoff period is over
+        self.assertEqual(self.hit_count, 1)
+        self.assertEqual(get_failing_urls(['www.test.com/404', 'www.test.com/1234']), {'www.test.com/404'})
+
+        now = time.time()
+        with patch('wagtail.embeds.embeds.time.time', return_value=now + FAILURE_BACKOFF + 1):
+            with self.assertRaises(EmbedNotFoundException):
+                get_embed('www.test.com/404', finder=self.not_found_finder)
+            self.assertEqual(self.hit_count, 2)
+
+        # The backoff period doubles after each failure in a row
+        with patch('wagtail.embeds.embeds.time.time', return_value=now + FAILURE_BACKOFF * 3):
+            with self.assertRaises(EmbedNotFoundException):
+                get_embed('www.test.com/404', finder=self.not_found_finder)
+            self.assertEqual(self.hit_count, 2)
+
+    def test_unsupported_provider_is_not_recorded_as_failure(self):
+        def unsupported_finder(url, max_width=None):
+            raise EmbedUnsupportedProviderException
+
+        with self.assertRaises(EmbedUnsupportedProviderException):
+            get_embed('www.test.com/1234', finder=unsupported_finder)
+
+        get_embed('www.test.com/1234', finder=self.dummy_finder)
+        self.assertEqual(self.hit_count, 1)
+
+    def test_saving_embed_clears_failure(self):
+        with self.assertRaises(EmbedNotFoundException):
+            get_embed('www.test.com/1234', finder=self.not_found_finder)
+
+        Embed.objects.create(url='www.test.com/1234', type='video', html='<p>Blah blah blah</p>')
+
+        self.assertEqual(get_failing_urls(['www.test.com/1234']), set())
+
+    def test_get_embed_ignoring_failures(self):
+        with self.assertRaises(EmbedNotFoundException):
+            get_embed('www.test.com/1234', finder=self.not_found_finder)
+
+        embed = get_embed('www.test.com/1234', finder=self.dummy_finder, ignore_failures=True)
+
+        self.assertEqual(embed.url, 'www.test.com/1234')
+        self.assertEqual(self.hit_count, 2)
+        self.assertEqual(get_failing_urls(['www.test.com/1234']), set())
+
+
+@override_settings(
+    WAGTAILEMBEDS_CACHE_TIMEOUT=60,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class TestEmbedCache(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        self.embed = Embed.objects.create(
+            url='http://www.example.com/foo', type='video', html='<p>Foo</p>'
+        )
+
+    def test_stored_embed_is_cached(self):
+        with self.assertNumQueries(1):
+            get_embed('http://www.example.com/foo')
+
+        with self.assertNumQueries(0):
+            embed = get_embed('http://www.example.com/foo')
+            embeds = get_embeds(['http://www.example.com/foo'])
+
+        self.assertEqual(embed.html, '<p>Foo</p>')
+        self.assertEqual(embeds['http://www.example.com/foo'].html, '<p>Foo</p>')
+
+    def test_cache_is_per_width(self):
+        get_embed('http://www.example.com/foo')
+        Embed.objects.create(url='http://www.example.com/foo', max_width=400, type='video', html='<p>Narrow</p>')
+
+        self.assertEqual(get_embed('http://www.example.com/foo', max_width=400).html, '<p>Narrow</p>')
+        self.assertEqual(get_embed('http://www.example.com/foo').html, '<p>Foo</p>')
+
+    def test_cache_invalidated_when_embed_saved(self):
+        get_embed('http://www.example.com/foo')
+
+        self.embed.html = '<p>Bar</p>'
+        self.embed.save()
+
+        self.assertEqual(get_embed('http://www.example.com/foo').html, '<p>Bar</p>')
+
+    def test_cache_invalidated_when_embed_deleted(self):
+        get_embed('http://www.example.com/foo')
+
+        self.embed.delete()
+
+        with self.assertRaises(EmbedUnsupportedProviderException):
+            get_embed('http://www.example.com/foo', finder=self.unsupported_finder)
+
+    def unsupported_finder(self, url, max_width=None):
+        raise EmbedUnsupportedProviderException
+
 
 class TestChooser(TestCase, WagtailTestUtils):
     def setUp(self):
@@ -306,36 +448,50 @@ class TestEmbedly(TestCase):
 
 class TestOembed(TestCase):
     def setUp(self):
-        class DummyResponse:
-            def read(self):
-                return b"foo"
-        self.dummy_response = DummyResponse()
+        self.session = Mock()
+        self.session.get.return_value.json.return_value = {}
+
+        patcher = patch('wagtail.embeds.finders.oembed.get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_oembed_invalid_provider(self):
         self.assertRaises(EmbedNotFoundException, OEmbedFinder().find_embed, "foo")
 
     def test_oembed_invalid_request(self):
-        config = {'side_effect': URLError('foo')}
-        with patch.object(urllib.request, 'urlopen', **config):
-            self.assertRaises(EmbedNotFoundException, OEmbedFinder().find_embed,
-                              "http://www.youtube.com/watch/")
-
-    @patch('urllib.request.urlopen')
-    @patch('json.loads')
-    def test_oembed_photo_request(self, loads, urlopen):
-        urlopen.return_value = self.dummy_response
-        loads.return_value = {'type': 'photo',
-                              'url': 'http://www.example.com'}
+        self.session.get.side_effect = requests.ConnectionError('foo')
+        self.assertRaises(EmbedNotFoundException, OEmbedFinder().find_embed,
+                          "http://www.youtube.com/watch/")
+
+    def test_oembed_error_response(self):
+        self.session.get.return_value.raise_for_status.side_effect = requests.HTTPError('404')
+        self.assertRaises(EmbedNotFoundException, OEmbedFinder().find_embed,
+                          "http://www.youtube.com/watch/")
+
+    def test_oembed_invalid_json(self):
+        self.session.get.return_value.json.side_effect = ValueError
+        self.assertRaises(EmbedNotFoundException, OEmbedFinder().find_embed,
+                          "http://www.youtube.com/watch/")
+
+    def test_oembed_response_without_type(self):
+        self.session.get.return_value.json.return_value = {'html': '<p>Video</p>'}
+        self.assertRaises(EmbedNotFoundException, OEmbedFinder().find_embed,
+                          "http://www.youtube.com/watch/")
+
+    def test_oembed_video_response_without_html(self):
+        self.session.get.return_value.json.return_value = {'type': 'video'}
+        self.assertRaises(EmbedNotFoundException, OEmbedFinder().find_embed,
+                          "http://www.youtube.com/watch/")
+
+    def test_oembed_photo_request(self):
+        self.session.get.return_value.json.return_value = {'type': 'photo',
+                                                           'url': 'http://www.example.com'}
         result = OEmbedFinder().find_embed("http://www.youtube.com/watch/")
         self.assertEqual(result['type'], 'photo')
         self.assertEqual(result['html'], '<img src="http://www.example.com" />')
-        loads.assert_called_with("foo")
 
-    @patch('urllib.request.urlopen')
-    @patch('json.loads')
-    def test_oembed_return_values(self, loads, urlopen):
-        urlopen.return_value = self.dummy_response
-        loads.return_value = {
+    def test_oembed_return_values(self):
+        self.session.get.return_value.json.return_value = {
             'type': 'something',
             'url': 'http://www.example.com',
             'title': 'test_title',
@@ -366,16 +522,135 @@ class TestOembed(TestCase):
         finder = OEmbedFinder(providers=[oembed_providers.twitter])
         self.assertFalse(finder.accept("http://www.youtube.com/watch/"))
 
-    @patch('urllib.request.urlopen')
-    @patch('json.loads')
-    def test_endpoint_with_format_param(self, loads, urlopen):
-        urlopen.return_value = self.dummy_response
-        loads.return_value = {'type': 'video',
-                              'url': 'http://www.example.com'}
+    def test_endpoint_with_format_param(self):
+        self.session.get.return_value.json.return_value = {'type': 'video',
+                                                           'url': 'http://www.example.com',
+                                                           'html': '<p>Video</p>'}
         result = OEmbedFinder().find_embed("https://vimeo.com/217403396")
         self.assertEqual(result['type'], 'video')
-        request = urlopen.call_args[0][0]
-        self.assertEqual(request.get_full_url().split('?')[0], "http://www.vimeo.com/api/oembed.json")
+        self.assertEqual(self.session.get.call_args[0][0], "http://www.vimeo.com/api/oembed.json")
+
+    def test_timeouts(self):
+        custom_provider = {
+            'endpoint': 'http://www.example.com/oembed',
+            'urls': ['^http://www\\.example\\.com/.+$'],
+            'timeout': 2,
+        }
+        finder = OEmbedFinder(providers=[oembed_providers.youtube, custom_provider], timeout=5)
+        self.session.get.return_value.json.return_value = {'type': 'video', 'html': '<p>Video</p>'}
+
+        finder.find_embed("http://www.youtube.com/watch/")
+        self.assertEqual(self.session.get.call_args[1]['timeout'], 5)
+
+        finder.find_embed("http://www.example.com/video")
+        self.assertEqual(self.session.get.call_args[1]['timeout'], 2)
+
+
+class StubOEmbedServer(ThreadingMixIn, HTTPServer):
+    """
+    A local oEmbed provider, which responds to every request with the same JSON after
+    an optional delay
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubOEmbedRequestHandler)
+        self.response = {'type': 'video', 'title': 'Stub video', 'html': '<p>Stub video</p>'}
+        self.status = 200
+        self.delay = 0
+        self.paths = []
+        self.connection_count = 0
+
+    @property
+    def provider(self):
+        return {
+            'endpoint': 'http://127.0.0.1:%d/oembed' % self.server_address[1],
+            'urls': ['^http://www\\.example\\.com/.+$'],
+        }
+
+
+class StubOEmbedRequestHandler(BaseHTTPRequestHandler):
+    # Keep connections open between requests
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connection_count += 1
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        time.sleep(self.server.delay)
+
+        body = json.dumps(self.server.response).encode('utf-8')
+        try:
+            self.send_response(self.server.status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up waiting
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestOembedWithStubServer(TestCase):
+    def setUp(self):
+        self.server = StubOEmbedServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_find_embed(self):
+        result = OEmbedFinder(providers=[self.server.provider]).find_embed('http://www.example.com/video')
+
+        self.assertEqual(result['title'], 'Stub video')
+        self.assertEqual(result['html'], '<p>Stub video</p>')
+        self.assertIn('url=http%3A%2F%2Fwww.example.com%2Fvideo', self.server.paths[0])
+
+    def test_error_response(self):
+        self.server.status = 500
+
+        with self.assertRaises(EmbedNotFoundException):
+            OEmbedFinder(providers=[self.server.provider]).find_embed('http://www.example.com/video')
+
+    def test_timeout(self):
+        self.server.delay = 1
+        finder = OEmbedFinder(providers=[self.server.provider], timeout=0.1)
+
+        with self.assertRaises(EmbedNotFoundException):
+            finder.find_embed('http://www.example.com/video')
+
+    def test_provider_timeout(self):
+        self.server.delay = 1
+        finder = OEmbedFinder(providers=[dict(self.server.provider, timeout=0.1)])
+
+        with self.assertRaises(EmbedNotFoundException):
+            finder.find_embed('http://www.example.com/video')
+
+    def test_connection_is_reused(self):
+        finder = OEmbedFinder(providers=[self.server.provider])
+        finder.find_embed('http://www.example.com/video')
+        finder.find_embed('http://www.example.com/other-video')
+
+        self.assertEqual(len(self.server.paths), 2)
+        self.assertEqual(self.server.connection_count, 1)
+
+    def test_failed_embed_is_not_fetched_again(self):
+        self.server.status = 500
+
+        with override_settings(WAGTAILEMBEDS_FINDERS=[
+            {'class': 'wagtail.embeds.finders.oembed', 'providers': [self.server.provider]}
+        ]):
+            for i in range(2):
+                with self.assertRaises(EmbedNotFoundException):
+                    get_embed('http://www.example.com/video')
+
+        self.assertEqual(len(self.server.paths), 1)
 
 
 class TestEmbedTag(TestCase):
@@ -406,6 +681,53 @@ class TestEmbedTag(TestCase):
         self.assertEqual(result, '')
 
 
+@override_settings(WAGTAILEMBEDS_FETCH_WORKERS=2)
+class TestEmbedFetchQueue(TestCase):
+    def setUp(self):
+        self.fetch_queue = get_fetch_queue()
+
+    @patch('wagtail.embeds.embeds.get_embed')
+    def test_placeholder_is_rendered_until_embed_is_fetched(self, get_embed):
+        result = embed_tag('http://www.example.com/foo')
+        self.fetch_queue.wait()
+
+        self.assertIn('<a href="http://www.example.com/foo">', result)
+        get_embed.assert_called_once_with('http://www.example.com/foo', max_width=None)
+
+    @patch('wagtail.embeds.embeds.get_embed')
+    def test_stored_embed_is_rendered(self, get_embed):
+        Embed.objects.create(url='http://www.example.com/foo', type='video', html='<p>Foo</p>')
+
+        self.assertEqual(embed_tag('http://www.example.com/foo'), '<p>Foo</p>')
+        self.assertIn('<p>Foo</p>', expand_db_html('<embed embedtype="media" url="http://www.example.com/foo" />'))
+        self.assertFalse(get_embed.called)
+
+    @patch('wagtail.embeds.embeds.get_embed')
+    def test_failed_embed_is_not_queued(self, get_embed):
+        record_failure('http://www.example.com/foo')
+
+        self.assertEqual(embed_tag('http://www.example.com/foo'), '')
+        self.assertEqual(expand_db_html('<embed embedtype="media" url="http://www.example.com/foo" />'), '')
+        self.assertFalse(get_embed.called)
+
+    @patch('wagtail.embeds.embeds.get_embed')
+    def test_embed_is_queued_once(self, get_embed):
+        fetching = threading.Event()
+        get_embed.side_effect = lambda url, max_width=None: fetching.wait(5)
+
+        self.fetch_queue.add('http://www.example.com/foo')
+        self.fetch_queue.add('http://www.example.com/foo')
+        self.fetch_queue.add('http://www.example.com/foo', max_width=400)
+        fetching.set()
+        self.fetch_queue.wait()
+
+        self.assertEqual(get_embed.call_count, 2)
+
+    @override_settings(WAGTAILEMBEDS_FETCH_WORKERS=None)
+    def test_queue_is_disabled_by_default(self):
+        self.assertIsNone(get_fetch_queue())
+
+
 class TestEmbedBlock(TestCase):
     def test_deserialize(self):
         """
@@ -474,6 +796,34 @@ class TestEmbedBlock(TestCase):
         # Check that get_embed was called correctly
         get_embed.assert_any_call('http://www.example.com/foo')
 
+    def test_bulk_to_python(self):
+        embed = Embed.objects.create(url='http://www.example.com/foo', type='video', html='<h1>Hello world!</h1>')
+
+        block = EmbedBlock(required=False)
+        with self.assertNumQueries(1):
+            values = block.bulk_to_python(['http://www.example.com/foo', '', 'http://www.example.com/bar'])
+
+        self.assertEqual(values[0].url, 'http://www.example.com/foo')
+        self.assertEqual(values[0].embed, embed)
+        self.assertIsNone(values[1])
+        self.assertEqual(values[2].url, 'http://www.example.com/bar')
+        self.assertIsNone(values[2].embed)
+
+    def test_render_stream_with_stored_embeds(self):
+        for i in range(3):
+            Embed.objects.create(url='http://www.example.com/%d' % i, type='video', html='<p>Video %d</p>' % i)
+
+        block = blocks.StreamBlock([('embed', EmbedBlock())])
+        value = block.to_python([
+            {'type': 'embed', 'value': 'http://www.example.com/%d' % i} for i in range(3)
+        ])
+
+        with self.assertNumQueries(1):
+            result = block.render(value)
+
+        for i in range(3):
+            self.assertIn('<p>Video %d</p>' % i, result)
+
     def test_render_form(self):
         """
         The form field for an EmbedBlock should be a text input containing
@@ -542,6 +892,16 @@ class TestEmbedBlock(TestCase):
         cleaned_value = block.clean(None)
         self.assertIsNone(cleaned_value)
 
+    @patch('wagtail.embeds.embeds.get_embed')
+    def test_clean_checks_recently_failed_url_again(self, get_embed):
+        get_embed.return_value = Embed(url='http://www.example.com/foo', html='<p>Foo</p>')
+        record_failure('http://www.example.com/foo')
+
+        cleaned_value = EmbedBlock().clean(EmbedValue('http://www.example.com/foo'))
+
+        self.assertEqual(cleaned_value.url, 'http://www.example.com/foo')
+        get_embed.assert_called_once_with('http://www.example.com/foo', ignore_failures=True)
+
     def test_clean_invalid_url(self):
         non_required_block = EmbedBlock(required=False)
 
@@ -635,6 +995,64 @@ class TestMediaEmbedHandler(TestCase):
 
         self.assertEqual(result, '')
 
+    def test_expand_db_html_with_several_embeds(self):
+        for i in range(3):
+            Embed.objects.create(url='http://www.example.com/%d' % i, type='video', html='<p>Video %d</p>' % i)
+
+        html = ''.join('<embed embedtype="media" url="http://www.example.com/%d" />' % i for i in range(3))
+        with self.assertNumQueries(1):
+            result = expand_db_html(html)
+
+        for i in range(3):
+            self.assertIn('<p>Video %d</p>' % i, result)
+
+    @override_settings(
+        WAGTAIL_RICH_TEXT_CACHE_TIMEOUT=60,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    )
+    def test_cached_expand_db_html_is_invalidated_when_embed_changes(self):
+        cache.clear()
+        embed = Embed.objects.create(url='http://www.example.com/foo', type='video', html='<p>Foo</p>')
+
+        html = '<embed embedtype="media" url="http://www.example.com/foo" />'
+        self.assertIn('<p>Foo</p>', expand_db_html(html))
+
+        embed.html = '<p>Bar</p>'
+        embed.save()
+
+        self.assertIn('<p>Bar</p>', expand_db_html(html))
+
+    @override_settings(
+        WAGTAIL_RICH_TEXT_CACHE_TIMEOUT=60,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    )
+    @patch('wagtail.embeds.embeds.get_embeds')
+    def test_expand_db_html_with_failed_embed_is_not_cached(self, get_embeds):
+        cache.clear()
+        get_embeds.return_value = {}
+
+        html = '<embed embedtype="media" url="http://www.example.com/foo" />'
+        self.assertEqual(expand_db_html(html), '')
+        self.assertEqual(expand_db_html(html), '')
+
+        self.assertEqual(get_embeds.call_count, 2)
+
+    @override_settings(
+        WAGTAIL_RICH_TEXT_CACHE_TIMEOUT=60,
+        WAGTAILEMBEDS_FETCH_WORKERS=2,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    )
+    @patch('wagtail.embeds.fetching.EmbedFetchQueue.get_stored_or_queue')
+    def test_expand_db_html_with_embed_placeholder_is_not_cached(self, get_stored_or_queue):
+        cache.clear()
+        get_stored_or_queue.return_value = ({}, {'http://www.example.com/foo'})
+
+        html = '<embed embedtype="media" url="http://www.example.com/foo" />'
+        self.assertIn('<a href="http://www.example.com/foo">', expand_db_html(html))
+        self.assertIn('<a href="http://www.example.com/foo">', expand_db_html(html))
+
+        self.assertEqual(get_stored_or_queue.call_count, 2)
+
     @patch('wagtail.embeds.embeds.get_embed')
     def test_expand_html_escaping_end_to_end(self, get_embed):
         get_embed.return_value = Embed(
@@ -652,4 +1070,4 @@ class TestMediaEmbedHandler(TestCase):
 
         result = expand_db_html('<p>1 2 <embed embedtype="media" url="https://www.youtube.com/watch?v=O7D-1RG-VRk&amp;t=25" /> 3 4</p>')
         self.assertIn('test html', result)
-        get_embed.assert_called_with('https://www.youtube.com/watch?v=O7D-1RG-VRk&t=25')
+        get_embed.assert_called_with('https://www.youtube.com/watch?v=O7D-1RG-VRk&t=25', max_width=None, finder=None)
@@ -26,8 +26,9 @@ def chooser_upload(request):
         if form.is_valid():
             error = None
             try:
+                # Check the URL with the provider even if it failed recently
+                embed_obj = embeds.get_embed(form.cleaned_data['url'], ignore_failures=True)
                 embed_html = embed_to_editor_html(form.cleaned_data['url'])
-                embed_obj = embeds.get_embed(form.cleaned_data['url'])
                 embed_data = {
                     'embedType': embed_obj.type,
                     'url': embed_obj.url,
@@ -1,16 +1,49 @@
+from django.db.models import Prefetch, prefetch_related_objects
+
 from wagtail.api.v2.endpoints import BaseAPIEndpoint
 from wagtail.api.v2.filters import FieldsFilter, OrderingFilter, SearchFilter
 
 from ... import get_image_model
-from .serializers import ImageSerializer
+from .serializers import ImageSerializer, get_rendition_filters
 
 
 class ImagesAPIEndpoint(BaseAPIEndpoint):
     base_serializer_class = ImageSerializer
     filter_backends = [FieldsFilter, OrderingFilter, SearchFilter]
+    known_query_parameters = BaseAPIEndpoint.known_query_parameters.union([
+        'renditions',
+    ])
     body_fields = BaseAPIEndpoint.body_fields + ['title', 'width', 'height']
     meta_fields = BaseAPIEndpoint.meta_fields + ['tags']
     listing_default_fields = BaseAPIEndpoint.listing_default_fields + ['title', 'tags']
     nested_default_fields = BaseAPIEndpoint.nested_default_fields + ['title']
     name = 'images'
     model = get_image_model()
+
+    @classmethod
+    def get_renditions_prefetch(cls, filters):
+        Rendition = cls.model.get_rendition_model()
+        return Prefetch(
+            'renditions',
+            queryset=Rendition.objects.filter(filter_spec__in=[filter.spec for filter in filters]),
+            to_attr='prefetched_renditions',
+        )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        # Fetch the requested renditions of every image in the response with a
+        # single query
+        filters = get_rendition_filters(self.request)
+        if filters:
+            queryset = queryset.prefetch_related(self.get_renditions_prefetch(filters))
+
+        return queryset
+
+    @classmethod
+    def prefetch_for_nested_objects(cls, request, images):
+        # Images nested in other responses, such as a page's feed_image, get
+        # their renditions with a single query too
+        filters = get_rendition_filters(request)
+        if filters:
+            prefetch_related_objects(images, cls.get_renditions_prefetch(filters))
@@ -1,5 +1,144 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.urls import NoReverseMatch, reverse
+
 from wagtail.api.v2.serializers import BaseSerializer
+from wagtail.api.v2.utils import BadRequestError
+
+from ...exceptions import InvalidFilterSpecError
+from ...models import Filter, SourceImageIOError
+from ...views.serve import generate_signature
+
+
+def get_rendition_filters(request):
+    """
+    Parses the ?renditions= GET parameter into a list of Filter objects.
+
+    Eg: ?renditions=fill-300x200,width-800
+
+    Only the filter specs listed in the WAGTAILAPI_IMAGE_RENDITIONS setting are
+    allowed, so that clients can't make the site generate (or sign URLs for)
+    any number of different renditions.
+
+    The result is cached on the request as it's used by every image that is
+    serialised in the response.
+    """
+    try:
+        return request._wagtailapi_rendition_filters
+    except AttributeError:
+        pass
+
+    allowed_filter_specs = getattr(settings, 'WAGTAILAPI_IMAGE_RENDITIONS', [])
+
+    filters = []
+    for filter_spec in request.GET.get('renditions', '').split(','):
+        if not filter_spec:
+            continue
+
+        filter = Filter(spec=filter_spec)
+
+        try:
+            filter.operations
+        except InvalidFilterSpecError:
+            raise BadRequestError("renditions error: '%s' is not a valid filter spec" % filter_spec)
+
+        if filter_spec not in allowed_filter_specs:
+            raise BadRequestError("renditions error: '%s' is not an allowed filter spec" % filter_spec)
+
+        if filter_spec not in [f.spec for f in filters]:
+            filters.append(filter)
+
+    request._wagtailapi_rendition_filters = filters
+    return filters
 
 
 class ImageSerializer(BaseSerializer):
-    pass
+    """
+    Adds a "renditions" section to each image when the ?renditions= parameter
+    is given.
+
+    Example:
+    "renditions": {
+        "fill-300x200": {
+            "url": "/media/images/myimage.fill-300x200.jpg",
+            "width": 300,
+            "height": 200
+        },
+        "width-800": {
+            "url": "/images/4b1gN6Sfn3xBhk9akRtxuWWv6zQ=/1/width-800/"
+        }
+    }
+
+    Renditions that haven't been generated yet are not generated while the
+    response is being built. If the image serve view is installed, they are
+    given a URL to that view instead (which generates the rendition on the
+    first request). Otherwise, they are generated in the usual way, one image
+    at a time, which costs a few queries for each missing rendition in a
+    listing.
+    """
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+
+        filters = get_rendition_filters(self.context['request'])
+        if filters:
+            data['renditions'] = self.get_renditions_representation(instance, filters)
+
+        return data
+
+    def get_existing_renditions(self, image, filters):
+        # Use the renditions prefetched by the endpoints if they're available,
+        # otherwise fetch all the requested renditions of this image in one go
+        renditions = getattr(image, 'prefetched_renditions', None)
+
+        if renditions is None:
+            renditions = image.renditions.filter(filter_spec__in=[filter.spec for filter in filters])
+
+        return {
+            (rendition.filter_spec, rendition.focal_point_key): rendition
+            for rendition in renditions
+        }
+
+    def get_renditions_representation(self, image, filters):
+        existing_renditions = self.get_existing_renditions(image, filters)
+        representation = OrderedDict()
+
+        for filter in filters:
+            rendition = existing_renditions.get((filter.spec, filter.get_cache_key(image)))
+
+            if rendition is None:
+                url = self.get_serve_url(image, filter)
+
+                if url is not None:
+                    representation[filter.spec] = OrderedDict([
+                        ('url', url),
+                    ])
+                    continue
+
+                try:
+                    rendition = image.get_rendition(filter)
+                except SourceImageIOError:
+                    representation[filter.spec] = OrderedDict([
+                        ('error', 'SourceImageIOError'),
+                    ])
+                    continue
+
+            representation[filter.spec] = OrderedDict([
+                ('url', rendition.url),
+                ('width', rendition.width),
+                ('height', rendition.height),
+            ])
+
+        return representation
+
+    def get_serve_url(self, image, filter):
+        """
+        Returns a URL to the image serve view for the specified rendition or
+        None if the serve view isn't installed.
+        """
+        signature = generate_signature(image.id, filter.spec)
+
+        try:
+            return reverse('wagtailimages_serve', args=(signature, image.id, filter.spec))
+        except NoReverseMatch:
+            return None
@@ -15,14 +15,39 @@ def image_embedtype_handler(attrs):
     Given a dict of attributes from the <embed> tag, return the real HTML
     representation for use on the front-end.
     """
+    return expand_image_embeds([attrs])[0]
+
+
+def expand_image_embeds(attrs_list):
+    """
+    Given a list of dicts of attributes from <embed> tags, return the real HTML
+    representation of each of them, fetching all of the images in one query.
+    """
     Image = get_image_model()
-    try:
-        image = Image.objects.get(id=attrs['id'])
-    except Image.DoesNotExist:
-        return "<img>"
 
-    image_format = get_image_format(attrs['format'])
-    return image_format.image_to_html(image, attrs.get('alt', ''))
+    image_ids = set()
+    for attrs in attrs_list:
+        try:
+            image_ids.add(int(attrs['id']))
+        except (KeyError, ValueError):
+            pass
+
+    images = Image.objects.in_bulk(image_ids) if image_ids else {}
+
+    html = []
+    for attrs in attrs_list:
+        try:
+            image = images[int(attrs['id'])]
+        except (KeyError, ValueError):
+            html.append("<img>")
+            continue
+
+        image_format = get_image_format(attrs['format'])
+        html.append(image_format.image_to_html(image, attrs.get('alt', '')))
+    return html
+
+
+image_embedtype_handler.expand_db_attributes_many = expand_image_embeds
 
 
 # hallo.js / editor-html conversion
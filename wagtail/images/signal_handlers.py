@@ -1,7 +1,8 @@
 from django.conf import settings
 from django.db import transaction
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 
+from wagtail.core.rich_text import cache as rich_text_cache
 from wagtail.images import get_image_model
 
 
@@ -18,6 +19,11 @@ def pre_save_image_feature_detection(instance, **kwargs):
             instance.set_focal_point(instance.get_suggested_focal_point())
 
 
+def image_changed_rich_text_signal_handler(instance, **kwargs):
+    # Expand references to this image in rich text again
+    rich_text_cache.invalidate('image', [instance.pk])
+
+
 def register_signal_handlers():
     Image = get_image_model()
     Rendition = Image.get_rendition_model()
@@ -25,3 +31,6 @@ def register_signal_handlers():
     pre_save.connect(pre_save_image_feature_detection, sender=Image)
     post_delete.connect(post_delete_file_cleanup, sender=Image)
     post_delete.connect(post_delete_file_cleanup, sender=Rendition)
+
+    post_save.connect(image_changed_rich_text_signal_handler, sender=Image)
+    post_delete.connect(image_changed_rich_text_signal_handler, sender=Image)
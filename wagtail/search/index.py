@@ -158,6 +158,30 @@ def insert_or_update_object(instance):
                 logger.exception("Exception raised while adding %r into the '%s' search backend", indexed_instance, backend_name)
 
 
+def insert_or_update_objects(model, objects):
+    """
+    Adds many instances of a model (in their most specific form) to the search
+    backends at once
+    """
+    if not class_is_indexed(model) or not objects:
+        return
+
+    # Make sure that the instances are in the model's indexed objects
+    indexed_pks = set()
+    for i in range(0, len(objects), 500):
+        indexed_pks.update(
+            model.get_indexed_objects().filter(pk__in=[obj.pk for obj in objects[i:i + 500]]).values_list('pk', flat=True)
+        )
+    objects = [obj for obj in objects if obj.pk in indexed_pks]
+
+    for backend_name, backend in get_search_backends_with_name(with_auto_update=True):
+        try:
+            backend.add_bulk(model, objects)
+        except Exception:
+            # Catch and log all errors
+            logger.exception("Exception raised while adding %r objects into the '%s' search backend", model, backend_name)
+
+
 def remove_object(instance):
     indexed_instance = get_indexed_instance(instance, check_exists=False)
 
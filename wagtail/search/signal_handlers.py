@@ -3,7 +3,11 @@ from django.db.models.signals import post_delete, post_save
 from wagtail.search import index
 
 
-def post_save_signal_handler(instance, update_fields=None, **kwargs):
+def post_save_signal_handler(instance, update_fields=None, bulk=False, **kwargs):
+    if bulk:
+        # Objects saved in bulk have already been indexed with index.insert_or_update_objects
+        return
+
     if update_fields is not None:
         # fetch a fresh copy of instance from the database to ensure
         # that we're not indexing any of the unsaved data contained in
@@ -13,6 +17,10 @@ def post_save_signal_handler(instance, update_fields=None, **kwargs):
     index.insert_or_update_object(instance)
 
 
+# Pages updated in bulk by PageQuerySet are indexed with index.insert_or_update_objects
+post_save_signal_handler.handles_bulk_updates = True
+
+
 def post_delete_signal_handler(instance, **kwargs):
     index.remove_object(instance)
 
@@ -113,6 +113,7 @@ INSTALLED_APPS = (
     'wagtail.contrib.routable_page',
     'wagtail.contrib.frontend_cache',
     'wagtail.contrib.search_promotions',
+    'wagtail.contrib.sitemaps',
     'wagtail.contrib.settings',
     'wagtail.contrib.modeladmin',
     'wagtail.contrib.table_block',
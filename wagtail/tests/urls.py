@@ -33,6 +33,10 @@ urlpatterns = [
         'sitemap_url_name': 'sitemap',
     }),
     url(r'^sitemap-(?P<section>.+)\.xml$', sitemaps_views.sitemap, name='sitemap'),
+    url(r'^streaming-sitemap\.xml$', sitemaps_views.streaming_sitemap),
+    url(r'^stored-sitemap\.xml$', sitemaps_views.stored_index),
+    url(r'^stored-sitemap-(?P<part_id>\d+)\.xml$', sitemaps_views.stored_sitemap,
+        name='wagtailsitemaps_stored_sitemap'),
 
     url(r'^testapp/', include(testapp_urls)),
 